@@ -0,0 +1,164 @@
+"""
+Load test for CallbackReceiver.
+
+Fires a mix of STK, C2B confirmation and B2C result callbacks (with a share
+of duplicate redeliveries) at a receiver and reports ack throughput and
+latency percentiles, either in-process or over HTTP.
+
+    python benchmarks/callback_load.py --callbacks 50000 --threads 16
+    python benchmarks/callback_load.py --http --callbacks 20000 --threads 32
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpesa_sdk.callbacks import CallbackReceiver, DEFAULT_ROUTES, STK, C2B_CONFIRMATION, B2C_RESULT  # noqa: E402
+
+PATHS = {kind: path for path, kind in DEFAULT_ROUTES.items()}
+
+
+def stk_body(n):
+    return {"Body": {"stkCallback": {
+        "MerchantRequestID": f"mr-{n}", "CheckoutRequestID": f"ws_CO_{n}", "ResultCode": 0,
+        "ResultDesc": "The service request is processed successfully.",
+        "CallbackMetadata": {"Item": [
+            {"Name": "Amount", "Value": 10}, {"Name": "MpesaReceiptNumber", "Value": f"R{n}"},
+            {"Name": "PhoneNumber", "Value": 251700000000 + n},
+        ]},
+    }}}
+
+
+def c2b_body(n):
+    return {"TransactionType": "Pay Bill", "TransID": f"T{n}", "TransTime": "20250101123456",
+            "TransAmount": "10.00", "BusinessShortCode": "802000", "BillRefNumber": "ACC",
+            "MSISDN": f"2517{n:08d}", "FirstName": "Test"}
+
+
+def b2c_body(n):
+    return {"Result": {"ResultType": 0, "ResultCode": 0, "ResultDesc": "Success",
+                       "OriginatorConversationID": f"oc-{n}", "ConversationID": f"AG_{n}",
+                       "TransactionID": f"B{n}",
+                       "ResultParameters": {"ResultParameter": [{"Key": "TransactionAmount", "Value": 10}]}}}
+
+
+BUILDERS = {STK: stk_body, C2B_CONFIRMATION: c2b_body, B2C_RESULT: b2c_body}
+
+
+def workload(count, duplicate_ratio, seed=1):
+    rng = random.Random(seed)
+    kinds = list(BUILDERS)
+    requests = []
+    for n in range(count):
+        if requests and rng.random() < duplicate_ratio:
+            requests.append(rng.choice(requests))
+            continue
+        kind = kinds[n % len(kinds)]
+        requests.append((PATHS[kind], json.dumps(BUILDERS[kind](n)).encode()))
+    return requests
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def run(args):
+    handled = [0]
+    lock = threading.Lock()
+
+    def handler(callback):
+        if args.work_ms:
+            time.sleep(args.work_ms / 1000)
+        with lock:
+            handled[0] += 1
+
+    receiver = CallbackReceiver(
+        handlers={kind: handler for kind in BUILDERS}, workers=args.workers, queue_size=args.queue_size)
+    requests = workload(args.callbacks, args.duplicates)
+    chunks = [requests[i::args.threads] for i in range(args.threads)]
+    latencies = [[] for _ in range(args.threads)]
+    statuses = [{} for _ in range(args.threads)]
+
+    server = None
+    if args.http:
+        server = make_server("127.0.0.1", 0, receiver.wsgi, _ThreadingWSGIServer, _QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+
+    def fire(index):
+        conn = http.client.HTTPConnection("127.0.0.1", port) if args.http else None
+        out = latencies[index]
+        counts = statuses[index]
+        for path, body in chunks[index]:
+            start = time.perf_counter()
+            if conn is None:
+                status, _ = receiver.handle(path, body)
+            else:
+                conn.request("POST", path, body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            out.append(time.perf_counter() - start)
+            counts[status] = counts.get(status, 0) + 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=fire, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ack_elapsed = time.perf_counter() - start
+    receiver.join()
+    total_elapsed = time.perf_counter() - start
+    receiver.close()
+    if server is not None:
+        server.shutdown()
+
+    all_latencies = sorted(x for chunk in latencies for x in chunk)
+    status_counts = {}
+    for counts in statuses:
+        for status, n in counts.items():
+            status_counts[status] = status_counts.get(status, 0) + n
+    print(f"mode             {'http' if args.http else 'in-process'}")
+    print(f"callbacks        {len(requests)} ({args.threads} senders, {args.workers} workers)")
+    print(f"ack throughput   {len(requests) / ack_elapsed:,.0f}/s")
+    print(f"ack latency p50  {percentile(all_latencies, 0.50) * 1e6:,.0f} us")
+    print(f"ack latency p99  {percentile(all_latencies, 0.99) * 1e6:,.0f} us")
+    print(f"drain time       {total_elapsed:.2f} s")
+    print(f"statuses         {dict(sorted(status_counts.items()))}")
+    print(f"receiver stats   {receiver.stats}")
+    print(f"handled          {handled[0]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callbacks", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent senders")
+    parser.add_argument("--workers", type=int, default=4, help="receiver handler threads")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--duplicates", type=float, default=0.05, help="share of redelivered callbacks")
+    parser.add_argument("--work-ms", type=float, default=0.0, help="simulated handler work per callback")
+    parser.add_argument("--http", action="store_true", help="send over HTTP to a WSGI server")
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
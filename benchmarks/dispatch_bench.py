@@ -0,0 +1,99 @@
+"""
+Submission throughput of DurableDispatcher against an in-memory worker pool.
+
+Requests go to a stub client that sleeps for ``--latency`` seconds, so only
+the cost of queueing and logging is measured. Compares:
+
+* ``memory`` - requests handed straight to a thread pool, nothing logged
+* ``wal, 1 submitter`` - one thread submitting, so every entry pays its own fsync
+* ``wal, N submitters`` - concurrent submitters sharing fsyncs via group commit
+
+    python benchmarks/dispatch_bench.py --requests 5000 --submitters 32
+    python benchmarks/dispatch_bench.py --no-fsync
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpesa_sdk.dispatch import DurableDispatcher  # noqa: E402
+from mpesa_sdk.models import StkPushRequest, StkPushResponse  # noqa: E402
+
+
+class StubSDK:
+    credentials = None
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def send(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+        return StkPushResponse.from_dict({"MerchantRequestID": request.merchant_request_id})
+
+
+def request(n):
+    return StkPushRequest(f"bench-{n}", "554433", "pw", "20160216165627", "CustomerPayBillOnline", "10.00",
+                          "251700404789", "554433", "251700404789", "https://example.com/cb", "DATA", "desc", [])
+
+
+def run(submit, count, submitters):
+    futures = [[] for _ in range(submitters)]
+
+    def worker(index):
+        own = futures[index]
+        for n in range(index, count, submitters):
+            own.append(submit(request(n)))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(submitters)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for chunk in futures:
+        for future in chunk:
+            future.result()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--submitters", type=int, default=32, help="concurrent submitting threads")
+    parser.add_argument("--workers", type=int, default=32, help="dispatcher worker threads")
+    parser.add_argument("--latency", type=float, default=0.001, help="stub API latency in seconds")
+    parser.add_argument("--commit-delay", type=float, default=0.0)
+    parser.add_argument("--no-fsync", action="store_true")
+    args = parser.parse_args(argv)
+
+    sdk = StubSDK(args.latency)
+    rows = []
+    with ThreadPoolExecutor(args.workers) as pool:
+        elapsed = run(lambda r: pool.submit(sdk.send, r), args.requests, args.submitters)
+    rows.append(("memory", elapsed, None))
+
+    for submitters in (1, args.submitters):
+        with tempfile.TemporaryDirectory() as tmp:
+            dispatcher = DurableDispatcher(sdk, os.path.join(tmp, "wal.jsonl"), workers=args.workers,
+                                           fsync=not args.no_fsync, commit_delay=args.commit_delay)
+            elapsed = run(dispatcher.submit, args.requests, submitters)
+            dispatcher.close()
+            rows.append((f"wal, {submitters} submitter{'s' if submitters > 1 else ''}", elapsed,
+                         dispatcher.log.commits))
+
+    memory = rows[0][1]
+    print(f"{'mode':<20} {'req/s':>10} {'vs memory':>10} {'commits':>8} {'entries/commit':>15}")
+    for name, elapsed, commits in rows:
+        per_commit = f"{args.requests / commits:,.1f}" if commits else "-"
+        print(f"{name:<20} {args.requests / elapsed:>10,.0f} {memory / elapsed:>9.0%} "
+              f"{commits if commits is not None else '-':>8} {per_commit:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Status query latency with one degraded Safaricom host, with and without an
+endpoint set and hedging.
+
+Two in-process mock servers stand in for two edge hosts. Both add some random
+latency, and the first one is degraded. Three clients each send ``--requests``
+status queries:
+
+* ``single host`` - base URL on the degraded host only
+* ``endpoint set`` - both hosts, picked by measured latency and health
+* ``hedged`` - both hosts, with a second request after the p95 latency
+
+    python benchmarks/failover_bench.py --requests 500
+    python benchmarks/failover_bench.py --degraded-latency 0.2 --jitter 0.05
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpesa_sdk import MPesaSDK  # noqa: E402
+from mpesa_sdk.mock_server import MockSafaricomServer  # noqa: E402
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(sdk, count):
+    sdk.authenticate()
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        sdk.query_transaction_status("TX1", "REF1")
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.002, help="base latency of both hosts")
+    parser.add_argument("--jitter", type=float, default=0.02, help="random extra latency of both hosts")
+    parser.add_argument("--degraded-latency", type=float, default=0.05, help="extra latency of the degraded host")
+    parser.add_argument("--degraded-jitter", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    degraded = MockSafaricomServer(latency=args.latency + args.degraded_latency,
+                                   latency_jitter=args.degraded_jitter, seed=1)
+    healthy = MockSafaricomServer(latency=args.latency, latency_jitter=args.jitter, seed=2)
+    with degraded, healthy:
+        for server in (degraded, healthy):
+            server.statuses["TX1"] = "Completed"
+        options = {"use_spec_ports": False, "operation_defaults": {"from": "171717"}}
+        clients = {
+            "single host": MPesaSDK("key", "secret", base_url=degraded.url, **options),
+            "endpoint set": MPesaSDK("key", "secret", endpoints=[degraded.url, healthy.url], **options),
+            "hedged": MPesaSDK("key", "secret", endpoints=[degraded.url, healthy.url], hedge=True, **options),
+        }
+        print(f"{'client':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  requests per host")
+        for name, sdk in clients.items():
+            with sdk:
+                latencies = run(sdk, args.requests)
+            spread = "-" if sdk.endpoints is None else ", ".join(
+                f"{'degraded' if url == degraded.url else 'healthy'}={stats['requests']}"
+                f" (hedges {stats['hedges']})" for url, stats in sdk.endpoints.stats().items())
+            print(f"{name:<14} {percentile(latencies, 0.5) * 1e3:>8.1f} {percentile(latencies, 0.95) * 1e3:>8.1f} "
+                  f"{percentile(latencies, 0.99) * 1e3:>8.1f} {latencies[-1] * 1e3:>8.1f}  {spread}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Cold import cost of the package, measured in fresh interpreters.
+
+Each statement is timed in its own ``python`` process, ``--runs`` times, and
+the median is reported together with the heavy third-party modules it pulled
+in. ``import mpesa_sdk`` itself should stay in the low milliseconds and load
+none of them; the client and the async client pay for ``requests`` and
+``httpx`` when first used.
+
+    python benchmarks/import_bench.py --runs 20
+    python benchmarks/import_bench.py --max-ms 5
+
+With ``--max-ms`` the run fails (exit status 1) when the bare package import
+takes longer than that.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = (
+    "import mpesa_sdk",
+    "from mpesa_sdk import MPesaError, StkPushRequest",
+    "from mpesa_sdk import MPesaSDK",
+    "from mpesa_sdk import AsyncMPesaSDK",
+    "from mpesa_sdk import CallbackReceiver",
+)
+HEAVY = ("requests", "urllib3", "httpx", "cryptography", "orjson", "msgspec", "opentelemetry")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, sorted({{m.split('.')[0] for m in sys.modules}} & set({heavy!r}))]))
+"""
+
+
+def measure(statement, runs):
+    code = PROBE.format(statement=statement, heavy=HEAVY)
+    times, loaded = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        elapsed, loaded = json.loads(output)
+        times.append(elapsed)
+    return statistics.median(times), loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per statement")
+    parser.add_argument("--max-ms", type=float, help="fail if 'import mpesa_sdk' takes longer")
+    args = parser.parse_args(argv)
+
+    results = {statement: measure(statement, args.runs) for statement in STATEMENTS}
+    print(f"{'statement':<50} {'median ms':>10}  heavy modules loaded")
+    for statement, (elapsed, loaded) in results.items():
+        print(f"{statement:<50} {elapsed * 1e3:>10.2f}  {', '.join(loaded) or '-'}")
+
+    bare = results["import mpesa_sdk"][0] * 1e3
+    if args.max_ms is not None and bare > args.max_ms:
+        print(f"REGRESSION import mpesa_sdk took {bare:.2f} ms > {args.max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
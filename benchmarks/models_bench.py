@@ -0,0 +1,96 @@
+"""
+Cost per call of building a request body and reading its response.
+
+Compares the dict-building path used by the positional SDK methods
+(payloads.stk_push + json.dumps, then parsing the whole response) with the
+slotted models (StkPushRequest.to_json, lazily decoded StkPushResponse).
+Reports time per call and tracemalloc peak bytes per call; "unread" is a
+caller that only needs the call to have succeeded.
+
+    python benchmarks/models_bench.py --calls 200000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpesa_sdk import payloads  # noqa: E402
+from mpesa_sdk.models import BACKEND, StkPushRequest, StkPushResponse  # noqa: E402
+
+ARGS = ("req-1", "554433", "cGFzc3dvcmQ=", "20160216165627", "CustomerPayBillOnline", "10.00",
+        "251700404789", "554433", "251700404789", "https://example.com/cb", "DATA", "desc", [])
+RESPONSE = json.dumps({
+    "MerchantRequestID": "req-1", "CheckoutRequestID": "ws_CO_000000000001", "ResponseCode": "0",
+    "ResponseDescription": "Success. Request accepted for processing",
+    "CustomerMessage": "Success. Request accepted for processing",
+}).encode()
+
+
+def dict_request():
+    # What requests does with json=payload.
+    return json.dumps(payloads.stk_push(*ARGS), allow_nan=False).encode("utf-8")
+
+
+def model_request():
+    return StkPushRequest(*ARGS).to_json()
+
+
+def dict_response_read():
+    return json.loads(RESPONSE)["CheckoutRequestID"]
+
+
+def model_response_read():
+    return StkPushResponse(RESPONSE).checkout_request_id
+
+
+def dict_response_unread():
+    return json.loads(RESPONSE)
+
+
+def model_response_unread():
+    return StkPushResponse(RESPONSE)
+
+
+def per_call_time(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def per_call_peak(fn, calls=1000):
+    fn()
+    tracemalloc.start()
+    total = 0
+    for _ in range(calls):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / calls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    assert json.loads(model_request()) == json.loads(dict_request())
+    print(f"json backend     {BACKEND}")
+    print(f"{'':<18} {'dict ns':>9} {'model ns':>9} {'dict B':>8} {'model B':>8}")
+    for name, old, new in [
+        ("request body", dict_request, model_request),
+        ("response read", dict_response_read, model_response_read),
+        ("response unread", dict_response_unread, model_response_unread),
+    ]:
+        print(f"{name:<18} {per_call_time(old, args.calls) * 1e9:>9,.0f} {per_call_time(new, args.calls) * 1e9:>9,.0f} "
+              f"{per_call_peak(old):>8,.0f} {per_call_peak(new):>8,.0f}")
+
+
+if __name__ == "__main__":
+    main()
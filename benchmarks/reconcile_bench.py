@@ -0,0 +1,55 @@
+"""
+Throughput and peak memory of reconcile.Reconciler on generated data.
+
+Both sides are generated lazily, so the process's peak RSS reflects the
+reconciler and not the inputs. Raise --partitions to lower peak memory.
+
+    python benchmarks/reconcile_bench.py --records 1000000 --partitions 256
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpesa_sdk.reconcile import reconcile  # noqa: E402
+
+
+def statement(n):
+    for i in range(n):
+        yield {"TransactionID": f"T{i:010d}", "Amount": f"{i % 5000 + 1}.00", "Details": "Pay Bill from 2517..."}
+
+
+def ledger(n):
+    # About 1% missing on each side, 0.5% amount mismatches and 0.1% duplicates.
+    for i in range(n // 100, n + n // 100):
+        amount = i % 5000 + 1 + (1 if i % 200 == 0 else 0)
+        yield {"TransactionID": f"T{i:010d}", "amount": amount, "account": f"ACC{i % 9973}"}
+        if i % 1000 == 0:
+            yield {"TransactionID": f"T{i:010d}", "amount": amount, "account": f"ACC{i % 9973}"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--partitions", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as out:
+        start = time.perf_counter()
+        summary = reconcile(statement(args.records), ledger(args.records), out,
+                            partitions=args.partitions, write_matched=False)
+        elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"records/side     {args.records:,}")
+    print(f"partitions       {args.partitions}")
+    print(f"elapsed          {elapsed:.2f} s  ({2 * args.records / elapsed:,.0f} records/s)")
+    print(f"peak RSS         {peak_mb:,.0f} MB")
+    print(f"summary          {summary}")
+
+
+if __name__ == "__main__":
+    main()
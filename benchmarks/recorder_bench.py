@@ -0,0 +1,77 @@
+"""
+Overhead of recording traffic with TrafficRecorder.
+
+Measures the cost ``record()`` adds to the request thread, then sends STK
+pushes to an in-process mock server with and without a recorder, alternating
+rounds so drift affects both equally, and reports the per-request difference.
+
+    python benchmarks/recorder_bench.py --calls 200000 --requests 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpesa_sdk import MPesaSDK  # noqa: E402
+from mpesa_sdk.mock_server import MockSafaricomServer  # noqa: E402
+from mpesa_sdk.recorder import TrafficRecorder  # noqa: E402
+
+STK_ARGS = ("554433", None, None, "CustomerPayBillOnline", "10.00", "251700404789", "554433",
+            "251700404789", "https://example.com/cb", "DATA", "desc", [])
+
+
+def record_cost(directory, calls):
+    body = {"MerchantRequestID": "bench", "Password": "pw", "Amount": "10.00"}
+    with TrafficRecorder(os.path.join(directory, "hot.jsonl"), max_pending=calls + 1) as recorder:
+        start = time.perf_counter()
+        for _ in range(calls):
+            recorder.record(time.time(), 0.01, "stk_push", "POST", "http://x/p", None, body, 200, b"{}")
+        elapsed = time.perf_counter() - start
+    return elapsed / calls
+
+
+def round_trip(sdk, count, offset):
+    start = time.perf_counter()
+    for n in range(offset, offset + count):
+        sdk.stk_push(f"bench-{n}", *STK_ARGS)
+    return (time.perf_counter() - start) / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000, help="record() calls timed")
+    parser.add_argument("--requests", type=int, default=2000, help="SDK requests per client")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"record() on the request thread: {record_cost(tmp, args.calls) * 1e6:.2f} us/call")
+
+        with MockSafaricomServer(record_requests=False) as server:
+            recorder = TrafficRecorder(os.path.join(tmp, "traffic.jsonl"))
+            plain = MPesaSDK("key", "secret", base_url=server.url, passkey="passkey")
+            recorded = MPesaSDK("key", "secret", base_url=server.url, passkey="passkey", recorder=recorder)
+            times = {"without recorder": [], "with recorder": []}
+            per_round = args.requests // args.rounds
+            for index in range(args.rounds):
+                offset = index * per_round
+                times["without recorder"].append(round_trip(plain, per_round, offset))
+                times["with recorder"].append(round_trip(recorded, per_round, 10_000_000 + offset))
+            plain.close()
+            recorded.close()
+            recorder.close()
+            size = os.path.getsize(os.path.join(tmp, "traffic.jsonl"))
+
+    without, with_ = (statistics.median(times[k]) for k in ("without recorder", "with recorder"))
+    print(f"{'without recorder':<18} {without * 1e6:10,.1f} us/request")
+    print(f"{'with recorder':<18} {with_ * 1e6:10,.1f} us/request  "
+          f"({(with_ - without) / without:+.1%}, {recorder.recorded} records, {size / max(1, recorder.recorded):,.0f} B/record,"
+          f" {recorder.dropped} dropped)")
+
+
+if __name__ == "__main__":
+    main()
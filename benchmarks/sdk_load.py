@@ -0,0 +1,156 @@
+"""
+Throughput, latency and memory of the sync client against the mock server.
+
+Starts the mock server in a subprocess (so its allocations and GIL time are not
+counted against the client), then for each concurrency level sends STK pushes
+from that many threads through one shared MPesaSDK and reports requests/sec,
+p50/p99 latency and memory per request. Memory is measured with tracemalloc
+in a separate, shorter pass: peak bytes per in-flight request and bytes still
+retained per request afterwards.
+
+    python benchmarks/sdk_load.py --requests 5000 --concurrency 1 8 32 64
+    python benchmarks/sdk_load.py --latency 0.02 --json results.json
+    python benchmarks/sdk_load.py --baseline results.json --tolerance 0.15
+
+With ``--baseline`` the run fails (exit status 1) when any level's throughput
+drops or its p99 rises by more than the tolerance.
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mpesa_sdk import MPesaSDK  # noqa: E402
+from mpesa_sdk.transport import Transport  # noqa: E402
+
+
+def start_server(args):
+    command = [sys.executable, "-m", "mpesa_sdk.mock_server", "--latency", str(args.latency),
+               "--error-rate", str(args.error_rate), "--seed", "1"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, cwd=ROOT)
+    url = process.stdout.readline().strip()
+    return process, url
+
+
+def stk_args(n):
+    return (f"bench-{n}", "554433", "pw", "20160216165627", "CustomerPayBillOnline", "10.00",
+            "251700404789", "554433", "251700404789", "https://example.com/cb", "DATA", "desc", [])
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def fire(sdk, count, concurrency, offset):
+    """Send ``count`` STK pushes from ``concurrency`` threads; return (elapsed, latencies, errors)."""
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+
+    def worker(index):
+        own = latencies[index]
+        for n in range(offset + index, offset + count, concurrency):
+            start = time.perf_counter()
+            try:
+                sdk.stk_push(*stk_args(n))
+            except Exception:
+                errors[index] += 1
+            own.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, sorted(x for chunk in latencies for x in chunk), sum(errors)
+
+
+def run_level(url, concurrency, args):
+    transport = Transport(pool_maxsize=concurrency)
+    with MPesaSDK("key", "secret", base_url=url, transport=transport) as sdk:
+        # Fetch the token and open the pooled connections before timing.
+        fire(sdk, concurrency * 2, concurrency, offset=0)
+        elapsed, latencies, errors = fire(sdk, args.requests, concurrency, offset=10_000_000)
+
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fire(sdk, args.memory_requests, concurrency, offset=20_000_000)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    transport.close()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        "peak_bytes_per_inflight": (peak - baseline) / concurrency,
+        "retained_bytes_per_request": max(0, current - baseline) / args.memory_requests,
+    }
+
+
+def regressions(results, baseline, tolerance):
+    previous = {entry["concurrency"]: entry for entry in baseline}
+    problems = []
+    for entry in results:
+        old = previous.get(entry["concurrency"])
+        if old is None:
+            continue
+        if entry["rps"] < old["rps"] * (1 - tolerance):
+            problems.append(f"c={entry['concurrency']}: rps {entry['rps']:,.0f} < baseline {old['rps']:,.0f}")
+        if entry["p99_ms"] > old["p99_ms"] * (1 + tolerance):
+            problems.append(f"c={entry['concurrency']}: p99 {entry['p99_ms']:.2f} ms > "
+                            f"baseline {old['p99_ms']:.2f} ms")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="timed requests per concurrency level")
+    parser.add_argument("--memory-requests", type=int, default=500, help="requests in the tracemalloc pass")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--latency", type=float, default=0.0, help="server-side latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests the server fails")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against results written earlier with --json")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    process, url = start_server(args)
+    try:
+        results = [run_level(url, concurrency, args) for concurrency in args.concurrency]
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(f"{'conc':>5} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'peak B/inflight':>16} {'retained B/req':>15}")
+    for r in results:
+        print(f"{r['concurrency']:>5} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9,.0f} {r['p50_ms']:>8.2f} "
+              f"{r['p99_ms']:>8.2f} {r['peak_bytes_per_inflight']:>16,.0f} {r['retained_bytes_per_request']:>15,.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = regressions(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Per-call cost of building STK passwords and B2C security credentials.
+
+Compares building each from scratch (base64 on every call, RSA-encrypting the
+initiator password on every call) against the cached generators in
+security.py. Needs the ``cryptography`` package.
+
+    python benchmarks/security_bench.py --calls 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+
+from mpesa_sdk.security import SecurityCredentials, StkPasswordGenerator, make_timestamp, stk_password  # noqa: E402
+
+
+def naive_security_credential(pem, password):
+    # What most integrations do: load the certificate and encrypt on every request.
+    return SecurityCredentials(pem).encrypt(password)
+
+
+def timed(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def report(name, before, after):
+    print(f"{name:<22} before {before * 1e6:10,.2f} us/call   after {after * 1e6:8,.2f} us/call   "
+          f"speedup {before / after:,.0f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--rsa-calls", type=int, default=2_000, help="uncached RSA encryptions to time")
+    args = parser.parse_args(argv)
+
+    generator = StkPasswordGenerator("174379", "bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919")
+    report("stk password",
+           timed(lambda: stk_password("174379", generator._prefix[6:].decode(), make_timestamp()), args.calls),
+           timed(generator.generate, args.calls))
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    credentials = SecurityCredentials(pem)
+    report("security credential",
+           timed(lambda: naive_security_credential(pem, "Safaricom999!*!"), args.rsa_calls),
+           timed(lambda: credentials.get("testapi", "Safaricom999!*!"), args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Per-record cost of validating and serializing B2C_PAYMENT records.
+
+Compares the compiled validator against a straightforward implementation that
+walks the raw spec dicts for every record.
+
+    python benchmarks/validation_bench.py --records 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpesa_sdk.constants import DEFAULT_OPERATIONS, MARKET_PATTERNS, PATTERNS  # noqa: E402
+from mpesa_sdk.validation import get_validator  # noqa: E402
+
+
+def records(n):
+    out = []
+    for i in range(n):
+        # Every 50th record is invalid in two fields.
+        bad = i % 50 == 0
+        out.append({
+            "from": "171717",
+            "to": "2519" if bad else f"2517{i % 100000000:08d}",
+            "amount": "0" if bad else f"{10 + i % 1000}.50",
+            "transaction": f"T{i}",
+            "reference": f"R{i}",
+        })
+    return out
+
+
+def naive_validate_batch(name, rows):
+    valid, errors = [], {}
+    for index, record in enumerate(rows):
+        spec = DEFAULT_OPERATIONS[name]
+        problems = []
+        for field in spec['required']:
+            if field not in record:
+                problems.append((field, "missing"))
+        for field, pattern in spec['validation'].items():
+            pattern_name = next(k for k, v in PATTERNS.items() if v is pattern)
+            pattern = MARKET_PATTERNS['ET'].get(pattern_name, pattern)
+            if field in record and not pattern.match(str(record[field])):
+                problems.append((field, "invalid"))
+        if problems:
+            errors[index] = problems
+        else:
+            valid.append((index, {spec['mapping'][k]: str(v) for k, v in record.items() if k in spec['mapping']}))
+    return valid, errors
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    rows = records(args.records)
+    validator = get_validator("B2C_PAYMENT")
+    compiled_time, result = timed(validator.validate_batch, rows)
+    naive_time, (naive_valid, naive_errors) = timed(naive_validate_batch, "B2C_PAYMENT", rows)
+    assert len(result.valid) == len(naive_valid) and len(result.errors) == len(naive_errors)
+
+    n = len(rows)
+    print(f"records          {n:,} ({len(result.errors):,} invalid)")
+    print(f"compiled         {compiled_time:.2f} s  {compiled_time / n * 1e9:,.0f} ns/record")
+    print(f"naive            {naive_time:.2f} s  {naive_time / n * 1e9:,.0f} ns/record")
+    print(f"speedup          {naive_time / compiled_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +0,0 @@
-from .auth import MPesaSDK
-from .exceptions import MPesaError, AuthenticationError, APIRequestError
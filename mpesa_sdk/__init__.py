@@ -0,0 +1,103 @@
+"""
+MPesa SDK for interacting with Safaricom APIs.
+
+Importing the package loads nothing else: each public name below is
+imported from its submodule the first time it is used, so
+``import mpesa_sdk`` stays cheap for short-lived processes such as
+serverless handlers. ``requests`` is imported with the first client, and
+``httpx`` only with ``mpesa_sdk.aio``.
+
+    from mpesa_sdk import MPesaSDK
+
+    sdk = MPesaSDK(consumer_key, consumer_secret, environment='sandbox')
+"""
+import importlib
+
+__version__ = '1.0.0'
+
+# Public name -> submodule defining it.
+_EXPORTS = {
+    # client
+    'MPesaSDK': 'client',
+    # aio
+    'AsyncMPesaSDK': 'aio',
+    'AsyncTransport': 'aio',
+    # exceptions
+    'MPesaError': 'exceptions',
+    'AuthenticationError': 'exceptions',
+    'APIRequestError': 'exceptions',
+    'RetryableError': 'exceptions',
+    'FatalError': 'exceptions',
+    'CircuitOpenError': 'exceptions',
+    # models
+    'StkPushRequest': 'models',
+    'C2BPaymentRequest': 'models',
+    'B2CRequest': 'models',
+    'StkPushResponse': 'models',
+    'C2BPaymentResponse': 'models',
+    'B2CResponse': 'models',
+    # validation
+    'ValidationError': 'validation',
+    'get_validator': 'validation',
+    # callbacks
+    'CallbackReceiver': 'callbacks',
+    'StkCallback': 'callbacks',
+    'C2BNotification': 'callbacks',
+    'B2CResult': 'callbacks',
+    # transport, tokens, retry, failover, rate limiting
+    'Transport': 'transport',
+    'TokenManager': 'tokens',
+    'MemoryTokenStore': 'tokens',
+    'LRUTokenStore': 'tokens',
+    'FileTokenStore': 'tokens',
+    'RedisTokenStore': 'tokens',
+    'Retrier': 'retry',
+    'RetryPolicy': 'retry',
+    'CircuitBreaker': 'retry',
+    'EndpointSet': 'endpoints',
+    'RateLimiter': 'ratelimit',
+    'Limit': 'ratelimit',
+    'RateLimitExceeded': 'ratelimit',
+    # security
+    'CredentialProvider': 'security',
+    'SecurityCredentials': 'security',
+    # instrumentation
+    'Instrumentation': 'instrumentation',
+    'Metrics': 'instrumentation',
+    # higher-level workflows
+    'BulkDisbursement': 'bulk',
+    'disburse': 'bulk',
+    'StatusPoller': 'polling',
+    'DurableDispatcher': 'dispatch',
+    'TenantRegistry': 'tenants',
+    'UnknownTenant': 'tenants',
+    'Reconciler': 'reconcile',
+    'MockSafaricomServer': 'mock_server',
+    'TrafficRecorder': 'recorder',
+    'Replayer': 'recorder',
+}
+
+_SUBMODULES = frozenset({
+    'aio', 'bulk', 'callbacks', 'client', 'constants', 'dispatch', 'endpoints', 'exceptions', 'files',
+    'instrumentation', 'mock_server', 'models', 'operations', 'payloads', 'polling', 'ratelimit', 'reconcile',
+    'recorder', 'retry', 'security', 'tenants', 'tokens', 'transport', 'validation',
+})
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is not None:
+        value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f'.{name}', __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Cache it so later lookups skip __getattr__.
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | _SUBMODULES)
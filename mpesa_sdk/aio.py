@@ -0,0 +1,422 @@
+"""
+Native asyncio client.
+
+Requires the optional ``httpx`` dependency (``pip install mpesa_sdk[async]``).
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from . import payloads
+from .constants import DEFAULT_MARKET, DEFAULT_POOL_MAXSIZE, DEFAULT_TIMEOUT
+from .exceptions import AuthenticationError, FatalError, MPesaError, RetryableError, raise_for_response
+from .instrumentation import RequestTimings
+from .security import CredentialProvider
+from .tokens import DEFAULT_REFRESH_MARGIN, EXPIRING, FRESH, TokenManager
+from .validation import validate_payload
+
+DEFAULT_CONCURRENCY = 100
+
+
+class AsyncTransport:
+    """Pooled, keep-alive HTTP transport for AsyncMPesaSDK."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_connections=DEFAULT_POOL_MAXSIZE,
+                 max_keepalive_connections=DEFAULT_POOL_MAXSIZE, client=None, instrumentation=None):
+        """
+        Initialize the transport.
+
+        Args:
+            timeout (float or tuple): Default timeout, either a single value or a
+                (connect, read) tuple.
+            max_connections (int): Maximum number of concurrent connections.
+            max_keepalive_connections (int): Maximum number of idle connections kept alive.
+            client (httpx.AsyncClient): Optional pre-configured client to use.
+            instrumentation (Instrumentation): Optional metrics/tracing hooks
+                told about every request. httpx resolves names as part of the
+                TCP connect, so DNS time is included in ``connect``.
+        """
+        if client is None:
+            if isinstance(timeout, tuple):
+                connect, read = timeout
+                timeout = httpx.Timeout(read, connect=connect)
+            client = httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                ),
+            )
+        self.client = client
+        self.instrumentation = instrumentation
+        self.in_flight = 0
+
+    async def request(self, method, url, headers=None, json=None, params=None, operation=None, data=None):
+        """
+        Send a request over the pooled client.
+
+        ``operation`` is accepted for interface parity with Transport; rate
+        limiting is not applied on the async client.
+
+        Returns:
+            httpx.Response: The HTTP response.
+
+        Raises:
+            RetryableError: If the request times out or the connection fails.
+            FatalError: For any other failure to send the request, e.g. an
+                invalid URL or header.
+        """
+        if self.instrumentation is not None:
+            return await self._timed_send(method, url, headers, json, params, operation, data)
+        return await self._send(method, url, headers, json, params, data)
+
+    async def _timed_send(self, method, url, headers, json, params, operation, data):
+        timings = RequestTimings()
+        marks = {}
+
+        async def trace(event, info):
+            marks[event] = time.perf_counter()
+
+        self.in_flight += 1
+        timings.in_flight = self.in_flight
+        response = error = None
+        start = time.perf_counter()
+        try:
+            response = await self._send(method, url, headers, json, params, data, {"trace": trace})
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.in_flight -= 1
+            if "connection.connect_tcp.complete" in marks:
+                timings.connect = marks["connection.connect_tcp.complete"] - marks["connection.connect_tcp.started"]
+            if "connection.start_tls.complete" in marks:
+                timings.tls = marks["connection.start_tls.complete"] - marks["connection.start_tls.started"]
+            timings.finish(time.perf_counter() - start)
+            self.instrumentation.on_request(
+                operation, method, None if response is None else response.status_code, error, timings)
+
+    async def _send(self, method, url, headers, json, params, data=None, extensions=None):
+        try:
+            return await self.client.request(
+                method, url, headers=headers, json=json, params=params, content=data, extensions=extensions)
+        except (httpx.ConnectTimeout, httpx.ConnectError) as e:
+            raise RetryableError(f"{method} {url} failed to connect: {e}", request_sent=False) from e
+        except httpx.TimeoutException as e:
+            raise RetryableError(f"{method} {url} timed out: {e}") from e
+        except (httpx.NetworkError, httpx.RemoteProtocolError) as e:
+            raise RetryableError(f"{method} {url} failed: {e}") from e
+        except (httpx.InvalidURL, httpx.UnsupportedProtocol, httpx.LocalProtocolError) as e:
+            raise FatalError(f"{method} {url} is invalid: {e}", request_sent=False) from e
+        except httpx.HTTPError as e:
+            raise FatalError(f"{method} {url} failed: {e}") from e
+
+    async def get(self, url, **kwargs):
+        """Send a GET request."""
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        """Send a POST request."""
+        return await self.request("POST", url, **kwargs)
+
+    async def close(self):
+        """Close every pooled connection."""
+        await self.client.aclose()
+
+
+class AsyncTokenManager(TokenManager):
+    """
+    TokenManager for coroutines.
+
+    Freshness, single-flight renewal and the store's cross-process lock work
+    as in TokenManager; ``fetch`` is a coroutine function instead, and calls
+    into a store that does I/O (anything but the in-memory stores, see their
+    ``blocking`` attribute) run on a worker thread so they never block the
+    event loop.
+    """
+
+    def __init__(self, fetch, key, store=None, refresh_margin=DEFAULT_REFRESH_MARGIN,
+                 background_refresh=True, clock=time.time):
+        """Initialize the token manager. See TokenManager; ``fetch`` returns an awaitable."""
+        super().__init__(fetch, key, store, refresh_margin, background_refresh, clock)
+        self._blocking = getattr(self.store, "blocking", True)
+        self._renew_lock = asyncio.Lock()
+        self._refresh_task = None
+
+    async def _io(self, fn, *args):
+        if self._blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    @asynccontextmanager
+    async def _store_lock(self):
+        lock = self.store.lock(self.key)
+        await self._io(lock.__enter__)
+        try:
+            yield
+        except BaseException as e:
+            if not await self._io(lock.__exit__, type(e), e, e.__traceback__):
+                raise
+        else:
+            await self._io(lock.__exit__, None, None, None)
+
+    async def get_token(self):
+        """Return a valid access token, renewing it if it is missing or expired. See TokenManager."""
+        cached = await self._io(self.store.get, self.key)
+        state = self.state(cached)
+        if state == FRESH:
+            return cached[0]
+        if state == EXPIRING and self.background_refresh:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.ensure_future(self._refresh_in_background(cached[0]))
+            return cached[0]
+        return await self._renew(stale=cached[0] if cached else None)
+
+    async def refresh(self):
+        """Force a token renewal regardless of the cached expiry."""
+        async with self._renew_lock:
+            async with self._store_lock():
+                return await self._fetch_and_store()
+
+    async def invalidate(self, token):
+        """Drop token from the cache if it is still the current one, e.g. after a 401."""
+        cached = await self._io(self.store.get, self.key)
+        if cached is not None and cached[0] == token:
+            await self._io(self.store.delete, self.key)
+
+    async def _renew(self, stale):
+        async with self._renew_lock:
+            cached = await self._io(self.store.get, self.key)
+            if self.renewed(cached, stale):
+                return cached[0]
+            try:
+                async with self._store_lock():
+                    cached = await self._io(self.store.get, self.key)
+                    if self.renewed(cached, stale):
+                        return cached[0]
+                    return await self._fetch_and_store()
+            except TimeoutError:
+                cached = await self._io(self.store.get, self.key)
+                if self.renewed(cached, stale):
+                    return cached[0]
+                raise
+
+    async def _fetch_and_store(self):
+        token, expires_in = await self.fetch()
+        await self._io(self.store.set, self.key, token, self.clock() + expires_in)
+        self.refresh_count += 1
+        return token
+
+    async def _refresh_in_background(self, stale):
+        try:
+            await self._renew(stale)
+        except Exception:
+            # The foreground path renews once the token actually expires,
+            # and surfaces the error there.
+            pass
+
+
+class AsyncMPesaSDK:
+    """Asyncio MPesa SDK with the same operations as MPesaSDK."""
+
+    def __init__(self, consumer_key, consumer_secret, environment='sandbox', transport=None,
+                 token_store=None, token_refresh_margin=DEFAULT_REFRESH_MARGIN, base_url=None,
+                 passkey=None, certificate=None, initiator_password=None, credential_ttl=3600,
+                 instrumentation=None, background_token_refresh=True, market=DEFAULT_MARKET):
+        """
+        Initialize the async MPesa SDK.
+
+        Args:
+            consumer_key (str): The consumer key provided by Safaricom.
+            consumer_secret (str): The consumer secret provided by Safaricom.
+            environment (str): Either 'sandbox' or 'production'.
+            transport (AsyncTransport): Optional HTTP transport.
+            token_store: Optional token store shared with other clients or
+                processes, e.g. a FileTokenStore or RedisTokenStore. Its I/O
+                runs on worker threads.
+            token_refresh_margin (float): Seconds before expiry at which the
+                access token is renewed.
+            base_url (str): Overrides the environment base URL, e.g. to point at
+                a local mock server.
+            passkey, certificate, initiator_password, credential_ttl: See MPesaSDK.
+            instrumentation (Instrumentation): Optional metrics/tracing hooks,
+                passed to the transport this SDK creates.
+            background_token_refresh (bool): Renew tokens that are about to
+                expire on a background task instead of in the calling coroutine.
+            market (str): Market whose MSISDN format is enforced on B2C
+                request bodies. See MPesaSDK.
+        """
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.environment = environment
+        self.market = market
+        self.base_url = base_url or payloads.base_url(environment)
+        self.access_token = None
+        self.instrumentation = instrumentation
+        self._owns_transport = transport is None
+        self.transport = transport if transport is not None else AsyncTransport(instrumentation=instrumentation)
+        self.tokens = AsyncTokenManager(
+            self._fetch_token,
+            key=f"{environment}:{consumer_key}",
+            store=token_store,
+            refresh_margin=token_refresh_margin,
+            background_refresh=background_token_refresh,
+        )
+        self.credentials = CredentialProvider(passkey, certificate, initiator_password, credential_ttl)
+
+    async def close(self):
+        """Release pooled connections held by a transport this SDK created."""
+        if self._owns_transport:
+            await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def authenticate(self):
+        """
+        Authenticate with the Safaricom API to get an access token.
+
+        Raises:
+            AuthenticationError: If authentication fails.
+        """
+        self.access_token = await self.tokens.refresh()
+
+    async def get_token(self):
+        """
+        Return a valid access token, renewing it if it is missing or about to expire.
+
+        Only one coroutine renews at a time; the others wait for its result.
+        """
+        return await self.tokens.get_token()
+
+    async def _fetch_token(self):
+        if self.instrumentation is None:
+            return await self._request_token()
+        start = time.perf_counter()
+        try:
+            token = await self._request_token()
+        except MPesaError as e:
+            self.instrumentation.on_token_refresh(time.perf_counter() - start, e)
+            raise
+        self.instrumentation.on_token_refresh(time.perf_counter() - start)
+        return token
+
+    async def _request_token(self):
+        url = self.base_url + payloads.TOKEN_PATH
+        headers = payloads.basic_auth_headers(self.consumer_key, self.consumer_secret)
+        response = await self.transport.get(url, headers=headers, operation=payloads.TOKEN)
+        if response.status_code != 200:
+            raise AuthenticationError(f"Authentication failed: {response.text}")
+        return payloads.parse_token(response.json())
+
+    async def _post(self, operation, path, payload, data=None, decode=None):
+        if payload is not None:
+            validate_payload(operation, payload, self.market)
+        if self.instrumentation is None:
+            return await self._send(operation, path, payload, data, decode)
+        with self.instrumentation.start_span(
+                f"mpesa.{operation}", {"mpesa.operation": operation, "http.request.method": "POST"}) as span:
+            try:
+                return await self._send(operation, path, payload, data, decode)
+            except MPesaError as e:
+                span.set_attribute("error.type", type(e).__name__)
+                if getattr(e, "status_code", None) is not None:
+                    span.set_attribute("http.response.status_code", e.status_code)
+                span.record_exception(e)
+                raise
+
+    async def _send(self, operation, path, payload, data=None, decode=None):
+        url = self.base_url + path
+        token = self.access_token = await self.get_token()
+        response = await self.transport.post(
+            url, headers=payloads.bearer_headers(token), json=payload, operation=operation, data=data)
+        if response.status_code == 401:
+            await self.tokens.invalidate(token)
+            token = self.access_token = await self.get_token()
+            response = await self.transport.post(
+                url, headers=payloads.bearer_headers(token), json=payload, operation=operation, data=data)
+        raise_for_response(payloads.DESCRIPTIONS[operation], response.status_code, response.text)
+        return response.json() if decode is None else decode(response.content)
+
+    async def send(self, request):
+        """Send a typed request model. See MPesaSDK.send."""
+        if request.OPERATION == payloads.STK_PUSH and request.password is None:
+            request.password, request.timestamp = self.credentials.stk_password(
+                request.business_short_code, None, request.timestamp)
+        elif request.OPERATION == payloads.B2C_PAYMENT and request.security_credential is None:
+            request.security_credential = self.credentials.security_credential(request.initiator_name)
+        validate_payload(request.OPERATION, request.to_dict(), self.market)
+        return await self._post(request.OPERATION, request.PATH, None, request.to_json(), request.RESPONSE)
+
+    async def stk_push(self, merchant_request_id, business_short_code, password, timestamp, transaction_type, amount, party_a, party_b, phone_number, callback_url, account_reference, transaction_desc, reference_data):
+        """Initiate an STK Push. See MPesaSDK.stk_push."""
+        password, timestamp = self.credentials.stk_password(business_short_code, password, timestamp)
+        payload = payloads.stk_push(
+            merchant_request_id, business_short_code, password, timestamp, transaction_type, amount,
+            party_a, party_b, phone_number, callback_url, account_reference, transaction_desc, reference_data)
+        return await self._post(payloads.STK_PUSH, payloads.STK_PUSH_PATH, payload)
+
+    async def c2b_register_url(self, short_code, response_type, confirmation_url, validation_url):
+        """Register C2B URLs. See MPesaSDK.c2b_register_url."""
+        payload = payloads.c2b_register_url(short_code, response_type, confirmation_url, validation_url)
+        return await self._post(payloads.C2B_REGISTER_URL, payloads.c2b_register_url_path(self.consumer_key), payload)
+
+    async def c2b_payment(self, request_ref_id, command_id, remark, channel_session_id, source_system, timestamp, parameters, reference_data, initiator, primary_party, receiver_party):
+        """Process a C2B payment. See MPesaSDK.c2b_payment."""
+        payload = payloads.c2b_payment(
+            request_ref_id, command_id, remark, channel_session_id, source_system, timestamp,
+            parameters, reference_data, initiator, primary_party, receiver_party)
+        return await self._post(payloads.C2B_PAYMENT, payloads.C2B_PAYMENT_PATH, payload)
+
+    async def b2c_payment_request(self, initiator_name, security_credential, command_id, amount, party_a, party_b, remarks, queue_timeout_url, result_url, occasion):
+        """Make a B2C payment request. See MPesaSDK.b2c_payment_request."""
+        security_credential = self.credentials.security_credential(initiator_name, security_credential)
+        payload = payloads.b2c_payment_request(
+            initiator_name, security_credential, command_id, amount, party_a, party_b,
+            remarks, queue_timeout_url, result_url, occasion)
+        return await self._post(payloads.B2C_PAYMENT, payloads.B2C_PAYMENT_PATH, payload)
+
+
+async def gather_bounded(calls, concurrency=DEFAULT_CONCURRENCY, return_exceptions=False):
+    """
+    Run many SDK calls with at most ``concurrency`` in flight.
+
+    Calls are pulled lazily from the iterable, so thousands of calls never
+    create thousands of pending coroutines at once.
+
+    Args:
+        calls (iterable): Zero-argument callables returning awaitables, e.g.
+            ``functools.partial(sdk.stk_push, ...)``.
+        concurrency (int): Maximum number of calls in flight.
+        return_exceptions (bool): Return exceptions in place of results instead
+            of raising the first one.
+
+    Returns:
+        list: Results in the same order as ``calls``.
+    """
+    iterator = iter(enumerate(calls))
+    results = {}
+
+    async def worker():
+        for index, call in iterator:
+            try:
+                results[index] = await call()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[index] = e
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for w in workers:
+            w.cancel()
+        raise
+    return [results[i] for i in range(len(results))]
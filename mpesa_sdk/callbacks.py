@@ -0,0 +1,333 @@
+"""
+Embeddable receiver for Safaricom callbacks.
+
+Parses STK push results, C2B validation/confirmation notifications and B2C
+results into typed objects, acknowledges them immediately and hands them to
+user handlers on a bounded worker pool. Duplicate deliveries are dropped using
+a fixed-size dedup window. Usable as a WSGI app (``receiver.wsgi``), an ASGI
+app (``receiver.asgi``) or directly via ``receiver.handle(path, body)``.
+"""
+import json
+import logging
+import queue
+import threading
+
+from .models import loads
+
+logger = logging.getLogger(__name__)
+
+STK = "stk"
+C2B_VALIDATION = "c2b_validation"
+C2B_CONFIRMATION = "c2b_confirmation"
+B2C_RESULT = "b2c_result"
+B2C_TIMEOUT = "b2c_timeout"
+
+DEFAULT_ROUTES = {
+    "/mpesa/stk": STK,
+    "/mpesa/c2b/validation": C2B_VALIDATION,
+    "/mpesa/c2b/confirmation": C2B_CONFIRMATION,
+    "/mpesa/b2c/result": B2C_RESULT,
+    "/mpesa/b2c/timeout": B2C_TIMEOUT,
+}
+
+ACCEPTED = {"ResultCode": 0, "ResultDesc": "Accepted"}
+# Safaricom's documented C2B validation rejection for errors without a more
+# specific code; sent when the validator itself fails.
+VALIDATION_FAILED = {"ResultCode": "C2B00016", "ResultDesc": "Other Error"}
+
+
+def _items(entries, key_field):
+    """Flatten Safaricom's [{"Name"/"Key": k, "Value": v}, ...] lists into a dict."""
+    if isinstance(entries, dict):
+        entries = [entries]
+    return {entry[key_field]: entry.get("Value") for entry in entries or ()}
+
+
+class StkCallback:
+    """Result of an STK push, posted to the request's CallBackURL."""
+
+    __slots__ = ("merchant_request_id", "checkout_request_id", "result_code", "result_desc", "metadata", "raw")
+    kind = STK
+
+    def __init__(self, data):
+        callback = data["Body"]["stkCallback"]
+        self.merchant_request_id = callback.get("MerchantRequestID")
+        self.checkout_request_id = callback.get("CheckoutRequestID")
+        self.result_code = int(callback.get("ResultCode", -1))
+        self.result_desc = callback.get("ResultDesc")
+        self.metadata = _items((callback.get("CallbackMetadata") or {}).get("Item"), "Name")
+        self.raw = data
+
+    @property
+    def successful(self):
+        return self.result_code == 0
+
+    @property
+    def dedup_key(self):
+        return (STK, self.checkout_request_id or self.merchant_request_id)
+
+
+class C2BNotification:
+    """C2B validation request or payment confirmation."""
+
+    __slots__ = ("kind", "transaction_type", "transaction_id", "transaction_time", "amount",
+                 "business_short_code", "bill_ref_number", "invoice_number", "org_account_balance",
+                 "third_party_transaction_id", "msisdn", "first_name", "raw")
+
+    def __init__(self, data, kind):
+        self.kind = kind
+        self.transaction_type = data.get("TransactionType")
+        self.transaction_id = data.get("TransID")
+        self.transaction_time = data.get("TransTime")
+        self.amount = data.get("TransAmount")
+        self.business_short_code = data.get("BusinessShortCode")
+        self.bill_ref_number = data.get("BillRefNumber")
+        self.invoice_number = data.get("InvoiceNumber")
+        self.org_account_balance = data.get("OrgAccountBalance")
+        self.third_party_transaction_id = data.get("ThirdPartyTransID")
+        self.msisdn = data.get("MSISDN")
+        self.first_name = data.get("FirstName")
+        self.raw = data
+
+    @property
+    def dedup_key(self):
+        return (self.kind, self.transaction_id)
+
+
+class B2CResult:
+    """Result or queue timeout of a B2C payment, posted to ResultURL/QueueTimeOutURL."""
+
+    __slots__ = ("kind", "result_type", "result_code", "result_desc", "originator_conversation_id",
+                 "conversation_id", "transaction_id", "parameters", "reference_data", "raw")
+
+    def __init__(self, data, kind):
+        result = data["Result"]
+        self.kind = kind
+        self.result_type = result.get("ResultType")
+        self.result_code = int(result.get("ResultCode", -1))
+        self.result_desc = result.get("ResultDesc")
+        self.originator_conversation_id = result.get("OriginatorConversationID")
+        self.conversation_id = result.get("ConversationID")
+        self.transaction_id = result.get("TransactionID")
+        self.parameters = _items((result.get("ResultParameters") or {}).get("ResultParameter"), "Key")
+        self.reference_data = _items((result.get("ReferenceData") or {}).get("ReferenceItem"), "Key")
+        self.raw = data
+
+    @property
+    def successful(self):
+        return self.result_code == 0
+
+    @property
+    def dedup_key(self):
+        return (self.kind, self.conversation_id or self.originator_conversation_id, self.transaction_id)
+
+
+PARSERS = {
+    STK: StkCallback,
+    C2B_VALIDATION: lambda data: C2BNotification(data, C2B_VALIDATION),
+    C2B_CONFIRMATION: lambda data: C2BNotification(data, C2B_CONFIRMATION),
+    B2C_RESULT: lambda data: B2CResult(data, B2C_RESULT),
+    B2C_TIMEOUT: lambda data: B2CResult(data, B2C_TIMEOUT),
+}
+
+
+class DedupWindow:
+    """
+    Remembers the last ``capacity`` keys in fixed memory.
+
+    Keys live in a ring buffer plus a dict of their ring slots; inserting past
+    capacity evicts the oldest key, so memory never grows with traffic.
+    """
+
+    def __init__(self, capacity=100_000):
+        self.capacity = capacity
+        self._ring = [None] * capacity
+        self._keys = {}
+        self._pos = 0
+        self._lock = threading.Lock()
+
+    def add(self, key):
+        """
+        Record key.
+
+        Returns:
+            bool: False if key was already in the window.
+        """
+        with self._lock:
+            if key in self._keys:
+                return False
+            evicted = self._ring[self._pos]
+            if evicted is not None:
+                del self._keys[evicted]
+            self._ring[self._pos] = key
+            self._keys[key] = self._pos
+            self._pos = (self._pos + 1) % self.capacity
+            return True
+
+    def discard(self, key):
+        """Forget key so a redelivery is processed."""
+        with self._lock:
+            slot = self._keys.pop(key, None)
+            if slot is not None:
+                # Clear the slot too, or it would later evict the key again
+                # if it is re-added in the meantime.
+                self._ring[slot] = None
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class CallbackReceiver:
+    """Acknowledges Safaricom callbacks and processes them on a bounded worker pool."""
+
+    def __init__(self, handlers=None, validator=None, routes=None, workers=4, queue_size=10_000,
+                 dedup_size=100_000):
+        """
+        Initialize the receiver.
+
+        Args:
+            handlers (dict): Maps a callback kind (STK, C2B_CONFIRMATION,
+                B2C_RESULT, B2C_TIMEOUT) to a callable taking the parsed
+                object. Handlers run on worker threads, after the ack.
+            validator (callable): Decides C2B validation requests inline. Takes a
+                C2BNotification and returns True to accept, or a
+                (result_code, result_desc) pair to reject. Accepts everything
+                when omitted. If it raises, the error is logged and the
+                payment rejected with VALIDATION_FAILED.
+            routes (dict): Maps URL paths to callback kinds. Defaults to DEFAULT_ROUTES.
+            workers (int): Worker threads running handlers.
+            queue_size (int): Callbacks that may wait for a worker. When full,
+                new callbacks get a 503 so Safaricom redelivers them later.
+            dedup_size (int): Number of recent callbacks remembered for dedup.
+        """
+        self.handlers = dict(handlers or {})
+        self.validator = validator
+        self.routes = dict(routes or DEFAULT_ROUTES)
+        self.dedup = DedupWindow(dedup_size)
+        self.queue = queue.Queue(queue_size)
+        self.stats = {"received": 0, "duplicates": 0, "rejected": 0, "invalid": 0, "processed": 0, "failed": 0,
+                      "validator_errors": 0}
+        self._stats_lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"mpesa-callback-{n}", daemon=True)
+            for n in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def handle(self, path, body):
+        """
+        Parse, dedup and enqueue one callback.
+
+        Args:
+            path (str): Request path.
+            body (bytes): Raw JSON request body.
+
+        Returns:
+            tuple: (HTTP status, response dict) to send back to Safaricom.
+        """
+        kind = self.routes.get(path)
+        if kind is None:
+            return 404, {"ResultCode": 1, "ResultDesc": "Unknown callback"}
+        try:
+            callback = PARSERS[kind](loads(body))
+        except (ValueError, KeyError, TypeError):
+            self._count("invalid")
+            return 400, {"ResultCode": 1, "ResultDesc": "Malformed callback"}
+        self._count("received")
+
+        if kind == C2B_VALIDATION:
+            return 200, self._validate(callback)
+        if not self.dedup.add(callback.dedup_key):
+            self._count("duplicates")
+            return 200, ACCEPTED
+        try:
+            self.queue.put_nowait(callback)
+        except queue.Full:
+            self.dedup.discard(callback.dedup_key)
+            self._count("rejected")
+            return 503, {"ResultCode": 1, "ResultDesc": "Busy, retry later"}
+        return 200, ACCEPTED
+
+    def _validate(self, notification):
+        if self.validator is None:
+            return {"ResultCode": "0", "ResultDesc": "Accepted"}
+        try:
+            decision = self.validator(notification)
+            if decision is True:
+                return {"ResultCode": "0", "ResultDesc": "Accepted"}
+            code, desc = decision
+        except Exception:
+            self._count("validator_errors")
+            logger.exception("C2B validator failed for %r", notification.dedup_key)
+            return dict(VALIDATION_FAILED)
+        return {"ResultCode": code, "ResultDesc": desc}
+
+    def _work(self):
+        while True:
+            callback = self.queue.get()
+            if callback is None:
+                self.queue.task_done()
+                return
+            handler = self.handlers.get(callback.kind)
+            try:
+                if handler is not None:
+                    handler(callback)
+                self._count("processed")
+            except Exception:
+                self._count("failed")
+                logger.exception("Callback handler failed for %r", callback.dedup_key)
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        """Block until every queued callback has been handled."""
+        self.queue.join()
+
+    def close(self):
+        """Finish queued callbacks and stop the workers."""
+        for _ in self._workers:
+            self.queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def wsgi(self, environ, start_response):
+        """WSGI entry point."""
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        body = environ["wsgi.input"].read(length) if length else b""
+        status, data = self.handle(environ.get("PATH_INFO", ""), body)
+        raw = json.dumps(data).encode()
+        start_response(f"{status} {_REASONS.get(status, '')}".rstrip(), [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(raw))),
+        ])
+        return [raw]
+
+    async def asgi(self, scope, receive, send):
+        """ASGI entry point."""
+        if scope["type"] != "http":
+            return
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        status, data = self.handle(scope["path"], b"".join(chunks))
+        raw = json.dumps(data).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(raw)).encode())],
+        })
+        await send({"type": "http.response.body", "body": raw})
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 503: "Service Unavailable"}
@@ -0,0 +1,520 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import payloads
+from .constants import DEFAULT_MARKET
+from .endpoints import DEFAULT_HEDGE_TIMEOUT, EndpointSet, rebaser
+from .exceptions import (
+    MPesaError, AuthenticationError, APIRequestError, RetryableError, FatalError, CircuitOpenError,
+    raise_for_response,
+)
+from .operations import OperationExecutor, B2B_PAYMENT, REVERSAL, QUERY_TRANSACTION_STATUS
+from .retry import Retrier
+from .security import CredentialProvider
+from .tokens import TokenManager
+from .transport import Transport
+from .validation import validate_payload
+
+logger = logging.getLogger(__name__)
+
+
+class MPesaSDK:
+    """MPesa SDK for interacting with Safaricom APIs."""
+
+    def __init__(self, consumer_key, consumer_secret, environment='sandbox', transport=None,
+                 token_store=None, token_refresh_margin=60, background_token_refresh=True,
+                 base_url=None, retrier=None, market=DEFAULT_MARKET, operation_defaults=None,
+                 use_spec_ports=True, passkey=None, certificate=None, initiator_password=None,
+                 credential_ttl=3600, instrumentation=None, endpoints=None, hedge=False, hedge_delay=None,
+                 hedge_workers=16, recorder=None, hedge_timeout=DEFAULT_HEDGE_TIMEOUT):
+        """
+        Initialize the MPesa SDK.
+
+        Args:
+            consumer_key (str): The consumer key provided by Safaricom.
+            consumer_secret (str): The consumer secret provided by Safaricom.
+            environment (str): Either 'sandbox' or 'production'.
+            transport (Transport): Optional HTTP transport. A pooled keep-alive
+                transport with default timeouts is created when omitted.
+            token_store: Optional token store (MemoryTokenStore, FileTokenStore or
+                RedisTokenStore) used to share one access token between SDK
+                instances or worker processes.
+            token_refresh_margin (float): Seconds before expiry at which the
+                access token is renewed.
+            background_token_refresh (bool): Renew tokens that are about to expire
+                on a background thread instead of on the calling thread.
+            base_url (str): Overrides the environment base URL, e.g. to point at
+                a local mock server.
+            retrier (Retrier): Retry policy, per-operation circuit breakers and
+                request ID tracking. Pass ``Retrier(RetryPolicy(max_attempts=1))``
+                to disable retries.
+            market (str): Market whose MSISDN format is enforced by local
+                validation, e.g. 'ET'.
+            operation_defaults (dict): Field defaults for the spec-driven
+                operations (B2B, reversal, status query), e.g.
+                ``{'from': '171717'}`` for the service provider code.
+            use_spec_ports (bool): Send spec-driven operations to the port given
+                in constants.DEFAULT_OPERATIONS rather than the base URL's port.
+            passkey (str): Lipa na M-Pesa passkey. Lets stk_push build the
+                password and timestamp itself.
+            certificate (bytes or str): Safaricom public certificate (PEM or
+                path). Together with initiator_password, lets
+                b2c_payment_request build the security credential itself.
+            initiator_password (str): Initiator password for B2C requests.
+            credential_ttl (float): Seconds an encrypted security credential is
+                reused before being encrypted again.
+            instrumentation (Instrumentation): Optional metrics/tracing hooks,
+                e.g. instrumentation.Metrics() or OpenTelemetryInstrumentation().
+                They are passed to the transport and retrier this SDK creates;
+                a transport or retrier passed in keeps its own.
+            endpoints (list or EndpointSet): Several base URLs for the API.
+                Each call goes to the healthiest, fastest one and retries fail
+                over to the others; see endpoints.EndpointSet. ``base_url``
+                defaults to the first.
+            hedge (bool): Hedge read-only calls (status queries) across
+                endpoints: send a second request when the first is slower
+                than the endpoint's recent p95 latency. Token requests fail
+                over but are not hedged.
+            hedge_delay (float): Fixed hedge delay in seconds instead of the
+                measured p95.
+            hedge_workers (int): Threads running hedged requests.
+            recorder (recorder.TrafficRecorder): Captures every request and
+                response of the transport this SDK creates, for replay.
+            hedge_timeout (float): Longest a hedged call waits for an answer
+                from either endpoint, in seconds.
+        """
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.environment = environment
+        if endpoints is not None and not isinstance(endpoints, EndpointSet):
+            endpoints = EndpointSet(endpoints)
+        self.endpoints = endpoints
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_workers = hedge_workers
+        self.hedge_timeout = hedge_timeout
+        self._hedge_pool = None
+        self.base_url = base_url or (endpoints.primary if endpoints is not None else self._get_base_url())
+        self.access_token = None
+        self.instrumentation = instrumentation
+        self._owns_transport = transport is None
+        self.transport = transport if transport is not None else Transport(
+            instrumentation=instrumentation, recorder=recorder)
+        self.tokens = TokenManager(
+            self._fetch_token,
+            key=f"{environment}:{consumer_key}",
+            store=token_store,
+            refresh_margin=token_refresh_margin,
+            background_refresh=background_token_refresh,
+        )
+        self.retrier = retrier if retrier is not None else Retrier(instrumentation=instrumentation)
+        self.market = market
+        self.operation_defaults = operation_defaults
+        self.use_spec_ports = use_spec_ports
+        self._operations = None
+        self._header_cache = (None, None)
+        self.credentials = CredentialProvider(passkey, certificate, initiator_password, credential_ttl)
+
+    def close(self):
+        """Release pooled connections held by a transport this SDK created, and hedging threads."""
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        if self._owns_transport:
+            self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def operations(self):
+        """OperationExecutor for the operations in constants.DEFAULT_OPERATIONS, built on first use."""
+        if self._operations is None:
+            self._operations = OperationExecutor(
+                self, market=self.market, defaults=self.operation_defaults, use_spec_ports=self.use_spec_ports)
+        return self._operations
+
+    def _get_base_url(self):
+        """Get the base URL for the API."""
+        return payloads.base_url(self.environment)
+
+    def _post(self, operation, path, payload):
+        """
+        POST a JSON payload with the current access token.
+
+        Transient failures are retried according to ``self.retrier``. Requests
+        carrying a ``MerchantRequestID`` or ``RequestRefID`` are retried with the
+        same ID and never sent twice for the same ID.
+
+        Args:
+            operation (str): Operation name, e.g. payloads.STK_PUSH.
+            path (str): Endpoint path relative to the base URL.
+            payload (dict): JSON request body.
+
+        Returns:
+            dict: API response.
+
+        Raises:
+            RetryableError: If the request failed transiently and was not, or
+                could no longer be, retried.
+            FatalError: If the API rejected the request.
+        """
+        validate_payload(operation, payload, self.market)
+        return self._request(operation, "POST", self.base_url + path, json=payload,
+                             idempotency_key=payloads.idempotency_key(payload))
+
+    def _request(self, operation, method, url, json=None, params=None, idempotency_key=None, read_only=False,
+                 data=None, decode=None):
+        """
+        Send an authenticated request through the retrier.
+
+        Args:
+            operation (str): Operation name.
+            method (str): HTTP method.
+            url (str): Absolute URL.
+            json (dict): JSON request body.
+            params (dict): Query string parameters.
+            idempotency_key (str): Request ID identifying the request across retries.
+            read_only (bool): The request has no side effects.
+            data (bytes): Pre-encoded JSON body, sent instead of ``json``.
+            decode (callable): Builds the return value from the raw response
+                body. The body is parsed into a dict when omitted.
+
+        Returns:
+            dict: API response.
+        """
+        send = self._attempt(operation, method, url, json, params, data, decode, read_only)
+        if self.instrumentation is None:
+            return self.retrier.call(operation, send, idempotency_key, read_only)
+        with self.instrumentation.start_span(
+                f"mpesa.{operation}", {"mpesa.operation": operation, "http.request.method": method}) as span:
+            try:
+                return self.retrier.call(operation, send, idempotency_key, read_only)
+            except MPesaError as e:
+                span.set_attribute("error.type", type(e).__name__)
+                if getattr(e, "status_code", None) is not None:
+                    span.set_attribute("http.response.status_code", e.status_code)
+                span.record_exception(e)
+                raise
+
+    def _attempt(self, operation, method, url, json, params, data, decode, read_only):
+        """Return a callable sending one attempt of a request, over the endpoint set if there is one."""
+        move = rebaser(url, self.base_url) if self.endpoints is not None else None
+        if move is None:
+            return lambda: self._send(operation, method, url, json, params, data, decode)
+        # Shared by every attempt, so a retry goes to an endpoint that has not failed yet.
+        failed = set()
+        return lambda: self._route(
+            lambda base: self._send(operation, method, move(base), json, params, data, decode), failed, read_only)
+
+    def _route(self, fn, failed=None, read_only=False):
+        """Run ``fn(base_url)`` on the endpoint set, hedged if it is read-only and hedging is on."""
+        failed = set() if failed is None else failed
+        if not (read_only and self.hedge):
+            return self.endpoints.call(fn, failed)
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(self.hedge_workers, thread_name_prefix="mpesa-hedge")
+        # Renew the token here rather than on a hedge worker, so hedged
+        # attempts rarely have to fetch one.
+        self.tokens.get_token()
+        return self.endpoints.hedged(fn, self._hedge_pool, failed, self.hedge_delay, timeout=self.hedge_timeout)
+
+    def _auth_headers(self, token):
+        """Headers for token, rebuilt only when the token changes."""
+        cached = self._header_cache
+        if cached[0] != token:
+            cached = self._header_cache = (token, payloads.bearer_headers(token))
+        return cached[1]
+
+    def _send(self, operation, method, url, json, params, data=None, decode=None):
+        """Send one attempt of a request, renewing the token once on a 401."""
+        start = time.perf_counter()
+        try:
+            token = self.access_token = self.tokens.get_token()
+            response = self.transport.request(
+                method, url, headers=self._auth_headers(token), json=json, params=params, operation=operation,
+                data=data)
+            if response.status_code == 401:
+                # The token was revoked or expired early; renew it once and retry.
+                self.tokens.invalidate(token)
+                token = self.access_token = self.tokens.get_token()
+                response = self.transport.request(
+                    method, url, headers=self._auth_headers(token), json=json, params=params,
+                    operation=operation, data=data)
+        except APIRequestError as e:
+            e.latency = time.perf_counter() - start
+            raise
+        raise_for_response(
+            payloads.DESCRIPTIONS.get(operation, operation), response.status_code, response.text,
+            time.perf_counter() - start)
+        return response.json() if decode is None else decode(response.content)
+
+    def authenticate(self):
+        """
+        Authenticate with the Safaricom API to get an access token.
+
+        Tokens are also obtained and renewed automatically on first use, so
+        calling this is only needed to fail fast on bad credentials.
+
+        Raises:
+            AuthenticationError: If authentication fails.
+        """
+        self.access_token = self.tokens.refresh()
+        logger.info("Authenticated with %s", self.base_url)
+
+    def _fetch_token(self):
+        """
+        Request a new access token from the Safaricom API.
+
+        Returns:
+            tuple: (access_token, expires_in) pair.
+
+        Raises:
+            AuthenticationError: If authentication fails.
+        """
+        url = self.base_url + payloads.TOKEN_PATH
+        headers = payloads.basic_auth_headers(self.consumer_key, self.consumer_secret)
+
+        if self.instrumentation is None:
+            return self._token(url, headers)
+        start = time.perf_counter()
+        try:
+            token = self._token(url, headers)
+        except MPesaError as e:
+            self.instrumentation.on_token_refresh(time.perf_counter() - start, e)
+            raise
+        self.instrumentation.on_token_refresh(time.perf_counter() - start)
+        return token
+
+    def _token(self, url, headers):
+        """Request a token, from the best endpoint when there is an endpoint set."""
+        if self.endpoints is None:
+            return self._request_token(url, headers)
+        move = rebaser(url, self.base_url)
+        # Never hedged: token requests also run on hedge workers, where
+        # waiting on the hedge pool again could deadlock it.
+        return self.endpoints.call(lambda base: self._request_token(move(base), headers))
+
+    def _request_token(self, url, headers):
+        response = self.transport.get(url, headers=headers, operation=payloads.TOKEN)
+        if response.status_code == 200:
+            logger.debug("Fetched a new access token from %s", url)
+            return payloads.parse_token(response.json())
+        else:
+            logger.warning("Token request to %s failed with status %s", url, response.status_code)
+            raise AuthenticationError(f"Authentication failed: {response.text}")
+
+    def stk_push(self, merchant_request_id, business_short_code, password, timestamp, transaction_type, amount, party_a, party_b, phone_number, callback_url, account_reference, transaction_desc, reference_data):
+        """
+        Initiate an STK Push.
+
+        Args:
+            merchant_request_id (str): Unique ID for the request.
+            business_short_code (str): Short code of the business.
+            password (str): Base64 encoded string combining short code, passkey, and timestamp.
+                Generated from the configured passkey when None.
+            timestamp (str): Timestamp of the request. Generated when None.
+            transaction_type (str): Type of transaction, e.g., "CustomerPayBillOnline".
+            amount (float): Amount to be transacted.
+            party_a (str): Phone number sending the money.
+            party_b (str): Business short code receiving the money.
+            phone_number (str): Phone number sending the money.
+            callback_url (str): URL to receive the callback.
+            account_reference (str): Account reference for the transaction.
+            transaction_desc (str): Description of the transaction.
+            reference_data (dict): Additional reference data.
+
+        Returns:
+            dict: API response.
+        """
+        password, timestamp = self.credentials.stk_password(business_short_code, password, timestamp)
+        payload = payloads.stk_push(
+            merchant_request_id, business_short_code, password, timestamp, transaction_type, amount,
+            party_a, party_b, phone_number, callback_url, account_reference, transaction_desc, reference_data)
+        return self._post(payloads.STK_PUSH, payloads.STK_PUSH_PATH, payload)
+
+    def c2b_register_url(self, short_code, response_type, confirmation_url, validation_url):
+        """
+        Register C2B URLs.
+
+        Args:
+            short_code (str): The business short code.
+            response_type (str): "Completed" or "Cancelled".
+            confirmation_url (str): URL for payment confirmations.
+            validation_url (str): URL for payment validations.
+
+        Returns:
+            dict: API response.
+        """
+        payload = payloads.c2b_register_url(short_code, response_type, confirmation_url, validation_url)
+        return self._post(payloads.C2B_REGISTER_URL, payloads.c2b_register_url_path(self.consumer_key), payload)
+
+    def c2b_payment(self, request_ref_id, command_id, remark, channel_session_id, source_system, timestamp, parameters, reference_data, initiator, primary_party, receiver_party):
+        """
+        Process a C2B payment.
+
+        Args:
+            request_ref_id (str): The unique request reference ID.
+            command_id (str): Transaction type, e.g., "CustomerPayBillOnline."
+            remark (str): Transaction remark.
+            channel_session_id (str): Unique session ID.
+            source_system (str): Source system of the transaction.
+            timestamp (str): Timestamp of the transaction.
+            parameters (list): List of key-value pairs for transaction parameters.
+            reference_data (list): List of key-value pairs for reference data.
+            initiator (dict): Initiator information.
+            primary_party (dict): Primary party information.
+            receiver_party (dict): Receiver party information.
+
+        Returns:
+            dict: API response.
+        """
+        payload = payloads.c2b_payment(
+            request_ref_id, command_id, remark, channel_session_id, source_system, timestamp,
+            parameters, reference_data, initiator, primary_party, receiver_party)
+        return self._post(payloads.C2B_PAYMENT, payloads.C2B_PAYMENT_PATH, payload)
+
+    def b2c_payment_request(self, initiator_name, security_credential, command_id, amount, party_a, party_b, remarks, queue_timeout_url, result_url, occasion):
+        """
+        Make a B2C payment request.
+
+        Args:
+            initiator_name (str): Initiator username.
+            security_credential (str): Base64 encoded security credential.
+                Encrypted from the configured certificate and initiator
+                password when None.
+            command_id (str): Transaction type, e.g., "BusinessPayment".
+            occasion (str): Occasion for the payment.
+            amount (float): Amount to be sent.
+            party_a (str): Organization short code initiating the payment.
+            party_b (str): Customer phone number (format: 251...).
+            remarks (str): Payment remarks.
+            queue_timeout_url (str): URL for timeout response.
+            result_url (str): URL for transaction result.
+
+        Returns:
+            dict: API response.
+
+        Raises:
+            ValidationError: If the fields fail local validation; nothing is sent.
+        """
+        security_credential = self.credentials.security_credential(initiator_name, security_credential)
+        payload = payloads.b2c_payment_request(
+            initiator_name, security_credential, command_id, amount, party_a, party_b,
+            remarks, queue_timeout_url, result_url, occasion)
+        return self._post(payloads.B2C_PAYMENT, payloads.B2C_PAYMENT_PATH, payload)
+
+    def send(self, request):
+        """
+        Send a typed request model.
+
+        Cheaper than the positional methods: the body is serialized straight
+        from the model's slots and the response is parsed only when read. An
+        StkPushRequest without a password, or a B2CRequest without a security
+        credential, has it filled in as stk_push and b2c_payment_request do.
+
+        Args:
+            request (models.Model): e.g. models.StkPushRequest or models.B2CRequest.
+
+        Returns:
+            models.Response: The request's typed response, e.g. StkPushResponse.
+
+        Raises:
+            RetryableError: If the request failed transiently.
+            FatalError: If the API rejected the request.
+            ValidationError: If a B2C request fails local validation; nothing is sent.
+        """
+        if request.OPERATION == payloads.STK_PUSH and request.password is None:
+            request.password, request.timestamp = self.credentials.stk_password(
+                request.business_short_code, None, request.timestamp)
+        elif request.OPERATION == payloads.B2C_PAYMENT and request.security_credential is None:
+            request.security_credential = self.credentials.security_credential(request.initiator_name)
+        validate_payload(request.OPERATION, request.to_dict(), self.market)
+        return self._request(request.OPERATION, "POST", self.base_url + request.PATH, data=request.to_json(),
+                             idempotency_key=request.idempotency_key, decode=request.RESPONSE)
+
+    def execute(self, operation, **fields):
+        """
+        Run any operation described in constants.DEFAULT_OPERATIONS.
+
+        Args:
+            operation (str): Operation name, e.g. 'B2B_PAYMENT'.
+            **fields: Request fields keyed by spec field name.
+
+        Returns:
+            dict: API response.
+
+        Raises:
+            ValidationError: If the fields fail local validation.
+        """
+        return self.operations.execute(operation, fields)
+
+    def b2b_payment(self, receiver_party_code, amount, transaction_reference, third_party_reference,
+                    service_provider_code=None):
+        """
+        Make a B2B payment.
+
+        Args:
+            receiver_party_code (str): Short code of the receiving business.
+            amount (str): Amount to be sent.
+            transaction_reference (str): Unique reference of the transaction.
+            third_party_reference (str): Reference of the caller's own system.
+            service_provider_code (str): Paying short code. Taken from
+                ``operation_defaults`` when omitted.
+
+        Returns:
+            dict: API response.
+        """
+        return self.operations.execute(B2B_PAYMENT, {
+            'from': service_provider_code,
+            'to': receiver_party_code,
+            'amount': amount,
+            'transaction': transaction_reference,
+            'reference': third_party_reference,
+        })
+
+    def reversal(self, transaction_id, amount, third_party_reference, service_provider_code=None,
+                 security_credential=None, initiator_identifier=None):
+        """
+        Reverse a transaction.
+
+        Args:
+            transaction_id (str): ID of the transaction to reverse.
+            amount (str): Amount to reverse.
+            third_party_reference (str): Reference of the caller's own system.
+            service_provider_code (str): Short code that received the payment.
+            security_credential (str): Encrypted initiator credential.
+            initiator_identifier (str): Initiator username.
+
+        Returns:
+            dict: API response.
+        """
+        return self.operations.execute(REVERSAL, {
+            'to': service_provider_code,
+            'amount': amount,
+            'transaction': transaction_id,
+            'reference': third_party_reference,
+            'security_credential': security_credential,
+            'initiator_identifier': initiator_identifier,
+        })
+
+    def query_transaction_status(self, query_reference, third_party_reference, service_provider_code=None):
+        """
+        Query the status of a transaction.
+
+        Args:
+            query_reference (str): Transaction ID or reference to look up.
+            third_party_reference (str): Reference of the caller's own system.
+            service_provider_code (str): Short code the transaction belongs to.
+
+        Returns:
+            dict: API response.
+        """
+        return self.operations.execute(QUERY_TRANSACTION_STATUS, {
+            'from': service_provider_code,
+            'subject': query_reference,
+            'reference': third_party_reference,
+        })
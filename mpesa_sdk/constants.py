@@ -1,12 +1,33 @@
 import re
 
 PATTERNS = {
-  'PHONE_NUMBER': re.compile('^((00|\+)?258)?8[45][0-9]{7}$'),
-  'SERVICE_PROVIDER_CODE': re.compile('^[0-9]{5,6}$'),
-  'WORD': re.compile('\\w+'),
-  'MONEY_AMOUNT': re.compile( '^[1-9][0-9]*(\.[0-9])*$')
+  'PHONE_NUMBER': re.compile(r'^((00|\+)?258)?8[45][0-9]{7}$'),
+  'SERVICE_PROVIDER_CODE': re.compile(r'^[0-9]{5,6}$'),
+  'WORD': re.compile(r'\w+'),
+  'MONEY_AMOUNT': re.compile(r'^[1-9][0-9]*(\.[0-9]{1,2})?$')
 }
 
+# Per-market overrides of PATTERNS, looked up by pattern name. 'ET' matches
+# Safaricom Ethiopia numbers (2517XXXXXXXX), 'MZ' the original 258 numbers.
+MARKET_PATTERNS = {
+  'ET': {
+    'PHONE_NUMBER': re.compile(r'^((00|\+)?251|0)?7[0-9]{8}$')
+  },
+  'MZ': {
+    'PHONE_NUMBER': PATTERNS['PHONE_NUMBER']
+  }
+}
+
+DEFAULT_MARKET = 'ET'
+
+# HTTP defaults shared by the sync and async transports. The timeouts are
+# (connect, read) in seconds: Safaricom normally answers well under the read
+# timeout; anything slower is treated as a failed request rather than left to
+# hold a worker indefinitely.
+DEFAULT_TIMEOUT = (3.05, 30)
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 20
+
 DEFAULT_OPERATIONS = {
   'C2B_PAYMENT': {
       'method': 'POST',
@@ -149,4 +170,38 @@ DEFAULT_OPERATIONS = {
         'from' 
       ]
   }
-}
\ No newline at end of file
+}
+
+# Checks applied to the request bodies MPesaSDK builds for the Daraja APIs
+# (b2c_payment_request, send), keyed by SDK operation. Same form as
+# DEFAULT_OPERATIONS, but the bodies already use API field names, so each
+# field maps to itself.
+PAYLOAD_OPERATIONS = {
+  'b2c_payment': {
+      'method': 'POST',
+      'port': None,
+      'path': '/mpesa/b2c/v1/paymentrequest',
+      'mapping': {
+        'InitiatorName': 'InitiatorName',
+        'CommandID': 'CommandID',
+        'Amount': 'Amount',
+        'PartyA': 'PartyA',
+        'PartyB': 'PartyB'
+      },
+      'validation': {
+        'InitiatorName': PATTERNS['WORD'],
+        'CommandID': PATTERNS['WORD'],
+        'Amount': PATTERNS['MONEY_AMOUNT'],
+        'PartyA': PATTERNS['SERVICE_PROVIDER_CODE'],
+        'PartyB': PATTERNS['PHONE_NUMBER']
+      },
+      'required': [
+        'InitiatorName',
+        'CommandID',
+        'Amount',
+        'PartyA',
+        'PartyB'
+      ],
+      'optional': []
+  }
+}
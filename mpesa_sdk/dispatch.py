@@ -0,0 +1,419 @@
+"""
+Durable dispatch of outbound requests.
+
+Every request is appended to a local write-ahead log, and made durable,
+before a worker sends it; its outcome is appended once known. After a crash,
+``recover()`` replays the log: requests with no recorded outcome may or may
+not have reached Safaricom, so each is looked up with a status query and
+either marked as processed, sent again with the same request ID, or reported
+as in doubt.
+
+Appends use group commit: while one thread fsyncs, the others queue their
+records behind it and are made durable by the next single fsync, so many
+concurrent submitters share one disk flush instead of paying one each. Once
+the log grows past ``compact_bytes`` it is rewritten with only the entries
+still unsettled, so a long-running dispatcher keeps a small log.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .exceptions import FatalError, MPesaError
+from .models import B2CRequest, C2BPaymentRequest, StkPushRequest, loads
+from .transport import requests_sent
+
+logger = logging.getLogger(__name__)
+
+SENT = "sent"
+FAILED = "failed"
+IN_DOUBT = "in_doubt"
+PROCESSED = "processed"
+
+DEFAULT_COMPACT_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_SETTLED = 10_000
+# Status query answers that prove a transaction went through. Anything else,
+# including a pending or unrecognized status, leaves the entry in doubt.
+COMPLETED_STATUSES = frozenset({"Completed"})
+# Response code fields checked for an explicit "transaction unknown" answer.
+RESPONSE_CODE_FIELDS = ("output_ResponseCode", "errorCode", "ResultCode")
+
+MODELS = {cls.__name__: cls for cls in (StkPushRequest, C2BPaymentRequest, B2CRequest)}
+
+
+class WriteAheadLog:
+    """Append-only JSONL log with group commit."""
+
+    def __init__(self, path, fsync=True, commit_delay=0.0):
+        """
+        Args:
+            path (str): Log file.
+            fsync (bool): fsync each commit. Without it records reach the OS
+                page cache only and can be lost on power failure, though not
+                on a process crash.
+            commit_delay (float): Seconds a committing thread waits for more
+                records to join its batch before flushing.
+        """
+        self.path = path
+        self.fsync = fsync
+        self.commit_delay = commit_delay
+        self.commits = 0
+        self._buffer = []
+        self._appended = 0
+        self._durable = 0
+        self._committing = False
+        self._cond = threading.Condition()
+        torn = os.path.exists(path) and os.path.getsize(path) > 0 and not self._ends_with_newline(path)
+        self._file = open(path, "a")
+        if torn:
+            self._file.write("\n")
+        self.size = self._file.tell()
+
+    @staticmethod
+    def _ends_with_newline(path):
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def read(self):
+        """Yield every record in the log, skipping a torn final line."""
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def append(self, record, durable=True):
+        """
+        Append a record.
+
+        Args:
+            record (dict): JSON-serializable record.
+            durable (bool): Block until the record is committed. Otherwise it
+                is written with the next commit or on close().
+        """
+        line = json.dumps(record, default=str) + "\n"
+        with self._cond:
+            self._buffer.append(line)
+            self._appended += 1
+            if not durable:
+                return
+            target = self._appended
+            while self._durable < target:
+                if self._committing:
+                    self._cond.wait()
+                    continue
+                self._committing = True
+                self._cond.release()
+                try:
+                    if self.commit_delay:
+                        time.sleep(self.commit_delay)
+                    self._commit()
+                finally:
+                    self._cond.acquire()
+                    self._committing = False
+                    self._cond.notify_all()
+
+    def _commit(self):
+        with self._cond:
+            lines, self._buffer = self._buffer, []
+            upto = self._appended
+        if lines:
+            self._file.write("".join(lines))
+            self._file.flush()
+            self.size = self._file.tell()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.commits += 1
+        with self._cond:
+            self._durable = upto
+
+    def rewrite(self, records):
+        """
+        Atomically replace the log with ``records``, e.g. to drop settled entries.
+
+        Commits are paused while the log is rewritten and ``records`` is only
+        iterated once they are, so a generator can snapshot what to keep
+        without racing appends. Records appended meanwhile go to the new log.
+        """
+        with self._cond:
+            while self._committing:
+                self._cond.wait()
+            self._committing = True
+        try:
+            self._file.close()
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._file = open(self.path, "a")
+            self.size = self._file.tell()
+        finally:
+            with self._cond:
+                self._committing = False
+                self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            while self._committing:
+                self._cond.wait()
+            self._committing = True
+        try:
+            self._commit()
+        finally:
+            with self._cond:
+                self._committing = False
+                self._cond.notify_all()
+        self._file.close()
+
+
+def query_status(sdk, request, unknown_codes=frozenset()):
+    """
+    Default resolver: was an unacknowledged request processed?
+
+    Looks the request up by its request ID with a transaction status query.
+
+    Args:
+        sdk (MPesaSDK): Client the status query is sent with.
+        request (models.Model): Request whose outcome was lost.
+        unknown_codes (collection): Response codes with which the status
+            endpoint says it has never seen a transaction, e.g. bound with
+            ``functools.partial(query_status, unknown_codes={...})``. A bare
+            404 proves nothing, as a wrong path or a proxy answers it too, so
+            without them no request is ever judged safe to send again.
+
+    Returns:
+        tuple: (processed, response). ``processed`` is True if Safaricom
+        reports the transaction completed, False if it explicitly does not
+        know it (safe to send again) and None if that cannot be told, e.g. the
+        request has no request ID or the transaction is still pending or failed.
+    """
+    reference = request.idempotency_key
+    if reference is None:
+        return None, None
+    try:
+        response = sdk.query_transaction_status(reference, reference)
+    except FatalError as e:
+        return (False, None) if _response_code(e.body) in unknown_codes else (None, None)
+    except MPesaError:
+        return None, None
+    if _response_code(response) in unknown_codes:
+        return False, response
+    return (True if _completed(response) else None), response
+
+
+def _response_code(body):
+    if isinstance(body, (str, bytes)):
+        try:
+            body = loads(body)
+        except ValueError:
+            return None
+    if not isinstance(body, dict):
+        return None
+    for field in RESPONSE_CODE_FIELDS:
+        if body.get(field) is not None:
+            return str(body[field])
+    return None
+
+
+def _completed(response):
+    if not isinstance(response, dict):
+        return False
+    status = response.get("output_ResponseTransactionStatus")
+    if status is not None:
+        return status in COMPLETED_STATUSES
+    code = response.get("ResultCode")
+    return code is not None and str(code) == "0"
+
+
+class DurableDispatcher:
+    """Sends typed requests through a write-ahead log and a worker pool."""
+
+    def __init__(self, sdk, log_path, workers=8, fsync=True, commit_delay=0.0, resolver=query_status,
+                 on_result=None, compact_bytes=DEFAULT_COMPACT_BYTES, max_settled=DEFAULT_MAX_SETTLED):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            sdk (MPesaSDK): Client the requests are sent with (via ``sdk.send``).
+            log_path (str): Write-ahead log file. Reuse it across restarts.
+            workers (int): Requests in flight.
+            fsync (bool): fsync log commits. See WriteAheadLog.
+            commit_delay (float): Seconds to gather records per commit. See WriteAheadLog.
+            resolver (callable): ``resolver(sdk, request) -> (processed, response)``
+                deciding what happened to a request whose outcome was lost.
+                Defaults to query_status().
+            on_result (callable): Called as ``on_result(entry_id, status, result)``
+                for every settled entry, including recovered ones.
+            compact_bytes (int): Log size at which it is compacted to the
+                unsettled entries. 0 only compacts in recover().
+            max_settled (int): Settled outcomes kept for status().
+        """
+        self.sdk = sdk
+        self.log = WriteAheadLog(log_path, fsync=fsync, commit_delay=commit_delay)
+        self.resolver = resolver
+        self.on_result = on_result
+        self.compact_bytes = compact_bytes
+        self.max_settled = max_settled
+        self.in_doubt = {}
+        # Logged records of the entries not settled yet, kept for compaction.
+        self._entries = {}
+        self._status = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._compacting = threading.Lock()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="mpesa-dispatch")
+
+    def _loggable(self, request):
+        # Don't keep secrets in the log that the client can regenerate when
+        # the request is sent again.
+        data = request.to_dict()
+        credentials = getattr(self.sdk, "credentials", None)
+        if isinstance(request, StkPushRequest) and credentials is not None and credentials.passkey:
+            data["Password"] = data["Timestamp"] = None
+        if (isinstance(request, B2CRequest) and credentials is not None
+                and credentials.security_credentials is not None and credentials.initiator_password):
+            data["SecurityCredential"] = None
+        return data
+
+    def submit(self, request):
+        """
+        Log a request durably and queue it for sending.
+
+        Args:
+            request (models.Model): StkPushRequest, C2BPaymentRequest or B2CRequest.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the typed response, or
+            raises what ``sdk.send`` raised.
+        """
+        data = self._loggable(request)
+        # Registered before it is logged, so a concurrent compaction keeps it.
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            record = self._entries[entry_id] = {"id": entry_id, "type": type(request).__name__, "request": data}
+        self.log.append(record)
+        return self._pool.submit(self._send, entry_id, request)
+
+    def _send(self, entry_id, request):
+        sent_before = requests_sent(request.OPERATION)
+        try:
+            response = self.sdk.send(request)
+        except MPesaError as e:
+            status = IN_DOUBT if getattr(e, "in_doubt", False) else FAILED
+            self._settle(entry_id, request, status, {"error": str(e), "status_code": getattr(e, "status_code", None)})
+            raise
+        except Exception as e:
+            # Anything else is only in doubt if it came after the request went out.
+            sent = requests_sent(request.OPERATION) > sent_before
+            self._settle(entry_id, request, IN_DOUBT if sent else FAILED, {"error": str(e), "status_code": None})
+            raise
+        self._settle(entry_id, request, SENT, response.to_dict())
+        return response
+
+    def _settle(self, entry_id, request, status, result):
+        # Outcomes need not be durable: a lost one only makes recover()
+        # query the entry's status.
+        self.log.append({"id": entry_id, "status": status, "result": result}, durable=False)
+        with self._lock:
+            if status == IN_DOUBT:
+                # Stays in the log until recover() resolves it.
+                self.in_doubt[entry_id] = request
+            else:
+                self.in_doubt.pop(entry_id, None)
+                self._entries.pop(entry_id, None)
+                self._status[entry_id] = status
+                while len(self._status) > self.max_settled:
+                    self._status.popitem(last=False)
+        if self.on_result is not None:
+            self.on_result(entry_id, status, result)
+        if self.compact_bytes and self.log.size >= self.compact_bytes and self._compacting.acquire(blocking=False):
+            try:
+                self.compact()
+            finally:
+                self._compacting.release()
+
+    def status(self, entry_id):
+        """
+        Outcome of an entry: SENT, FAILED, IN_DOUBT or PROCESSED. None while
+        it is pending, and once ``max_settled`` newer entries have settled.
+        """
+        with self._lock:
+            if entry_id in self.in_doubt:
+                return IN_DOUBT
+            return self._status.get(entry_id)
+
+    def compact(self):
+        """Rewrite the log with only the entries not settled yet."""
+        def unsettled():
+            with self._lock:
+                records = list(self._entries.values())
+            yield from records
+
+        self.log.rewrite(unsettled())
+
+    def recover(self):
+        """
+        Settle entries a previous run left without an outcome.
+
+        Entries whose outcome is missing or in doubt are resolved with the
+        resolver: processed ones are recorded as PROCESSED, unprocessed ones
+        are sent again with the same request ID, and the rest stay in
+        ``self.in_doubt``. The log is then compacted to the unsettled entries.
+        Call before submitting new requests.
+
+        Returns:
+            dict: Number of entries per outcome of the recovery.
+        """
+        entries, statuses = {}, {}
+        for record in self.log.read():
+            if "request" in record:
+                entries[record["id"]] = record
+            else:
+                statuses[record["id"]] = record["status"]
+        pending = {entry_id: record for entry_id, record in entries.items()
+                   if statuses.get(entry_id) in (None, IN_DOUBT)}
+        with self._lock:
+            if entries:
+                self._next_id = max(self._next_id, max(entries) + 1)
+            self._entries.update(pending)
+        # Only unsettled entries need to survive; settled history is dropped.
+        self.compact()
+
+        summary = {PROCESSED: 0, "resent": 0, IN_DOUBT: 0}
+        futures = []
+        for entry_id, record in pending.items():
+            request = MODELS[record["type"]].from_dict(record["request"])
+            processed, response = self.resolver(self.sdk, request)
+            if processed:
+                self._settle(entry_id, request, PROCESSED, response)
+                summary[PROCESSED] += 1
+            elif processed is False:
+                logger.info("Resending entry %s, which never reached the API", entry_id)
+                futures.append(self._pool.submit(self._send, entry_id, request))
+                summary["resent"] += 1
+            else:
+                self._settle(entry_id, request, IN_DOUBT, None)
+                summary[IN_DOUBT] += 1
+        for future in futures:
+            future.exception()
+        return summary
+
+    def close(self):
+        """Wait for queued requests and flush the log."""
+        self._pool.shutdown(wait=True)
+        self.log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,312 @@
+"""
+Endpoint sets with health scoring, failover and hedged requests.
+
+An ``EndpointSet`` holds several base URLs for the same API, e.g. different
+Safaricom edge hosts, and keeps latency and failure statistics for each.
+Every call goes to the endpoint with the best score: the moving average of
+its latency, inflated by its recent failure rate. An endpoint that fails
+``failure_threshold`` times in a row is skipped for ``cooldown`` seconds,
+after which a single call probes it again.
+
+MPesaSDK uses the set in two ways. Each retry attempt goes to a different
+endpoint than the ones that already failed in the same call. The retrier
+still decides whether a retry is safe, and writes with a request ID are
+deduplicated by it, so a failed-over STK push cannot be processed twice.
+Read-only calls can also be hedged: if the first request has not answered
+within the endpoint's recent p95 latency, a second one goes to the next-best
+endpoint and whichever answers first wins.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from urllib.parse import urlsplit, urlunsplit
+
+from .exceptions import RetryableError
+
+DEFAULT_WINDOW = 256
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN = 30.0
+DEFAULT_HEDGE_QUANTILE = 0.95
+# Longest a hedged call waits for either request, in seconds.
+DEFAULT_HEDGE_TIMEOUT = 120.0
+# Hedge delay used until an endpoint has MIN_SAMPLES latencies, and the
+# bounds the measured delay is clamped to.
+DEFAULT_HEDGE_DELAY = 0.5
+MIN_HEDGE_DELAY = 0.005
+MAX_HEDGE_DELAY = 5.0
+MIN_SAMPLES = 20
+# Weight of the newest sample in the latency and failure averages.
+ALPHA = 0.2
+# A failure rate of 10% doubles an endpoint's score.
+FAILURE_PENALTY = 10.0
+
+
+class Endpoint:
+    """One base URL and its recent latency and failure statistics."""
+
+    __slots__ = ("url", "samples", "latency", "failure_rate", "requests", "failures",
+                 "consecutive_failures", "ejected_until", "hedges")
+
+    def __init__(self, url, window=DEFAULT_WINDOW):
+        self.url = url.rstrip("/")
+        self.samples = deque(maxlen=window)
+        self.latency = None
+        self.failure_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = None
+        self.hedges = 0
+
+    @property
+    def score(self):
+        """Lower is better. An endpoint not tried yet scores 0, so it gets measured."""
+        if self.latency is None:
+            return float("inf") if self.failures else 0.0
+        return self.latency * (1 + FAILURE_PENALTY * self.failure_rate)
+
+    def quantile(self, q):
+        """q-th quantile of the recent successful latencies, or None without samples."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __repr__(self):
+        return f"Endpoint({self.url!r})"
+
+
+class EndpointSet:
+    """Base URLs for one API, picked by health and latency."""
+
+    def __init__(self, urls, window=DEFAULT_WINDOW, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 cooldown=DEFAULT_COOLDOWN, clock=time.monotonic):
+        """
+        Initialize the set.
+
+        Args:
+            urls (iterable): Base URLs, preferred one first. Ties in score go
+                to the earlier URL.
+            window (int): Recent latencies kept per endpoint for quantiles.
+            failure_threshold (int): Consecutive transient failures after
+                which an endpoint is skipped.
+            cooldown (float): Seconds a failing endpoint is skipped before it
+                is probed again.
+            clock (callable): Monotonic clock in seconds.
+        """
+        self.endpoints = [Endpoint(url, window) for url in urls]
+        if not self.endpoints:
+            raise ValueError("An endpoint set needs at least one URL")
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self):
+        """Base URL of the preferred endpoint."""
+        return self.endpoints[0].url
+
+    def pick(self, exclude=()):
+        """
+        Return the endpoint to send the next request to.
+
+        Args:
+            exclude (collection): Endpoints not to use, e.g. the ones that
+                already failed for this call. Ignored if it excludes all.
+
+        Returns:
+            Endpoint: An endpoint due for a probe after its cooldown, else
+            the healthy endpoint with the best score, or, when every
+            candidate is cooling down, the one whose cooldown ends first.
+        """
+        candidates = [e for e in self.endpoints if e not in exclude] or self.endpoints
+        now = self.clock()
+        best = None
+        with self._lock:
+            for endpoint in candidates:
+                if endpoint.ejected_until is not None:
+                    if endpoint.ejected_until > now:
+                        continue
+                    # Cooldown is over: let this call probe it, and keep
+                    # other calls away until it has answered.
+                    endpoint.ejected_until = now + self.cooldown
+                    return endpoint
+                if best is None or endpoint.score < best.score:
+                    best = endpoint
+            if best is None:
+                return min(candidates, key=lambda e: e.ejected_until)
+        return best
+
+    def record(self, endpoint, latency, error=None):
+        """
+        Record the outcome of one request to an endpoint.
+
+        Args:
+            endpoint (Endpoint): Endpoint the request went to.
+            latency (float): Seconds the request took.
+            error (Exception): The error it failed with, if any. Only
+                transient failures other than throttling count against the
+                endpoint; a request it rejected still proves it is up.
+        """
+        failed = isinstance(error, RetryableError) and error.status_code != 429
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.failure_rate += ALPHA * ((1.0 if failed else 0.0) - endpoint.failure_rate)
+            if failed:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.failure_threshold:
+                    endpoint.ejected_until = self.clock() + self.cooldown
+                return
+            endpoint.consecutive_failures = 0
+            endpoint.ejected_until = None
+            endpoint.samples.append(latency)
+            endpoint.latency = latency if endpoint.latency is None else (
+                endpoint.latency + ALPHA * (latency - endpoint.latency))
+
+    def hedge_delay(self, endpoint, quantile=DEFAULT_HEDGE_QUANTILE):
+        """Seconds to wait on ``endpoint`` before hedging: its recent latency quantile, clamped."""
+        if len(endpoint.samples) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return min(MAX_HEDGE_DELAY, max(MIN_HEDGE_DELAY, endpoint.quantile(quantile)))
+
+    def stats(self):
+        """
+        Per-endpoint statistics.
+
+        Returns:
+            dict: For each base URL: requests, failures, hedges, average and
+            p50/p95/p99 latency in seconds, failure rate and whether it is
+            currently skipped.
+        """
+        now = self.clock()
+        with self._lock:
+            return {
+                e.url: {
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "hedges": e.hedges,
+                    "latency_avg": e.latency,
+                    "latency_p50": e.quantile(0.50),
+                    "latency_p95": e.quantile(0.95),
+                    "latency_p99": e.quantile(0.99),
+                    "failure_rate": e.failure_rate,
+                    "healthy": e.ejected_until is None or e.ejected_until <= now,
+                }
+                for e in self.endpoints
+            }
+
+    def call(self, fn, exclude=()):
+        """
+        Run ``fn(base_url)`` on the best endpoint and record the outcome.
+
+        Endpoints that fail are added to ``exclude`` when it is a set, so a
+        retry of the same call goes elsewhere.
+        """
+        endpoint = self.pick(exclude)
+        return self._timed(fn, endpoint, exclude)
+
+    def _timed(self, fn, endpoint, exclude):
+        start = time.perf_counter()
+        try:
+            result = fn(endpoint.url)
+        except Exception as e:
+            self.record(endpoint, time.perf_counter() - start, e)
+            if isinstance(exclude, set) and isinstance(e, RetryableError):
+                exclude.add(endpoint)
+            raise
+        self.record(endpoint, time.perf_counter() - start)
+        return result
+
+    def hedged(self, fn, executor, exclude=(), delay=None, quantile=DEFAULT_HEDGE_QUANTILE,
+               timeout=DEFAULT_HEDGE_TIMEOUT):
+        """
+        Run ``fn(base_url)``, sending a second request to the next-best
+        endpoint if the first has not answered within the hedge delay.
+
+        Only use this for requests without side effects: both may complete.
+
+        Args:
+            fn (callable): Sends the request to the given base URL.
+            executor (concurrent.futures.Executor): Runs both requests.
+            exclude (collection): Endpoints not to use. See call().
+            delay (float): Fixed hedge delay in seconds. Defaults to the first
+                endpoint's recent ``quantile`` latency.
+            quantile (float): Latency quantile the delay is derived from.
+            timeout (float): Seconds to wait for a result in all, or None to
+                wait indefinitely. ``fn`` must not itself wait on ``executor``.
+
+        Returns:
+            The first successful result.
+
+        Raises:
+            RetryableError: If neither request finished within ``timeout``.
+            If both fail, the error of the one that failed last, unless only
+            the other one's error is retryable.
+        """
+        # Each attempt records its failure in a set of its own, merged into
+        # ``exclude`` once it has finished, so no set is shared across threads.
+        attempts = []
+        deadline = None if timeout is None else time.monotonic() + timeout
+        first_endpoint = self.pick(exclude)
+        first = self._submit(executor, fn, first_endpoint, attempts)
+        try:
+            delay = self.hedge_delay(first_endpoint, quantile) if delay is None else delay
+            if wait((first,), delay if timeout is None else min(delay, timeout)).done:
+                return first.result()
+            second_endpoint = self.pick(set(exclude) | {first_endpoint})
+            with self._lock:
+                second_endpoint.hedges += 1
+            second = self._submit(executor, fn, second_endpoint, attempts)
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            done, _ = wait((first, second), remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                raise RetryableError(
+                    f"Hedged request to {first_endpoint.url} and {second_endpoint.url} "
+                    f"timed out after {timeout}s")
+            winner, other = (first, second) if first in done else (second, first)
+            if winner.exception() is None:
+                return winner.result()
+            if other.exception() is None:
+                return other.result()
+            last, earlier = other.exception(), winner.exception()
+            raise earlier if isinstance(earlier, RetryableError) and not isinstance(last, RetryableError) else last
+        finally:
+            if isinstance(exclude, set):
+                for future, failed in attempts:
+                    if future.done():
+                        exclude.update(failed)
+
+    def _submit(self, executor, fn, endpoint, attempts):
+        failed = set()
+        future = executor.submit(self._timed, fn, endpoint, failed)
+        attempts.append((future, failed))
+        return future
+
+
+def rebaser(url, base_url):
+    """
+    Return a function moving ``url`` from ``base_url`` onto another base URL,
+    or None if ``url`` is on a different host.
+
+    A URL on another port of the same host, as used by the spec-driven
+    operations, keeps its port on the new host.
+    """
+    parts, root = urlsplit(url), urlsplit(base_url)
+    if parts.scheme != root.scheme or parts.hostname != root.hostname:
+        return None
+    prefix = root.path.rstrip("/")
+    if parts.netloc == root.netloc and (parts.path == prefix or parts.path.startswith(prefix + "/")):
+        rest = urlunsplit(("", "", parts.path[len(prefix):], parts.query, parts.fragment))
+        return lambda base: base + rest
+    rest = urlunsplit(("", "", parts.path, parts.query, parts.fragment))
+    port = parts.port
+
+    def move(base):
+        target = urlsplit(base)
+        netloc = target.hostname if port is None else f"{target.hostname}:{port}"
+        return urlunsplit((target.scheme, netloc, "", "", "")) + rest
+
+    return move
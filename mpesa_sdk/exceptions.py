@@ -0,0 +1,69 @@
+class MPesaError(Exception):
+    """Base class for MPesa SDK errors."""
+    pass
+
+class AuthenticationError(MPesaError):
+    """Raised when authentication fails."""
+    pass
+
+class APIRequestError(MPesaError):
+    """
+    Raised when an API request fails.
+
+    Attributes:
+        status_code (int): HTTP status code, or None if no response was received.
+        body (str): Raw response body, if any.
+        latency (float): Seconds spent on the request, if measured.
+        request_sent (bool): False when the request provably never left the
+            client (e.g. the connection could not be opened), None if unknown.
+    """
+
+    def __init__(self, message, status_code=None, body=None, latency=None, request_sent=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+        self.latency = latency
+        self.request_sent = request_sent
+
+    @property
+    def in_doubt(self):
+        """True if the request may have been processed even though it failed."""
+        if self.status_code is None:
+            return self.request_sent is not False
+        return self.status_code == 504
+
+class RetryableError(APIRequestError):
+    """Raised for transient failures: timeouts, connection errors, 429 and 5xx responses."""
+    pass
+
+class FatalError(APIRequestError):
+    """Raised for permanent failures, e.g. validation errors, that retrying cannot fix."""
+    pass
+
+class CircuitOpenError(RetryableError):
+    """Raised without sending a request while an endpoint's circuit breaker is open."""
+
+    def __init__(self, message):
+        super().__init__(message, request_sent=False)
+
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def raise_for_response(description, status_code, text, latency=None):
+    """
+    Map a non-2xx API response to the matching SDK error.
+
+    Args:
+        description (str): Operation description used in the error message.
+        status_code (int): HTTP status code.
+        text (str): Raw response body.
+        latency (float): Seconds spent on the request.
+
+    Raises:
+        RetryableError: For 429 and 5xx responses.
+        FatalError: For any other non-2xx response.
+    """
+    if not 200 <= status_code < 300:
+        error = RetryableError if status_code in RETRYABLE_STATUS_CODES else FatalError
+        raise error(f"{description} failed: {text}", status_code=status_code, body=text, latency=latency)
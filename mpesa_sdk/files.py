@@ -0,0 +1,27 @@
+"""
+Streaming readers for the record files the batch workflows take as input,
+such as bulk payee lists, statement exports and ledger dumps.
+"""
+import csv
+import json
+
+
+def read_records(path):
+    """
+    Stream rows from a CSV (with a header row) or JSONL file.
+
+    Args:
+        path (str): File path. Files ending in ``.jsonl`` or ``.ndjson`` are read
+            as JSON lines, anything else as CSV.
+
+    Yields:
+        dict: One row.
+    """
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline="") as f:
+            yield from csv.DictReader(f)
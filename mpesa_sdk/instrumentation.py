@@ -0,0 +1,336 @@
+"""
+Metrics and tracing hooks for SDK calls.
+
+Clients and transports take an optional ``instrumentation`` object and call
+its hooks around every request. When none is given they skip the hooks
+entirely: no timing, no span objects, nothing allocated per call.
+
+``Instrumentation`` is the no-op base class to subclass. ``Metrics`` keeps
+in-process counters and latency histograms, ``OpenTelemetryInstrumentation``
+turns operations into spans on an OpenTelemetry tracer, and
+``combine()`` fans the hooks out to several of them.
+"""
+import bisect
+import threading
+from contextlib import ExitStack
+
+# Upper bounds in seconds of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PHASES = ("dns", "connect", "tls", "server", "total")
+
+
+class RequestTimings:
+    """
+    Where the time of one HTTP request went, in seconds.
+
+    ``dns``, ``connect`` and ``tls`` are None when the request reused a pooled
+    connection. ``server`` is the rest of the request: sending it, the server
+    processing it and reading the response.
+    """
+
+    __slots__ = ("dns", "connect", "tls", "server", "total", "in_flight")
+
+    def __init__(self):
+        self.dns = None
+        self.connect = None
+        self.tls = None
+        self.server = None
+        self.total = None
+        self.in_flight = 0
+
+    @property
+    def reused(self):
+        """The request went over an existing pooled connection."""
+        return self.connect is None
+
+    def finish(self, total):
+        """Set the total time and derive the server time from it."""
+        self.total = total
+        self.server = total - (self.dns or 0.0) - (self.connect or 0.0) - (self.tls or 0.0)
+
+
+def outcome(status_code=None, error=None):
+    """
+    Label for a request's outcome: the status code, or the class of the
+    underlying error (e.g. 'ConnectTimeout') if no response arrived.
+    """
+    if status_code is not None:
+        return str(status_code)
+    if error is None:
+        return "ok"
+    return type(error.__cause__ or error).__name__
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Instrumentation:
+    """Hooks called by the SDK. Every method is a no-op; override the ones you need."""
+
+    def start_span(self, name, attributes=None):
+        """
+        Return a context manager for one SDK operation, retries included.
+
+        The object it yields needs ``set_attribute(key, value)`` and
+        ``record_exception(exception)``, as OpenTelemetry spans have.
+        """
+        return NOOP_SPAN
+
+    def on_request(self, operation, method, status_code, error, timings):
+        """
+        Called after every HTTP request, including retries and token fetches.
+
+        Args:
+            operation (str): Operation name.
+            method (str): HTTP method.
+            status_code (int): Response status, or None if no response arrived.
+            error (Exception): Transport error, or None.
+            timings (RequestTimings): Phase timings of the request.
+        """
+
+    def on_token_refresh(self, latency, error=None):
+        """Called after every access token fetch, successful or not."""
+
+    def on_retry(self, operation, attempt, delay, error):
+        """Called before sleeping ``delay`` seconds ahead of retry number ``attempt``."""
+
+    def on_throttle(self, operation, delay):
+        """Called when the rate limiter held a request back for ``delay`` seconds."""
+
+
+class Histogram:
+    """Fixed-bucket histogram."""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (inf for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[index] if index < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        return {"count": self.count, "sum": self.sum, "buckets": dict(zip(self.bounds + (float("inf"),), self.counts))}
+
+
+class Metrics(Instrumentation):
+    """
+    In-process metrics.
+
+    Attributes:
+        latency (dict): Histogram per (operation, phase), phase being one of PHASES.
+        outcomes (dict): Request count per (operation, outcome()).
+        retries (dict): Retry count per operation.
+        throttle_delay (dict): Histogram of rate limiter delays per operation.
+        token_refreshes (int): Access tokens fetched.
+        token_refresh_failures (int): Token fetches that failed.
+        token_latency (Histogram): Token fetch latency.
+        connections_opened (int): Requests that had to open a connection.
+        connections_reused (int): Requests served over a pooled connection.
+        max_in_flight (int): Highest number of concurrent requests seen.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.latency = {}
+        self.outcomes = {}
+        self.retries = {}
+        self.throttle_delay = {}
+        self.token_refreshes = 0
+        self.token_refresh_failures = 0
+        self.token_latency = Histogram(buckets)
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(self.buckets)
+        return histogram
+
+    def on_request(self, operation, method, status_code, error, timings):
+        label = outcome(status_code, error)
+        with self._lock:
+            self.outcomes[(operation, label)] = self.outcomes.get((operation, label), 0) + 1
+            for phase in PHASES:
+                value = getattr(timings, phase)
+                if value is not None:
+                    self._histogram(self.latency, (operation, phase)).observe(value)
+            if timings.reused:
+                self.connections_reused += 1
+            else:
+                self.connections_opened += 1
+            if timings.in_flight > self.max_in_flight:
+                self.max_in_flight = timings.in_flight
+
+    def on_token_refresh(self, latency, error=None):
+        with self._lock:
+            self.token_refreshes += 1
+            if error is not None:
+                self.token_refresh_failures += 1
+            self.token_latency.observe(latency)
+
+    def on_retry(self, operation, attempt, delay, error):
+        with self._lock:
+            self.retries[operation] = self.retries.get(operation, 0) + 1
+
+    def on_throttle(self, operation, delay):
+        with self._lock:
+            self._histogram(self.throttle_delay, operation).observe(delay)
+
+    def snapshot(self):
+        """Plain-dict copy of every metric, e.g. for a metrics endpoint."""
+        with self._lock:
+            return {
+                "latency": {f"{op}.{phase}": h.snapshot() for (op, phase), h in self.latency.items()},
+                "outcomes": {f"{op}.{label}": n for (op, label), n in self.outcomes.items()},
+                "retries": dict(self.retries),
+                "throttle_delay": {op: h.snapshot() for op, h in self.throttle_delay.items()},
+                "token_refreshes": self.token_refreshes,
+                "token_refresh_failures": self.token_refresh_failures,
+                "token_latency": self.token_latency.snapshot(),
+                "connections_opened": self.connections_opened,
+                "connections_reused": self.connections_reused,
+                "max_in_flight": self.max_in_flight,
+            }
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Records every SDK operation as a span on an OpenTelemetry tracer.
+
+    HTTP attempts, retries and throttling are added to the current span as
+    events, so a retried call shows up as one span with an event per attempt.
+    """
+
+    def __init__(self, tracer=None):
+        """
+        Args:
+            tracer: OpenTelemetry tracer. Defaults to
+                ``opentelemetry.trace.get_tracer("mpesa_sdk")``.
+        """
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer("mpesa_sdk")
+        self.tracer = tracer
+
+    def start_span(self, name, attributes=None):
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+    def _event(self, name, attributes):
+        from opentelemetry import trace
+        trace.get_current_span().add_event(name, attributes)
+
+    def on_request(self, operation, method, status_code, error, timings):
+        attributes = {"http.request.method": method, "mpesa.outcome": outcome(status_code, error),
+                      "mpesa.connection_reused": timings.reused}
+        for phase in PHASES:
+            value = getattr(timings, phase)
+            if value is not None:
+                attributes[f"mpesa.duration.{phase}"] = value
+        if status_code is not None:
+            attributes["http.response.status_code"] = status_code
+        self._event("http.request", attributes)
+
+    def on_token_refresh(self, latency, error=None):
+        self._event("mpesa.token_refresh", {"mpesa.duration": latency, "mpesa.failed": error is not None})
+
+    def on_retry(self, operation, attempt, delay, error):
+        self._event("mpesa.retry", {"mpesa.attempt": attempt, "mpesa.delay": delay,
+                                    "error.type": type(error).__name__})
+
+    def on_throttle(self, operation, delay):
+        self._event("mpesa.throttle", {"mpesa.delay": delay})
+
+
+class _MultiSpan:
+    __slots__ = ("_spans", "_stack")
+
+    def __init__(self, spans):
+        self._spans = spans
+        self._stack = ExitStack()
+
+    def __enter__(self):
+        self._spans = [self._stack.enter_context(span) for span in self._spans]
+        return self
+
+    def __exit__(self, *exc):
+        return self._stack.__exit__(*exc)
+
+    def set_attribute(self, key, value):
+        for span in self._spans:
+            span.set_attribute(key, value)
+
+    def record_exception(self, exception):
+        for span in self._spans:
+            span.record_exception(exception)
+
+
+class _Multi(Instrumentation):
+    def __init__(self, instruments):
+        self.instruments = instruments
+
+    def start_span(self, name, attributes=None):
+        return _MultiSpan([i.start_span(name, attributes) for i in self.instruments])
+
+    def on_request(self, *args):
+        for i in self.instruments:
+            i.on_request(*args)
+
+    def on_token_refresh(self, *args, **kwargs):
+        for i in self.instruments:
+            i.on_token_refresh(*args, **kwargs)
+
+    def on_retry(self, *args):
+        for i in self.instruments:
+            i.on_retry(*args)
+
+    def on_throttle(self, *args):
+        for i in self.instruments:
+            i.on_throttle(*args)
+
+
+def combine(*instruments):
+    """Instrumentation that forwards every hook to each of ``instruments``."""
+    instruments = [i for i in instruments if i is not None]
+    if not instruments:
+        return None
+    if len(instruments) == 1:
+        return instruments[0]
+    return _Multi(instruments)
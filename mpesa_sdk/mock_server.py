@@ -0,0 +1,404 @@
+"""
+Local stand-in for the Safaricom API, used by the tests and benchmarks.
+
+Implements the token, STK push, C2B register/payment and B2C endpoints called
+by MPesaSDK and AsyncMPesaSDK, plus every operation in
+constants.DEFAULT_OPERATIONS (served on this server's port).
+
+Latency, random 5xx errors and 429 throttling can be injected, and STK push,
+C2B payment and B2C requests can be followed by their asynchronous callbacks
+posted to the URLs given in the request. Run it standalone with
+
+    python -m mpesa_sdk.mock_server --port 8000 --latency 0.05 --error-rate 0.01 --rate-limit 500
+"""
+import argparse
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from . import payloads
+from .constants import DEFAULT_OPERATIONS
+from .ratelimit import TokenBucket
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY the body
+    # waits for the client's delayed ACK and every request gains ~40ms.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def _dispatch(self, method):
+        server = self.server.mock
+        url = urlsplit(self.path)
+        path = url.path
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        if body is None and method == "GET" and url.query:
+            body = dict(parse_qsl(url.query))
+        if server.record_requests:
+            server.record(method, self.path, dict(self.headers), body)
+
+        route = server.routes.get((method, path))
+        if route is None:
+            return self._send(404, {"errorMessage": f"No route for {method} {path}"})
+        if path != urlsplit(payloads.TOKEN_PATH).path:
+            if self.headers.get("Authorization") != f"Bearer {server.token}":
+                return self._send(401, {"errorMessage": "Invalid Access Token"})
+            injected = server.inject()
+            if injected is not None:
+                return self._send(*injected)
+        status, response = route(body)
+        self._send(status, response)
+
+    def _send(self, status, data, headers=()):
+        raw = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open many connections at once; the default backlog of 5
+    # makes the kernel reset them.
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Routes raise on purpose to simulate dropped connections.
+        pass
+
+
+class _CallbackSender(threading.Thread):
+    """Posts callbacks on one thread once their delay has passed."""
+
+    def __init__(self, timeout=5.0):
+        super().__init__(name="mock-safaricom-callbacks", daemon=True)
+        self.timeout = timeout
+        self.delivered = []
+        self.failed = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._busy = 0
+
+    def schedule(self, delay, url, payload):
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), url, payload))
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                if self._stopped:
+                    return
+                _, _, url, payload = heapq.heappop(self._heap)
+                self._busy += 1
+            try:
+                request = urllib.request.Request(
+                    url, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    response.read()
+                self.delivered.append((url, payload))
+            except OSError:
+                self.failed += 1
+            finally:
+                with self._cond:
+                    self._busy -= 1
+                    self._cond.notify_all()
+
+    def join_pending(self, timeout=None):
+        """Wait until every scheduled callback has been posted. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._heap or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 0.05)
+        return True
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+
+class MockSafaricomServer:
+    """Threaded local HTTP server answering like the Safaricom API."""
+
+    def __init__(self, host="127.0.0.1", port=0, token="mock-token", expires_in=3599, latency=0.0,
+                 latency_jitter=0.0, error_rate=0.0, error_status=500, rate_limit=None, burst=None,
+                 callbacks=False, callback_delay=0.0, callback_result_code=0, record_requests=True,
+                 seed=None):
+        """
+        Args:
+            host (str): Interface to bind.
+            port (int): Port to bind, 0 picks a free one.
+            token (str): Access token issued by the token endpoint.
+            expires_in (int): Token lifetime reported to clients.
+            latency (float): Seconds every authenticated request is delayed by.
+            latency_jitter (float): Up to this many extra seconds, drawn uniformly.
+            error_rate (float): Fraction of authenticated requests answered
+                with ``error_status`` instead of being processed.
+            error_status (int): Status code of injected errors.
+            rate_limit (float): Requests per second accepted before answering
+                429 with a Retry-After header, or None for no limit.
+            burst (int): Requests accepted back to back under ``rate_limit``.
+                Defaults to one second's worth.
+            callbacks (bool): Post STK push, C2B confirmation and B2C result
+                callbacks to the URLs given in the requests.
+            callback_delay (float): Seconds between a request and its callback.
+            callback_result_code (int): ResultCode reported in callbacks.
+            record_requests (bool): Keep every request in ``self.requests``.
+                Turn off for long load tests.
+            seed (int): Seed for the latency and error injection.
+        """
+        self.token = token
+        self.expires_in = expires_in
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.throttle = None if rate_limit is None else TokenBucket(
+            rate_limit, burst if burst is not None else max(1, int(rate_limit)))
+        self.callback_delay = callback_delay
+        self.callback_result_code = callback_result_code
+        self.record_requests = record_requests
+        self.requests = []
+        self.injected = {"errors": 0, "throttled": 0}
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # ConfirmationURL registered per short code, used for C2B callbacks.
+        self.confirmation_urls = {}
+        self.callbacks = _CallbackSender() if callbacks else None
+        self.routes = {
+            ("GET", urlsplit(payloads.TOKEN_PATH).path): self._token,
+            ("POST", payloads.STK_PUSH_PATH): self._stk_push,
+            ("POST", payloads.C2B_REGISTER_URL_PATH): self._c2b_register_url,
+            ("POST", payloads.C2B_PAYMENT_PATH): self._c2b_payment,
+            ("POST", payloads.B2C_PAYMENT_PATH): self._b2c_payment,
+        }
+        for spec in DEFAULT_OPERATIONS.values():
+            route = self._query_status if spec["method"] == "GET" else self._ipg_payment
+            self.routes[(spec["method"], spec["path"])] = route
+        # Transaction status returned by the status query, keyed by query reference.
+        self.statuses = {}
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL to hand to MPesaSDK(base_url=...)."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05},
+            name="mock-safaricom", daemon=True)
+        self._thread.start()
+        if self.callbacks is not None:
+            self.callbacks.start()
+        return self
+
+    def stop(self):
+        if self.callbacks is not None:
+            self.callbacks.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def record(self, method, path, headers, body):
+        with self._lock:
+            self.requests.append((method, path, headers, body))
+
+    def inject(self):
+        """
+        Apply the configured latency, throttling and error rate to one request.
+
+        Returns:
+            tuple: (status, data, headers) to answer with instead of the
+            route, or None to process the request normally.
+        """
+        if self.latency or self.latency_jitter:
+            time.sleep(self.latency + self._random.uniform(0, self.latency_jitter))
+        if self.throttle is not None:
+            reservation = self.throttle.reserve(max_wait=0)
+            if reservation is None:
+                with self._lock:
+                    self.injected["throttled"] += 1
+                retry_after = str(max(1, round(1 / self.throttle.rate)))
+                return 429, {"errorMessage": "Too Many Requests"}, (("Retry-After", retry_after),)
+        if self.error_rate and self._random.random() < self.error_rate:
+            with self._lock:
+                self.injected["errors"] += 1
+            return self.error_status, {"errorMessage": "Injected error"}, ()
+        return None
+
+    def _callback(self, url, payload):
+        if self.callbacks is not None and url:
+            self.callbacks.schedule(self.callback_delay, url, payload)
+
+    def wait_for_callbacks(self, timeout=None):
+        """Block until every scheduled callback has been posted. Returns False on timeout."""
+        return self.callbacks is None or self.callbacks.join_pending(timeout)
+
+    def _next_id(self):
+        return next(self._ids)
+
+    def _token(self, body):
+        return 200, {"access_token": self.token, "token_type": "Bearer", "expires_in": str(self.expires_in)}
+
+    def _stk_push(self, body):
+        checkout_request_id = f"ws_CO_{self._next_id():012d}"
+        callback = {
+            "MerchantRequestID": body["MerchantRequestID"],
+            "CheckoutRequestID": checkout_request_id,
+            "ResultCode": self.callback_result_code,
+            "ResultDesc": "The service request is processed successfully." if self.callback_result_code == 0
+            else "Request cancelled by user",
+        }
+        if self.callback_result_code == 0:
+            callback["CallbackMetadata"] = {"Item": [
+                {"Name": "Amount", "Value": body.get("Amount")},
+                {"Name": "MpesaReceiptNumber", "Value": f"MOCK{self._next_id():06d}"},
+                {"Name": "PhoneNumber", "Value": body.get("PhoneNumber")},
+            ]}
+        self._callback(body.get("CallBackURL"), {"Body": {"stkCallback": callback}})
+        return 200, {
+            "MerchantRequestID": body["MerchantRequestID"],
+            "CheckoutRequestID": checkout_request_id,
+            "ResponseCode": "0",
+            "ResponseDescription": "Success. Request accepted for processing",
+            "CustomerMessage": "Success. Request accepted for processing",
+        }
+
+    def _c2b_register_url(self, body):
+        self.confirmation_urls[str(body["ShortCode"])] = body.get("ConfirmationURL")
+        return 200, {
+            "header": {"responseCode": 200, "responseMessage": "Request processed successfully"},
+            "ShortCode": body["ShortCode"],
+        }
+
+    def _c2b_payment(self, body):
+        n = self._next_id()
+        parameters = {p.get("Key"): p.get("Value") for p in body.get("Parameters") or ()}
+        short_code = str((body.get("ReceiverParty") or {}).get("Identifier"))
+        self._callback(self.confirmation_urls.get(short_code), {
+            "TransactionType": body.get("CommandID"),
+            "TransID": f"MOCK{n:08d}",
+            "TransTime": time.strftime("%Y%m%d%H%M%S"),
+            "TransAmount": parameters.get("Amount"),
+            "BusinessShortCode": short_code,
+            "BillRefNumber": parameters.get("AccountReference"),
+            "MSISDN": (body.get("PrimaryParty") or {}).get("Identifier"),
+        })
+        return 200, {
+            "RequestRefID": body["RequestRefID"],
+            "ResponseCode": "0",
+            "ResponseDesc": "The service request is processed successfully.",
+            "TransactionID": f"MOCK{n:08d}",
+            "ConversationID": f"AG_{n:012d}",
+        }
+
+    def _b2c_payment(self, body):
+        n = self._next_id()
+        self._callback(body.get("ResultURL"), {"Result": {
+            "ResultType": 0,
+            "ResultCode": self.callback_result_code,
+            "ResultDesc": "The service request is processed successfully.",
+            "OriginatorConversationID": f"OC_{n:012d}",
+            "ConversationID": f"AG_{n:012d}",
+            "TransactionID": f"MOCK{n:08d}",
+            "ResultParameters": {"ResultParameter": [
+                {"Key": "TransactionAmount", "Value": body.get("Amount")},
+                {"Key": "ReceiverPartyPublicName", "Value": body.get("PartyB")},
+            ]},
+        }})
+        return 200, {
+            "ConversationID": f"AG_{n:012d}",
+            "OriginatorConversationID": f"OC_{n:012d}",
+            "ResponseCode": "0",
+            "ResponseDescription": "Accept the service request successfully.",
+        }
+
+    def _ipg_payment(self, body):
+        n = self._next_id()
+        return 201, {
+            "output_ResponseCode": "INS-0",
+            "output_ResponseDesc": "Request processed successfully",
+            "output_TransactionID": f"MOCK{n:08d}",
+            "output_ConversationID": f"AG_{n:012d}",
+            "output_ThirdPartyReference": body.get("input_ThirdPartyReference"),
+        }
+
+    def _query_status(self, body):
+        return 200, {
+            "output_ResponseCode": "INS-0",
+            "output_ResponseDesc": "Request processed successfully",
+            "output_ResponseTransactionStatus": self.statuses.get(body.get("input_QueryReference"), "Completed"),
+            "output_ConversationID": f"AG_{self._next_id():012d}",
+            "output_ThirdPartyReference": body.get("input_ThirdPartyReference"),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the mock Safaricom API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--callbacks", action="store_true")
+    parser.add_argument("--callback-delay", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    server = MockSafaricomServer(
+        args.host, args.port, latency=args.latency, latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate, rate_limit=args.rate_limit, callbacks=args.callbacks,
+        callback_delay=args.callback_delay, record_requests=False, seed=args.seed)
+    # Announce the bound address first so a parent process can read it.
+    print(server.url, flush=True)
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
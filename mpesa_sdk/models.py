@@ -0,0 +1,258 @@
+"""
+Typed request and response models.
+
+Request models keep their fields in ``__slots__`` and serialize them in a key
+order fixed once per class, so sending one builds no intermediate payload by
+hand. Responses keep the raw body and decode it on first access, so a caller
+that only checks that the call succeeded never parses it.
+
+JSON goes through ``orjson`` or ``msgspec`` when either is installed and the
+standard library otherwise; ``BACKEND`` names the one in use.
+"""
+from collections.abc import Mapping
+from operator import attrgetter
+
+from . import payloads
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = "orjson"
+    dumps = orjson.dumps
+    loads = orjson.loads
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    dumps = msgspec.json.encode
+
+    def loads(data):
+        """Parse JSON, raising ValueError on bad input like the other backends."""
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+else:
+    import json
+
+    BACKEND = "json"
+    _encode = json.JSONEncoder(separators=(",", ":")).encode
+    loads = json.loads
+
+    def dumps(obj):
+        """Serialize obj to compact JSON bytes."""
+        return _encode(obj).encode()
+
+
+class Model:
+    """
+    Base class for request models.
+
+    Subclasses declare ``__slots__`` in constructor order and ``FIELDS``, a
+    tuple of (attribute, wire key) pairs in the order the API expects.
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+    OPERATION = None
+    PATH = None
+    RESPONSE = None
+    # Attribute holding the request ID used to deduplicate retries, if any.
+    ID_ATTR = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.KEYS = tuple(key for _, key in cls.FIELDS)
+        cls._values = attrgetter(*(attr for attr, _ in cls.FIELDS))
+
+    def __init__(self, *args, **kwargs):
+        if len(args) > len(self.__slots__):
+            raise TypeError(f"{type(self).__name__} takes at most {len(self.__slots__)} arguments")
+        for name, value in zip(self.__slots__, args):
+            setattr(self, name, value)
+        for name in self.__slots__[len(args):]:
+            setattr(self, name, kwargs.pop(name, None))
+        if kwargs:
+            raise TypeError(f"{type(self).__name__} got unexpected arguments {sorted(kwargs)}")
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a model from a wire-format dict."""
+        return cls(**{attr: data.get(key) for attr, key in cls.FIELDS})
+
+    def to_dict(self):
+        """Wire-format payload dict."""
+        return dict(zip(self.KEYS, self._values(self)))
+
+    def to_json(self):
+        """Wire-format payload as JSON bytes."""
+        return dumps(self.to_dict())
+
+    @property
+    def idempotency_key(self):
+        """Request ID identifying this request across retries, or None."""
+        return getattr(self, self.ID_ATTR) or None if self.ID_ATTR else None
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values(self) == other._values(other)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Response(Mapping):
+    """
+    Read-only mapping over a JSON response body, decoded on first access.
+
+    Works anywhere the plain response dict did for reading; use ``to_dict()``
+    where a real dict is needed, e.g. for ``json.dumps``.
+    """
+
+    __slots__ = ("raw", "_data")
+
+    def __init__(self, raw):
+        """
+        Args:
+            raw (bytes): Response body.
+        """
+        self.raw = raw
+        self._data = None
+
+    @classmethod
+    def from_dict(cls, data):
+        response = cls(None)
+        response._data = data
+        return response
+
+    @property
+    def decoded(self):
+        """True once the body has been parsed."""
+        return self._data is not None
+
+    def to_dict(self):
+        if self._data is None:
+            self._data = loads(self.raw) if self.raw else {}
+        return self._data
+
+    def __getitem__(self, key):
+        return self.to_dict()[key]
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def _field(key):
+    return property(lambda self: self.to_dict().get(key), doc=f"``{key}`` from the response.")
+
+
+class StkPushResponse(Response):
+    __slots__ = ()
+    merchant_request_id = _field("MerchantRequestID")
+    checkout_request_id = _field("CheckoutRequestID")
+    response_code = _field("ResponseCode")
+    response_description = _field("ResponseDescription")
+    customer_message = _field("CustomerMessage")
+
+
+class C2BPaymentResponse(Response):
+    __slots__ = ()
+    request_ref_id = _field("RequestRefID")
+    response_code = _field("ResponseCode")
+    response_desc = _field("ResponseDesc")
+    transaction_id = _field("TransactionID")
+    conversation_id = _field("ConversationID")
+
+
+class B2CResponse(Response):
+    __slots__ = ()
+    conversation_id = _field("ConversationID")
+    originator_conversation_id = _field("OriginatorConversationID")
+    response_code = _field("ResponseCode")
+    response_description = _field("ResponseDescription")
+
+
+class StkPushRequest(Model):
+    """STK push (Lipa na M-Pesa online) request. See MPesaSDK.stk_push for the fields."""
+
+    __slots__ = ("merchant_request_id", "business_short_code", "password", "timestamp", "transaction_type",
+                 "amount", "party_a", "party_b", "phone_number", "callback_url", "account_reference",
+                 "transaction_desc", "reference_data")
+    FIELDS = (
+        ("merchant_request_id", "MerchantRequestID"),
+        ("business_short_code", "BusinessShortCode"),
+        ("password", "Password"),
+        ("timestamp", "Timestamp"),
+        ("transaction_type", "TransactionType"),
+        ("amount", "Amount"),
+        ("party_a", "PartyA"),
+        ("party_b", "PartyB"),
+        ("phone_number", "PhoneNumber"),
+        ("callback_url", "CallBackURL"),
+        ("account_reference", "AccountReference"),
+        ("transaction_desc", "TransactionDesc"),
+        ("reference_data", "ReferenceData"),
+    )
+    OPERATION = payloads.STK_PUSH
+    PATH = payloads.STK_PUSH_PATH
+    RESPONSE = StkPushResponse
+    ID_ATTR = "merchant_request_id"
+
+
+class C2BPaymentRequest(Model):
+    """C2B payment request. See MPesaSDK.c2b_payment for the fields."""
+
+    __slots__ = ("request_ref_id", "command_id", "remark", "channel_session_id", "source_system", "timestamp",
+                 "parameters", "reference_data", "initiator", "primary_party", "receiver_party")
+    FIELDS = (
+        ("request_ref_id", "RequestRefID"),
+        ("command_id", "CommandID"),
+        ("remark", "Remark"),
+        ("channel_session_id", "ChannelSessionID"),
+        ("source_system", "SourceSystem"),
+        ("timestamp", "Timestamp"),
+        ("parameters", "Parameters"),
+        ("reference_data", "ReferenceData"),
+        ("initiator", "Initiator"),
+        ("primary_party", "PrimaryParty"),
+        ("receiver_party", "ReceiverParty"),
+    )
+    OPERATION = payloads.C2B_PAYMENT
+    PATH = payloads.C2B_PAYMENT_PATH
+    RESPONSE = C2BPaymentResponse
+    ID_ATTR = "request_ref_id"
+
+
+class B2CRequest(Model):
+    """B2C payment request. See MPesaSDK.b2c_payment_request for the fields."""
+
+    __slots__ = ("initiator_name", "security_credential", "command_id", "amount", "party_a", "party_b",
+                 "remarks", "queue_timeout_url", "result_url", "occasion")
+    FIELDS = (
+        ("initiator_name", "InitiatorName"),
+        ("security_credential", "SecurityCredential"),
+        ("occasion", "Occasion"),
+        ("command_id", "CommandID"),
+        ("party_a", "PartyA"),
+        ("party_b", "PartyB"),
+        ("remarks", "Remarks"),
+        ("amount", "Amount"),
+        ("queue_timeout_url", "QueueTimeOutURL"),
+        ("result_url", "ResultURL"),
+    )
+    OPERATION = payloads.B2C_PAYMENT
+    PATH = payloads.B2C_PAYMENT_PATH
+    RESPONSE = B2CResponse
@@ -0,0 +1,93 @@
+"""
+Generic executor for the operations described in constants.DEFAULT_OPERATIONS.
+
+Each spec is compiled once into an Operation holding its validator, absolute
+URL and HTTP method, so adding an operation is a matter of adding data. All
+operations share the SDK's transport, token, rate limits and retries.
+"""
+from urllib.parse import urlsplit, urlunsplit
+
+from . import payloads
+from .constants import DEFAULT_MARKET, DEFAULT_OPERATIONS
+from .validation import CompiledOperation
+
+B2B_PAYMENT = "B2B_PAYMENT"
+B2C_PAYMENT = "B2C_PAYMENT"
+C2B_PAYMENT = "C2B_PAYMENT"
+REVERSAL = "REVERSAL"
+QUERY_TRANSACTION_STATUS = "QUERY_TRANSACTION_STATUS"
+
+
+def _with_port(base_url, port):
+    parts = urlsplit(base_url)
+    # Swap only the port, keeping any user:pass@ and the brackets of an IPv6 host.
+    userinfo, at, host = parts.netloc.rpartition("@")
+    if parts.port is not None:
+        host = host.rpartition(":")[0]
+    return urlunsplit((parts.scheme, f"{userinfo}{at}{host}:{port}", parts.path, "", ""))
+
+
+class Operation:
+    """One compiled operation: validator, method and absolute URL."""
+
+    __slots__ = ("name", "key", "method", "url", "compiled", "read_only")
+
+    def __init__(self, name, spec, base_url, market=DEFAULT_MARKET, defaults=None, use_spec_ports=True):
+        self.name = name
+        # Lower-case name used for rate limits, circuit breakers and errors.
+        self.key = name.lower()
+        self.method = spec['method']
+        root = _with_port(base_url, spec['port']) if use_spec_ports else base_url.rstrip("/")
+        self.url = root + spec['path']
+        self.compiled = CompiledOperation(name, spec, market, defaults)
+        self.read_only = self.method == 'GET'
+
+
+class OperationExecutor:
+    """Validates, builds and sends requests for spec-driven operations."""
+
+    def __init__(self, sdk, operations=None, market=DEFAULT_MARKET, defaults=None, use_spec_ports=True):
+        """
+        Initialize the executor.
+
+        Args:
+            sdk (MPesaSDK): Client whose transport, tokens and retrier are used.
+            operations (dict): Specs keyed by operation name. Defaults to
+                constants.DEFAULT_OPERATIONS.
+            market (str): Market whose validation patterns apply.
+            defaults (dict): Field values filled in when a request omits them,
+                e.g. ``{'from': '171717'}`` for the service provider code.
+            use_spec_ports (bool): Send each operation to the port in its spec.
+                Disable to send everything to the SDK base URL as is.
+        """
+        self.sdk = sdk
+        self.operations = {
+            name: Operation(name, spec, sdk.base_url, market, defaults, use_spec_ports)
+            for name, spec in (operations or DEFAULT_OPERATIONS).items()
+        }
+
+    def __contains__(self, name):
+        return name in self.operations
+
+    def execute(self, name, fields):
+        """
+        Run an operation.
+
+        Args:
+            name (str): Operation name, e.g. 'REVERSAL'.
+            fields (dict): Request fields keyed by spec field name ('from',
+                'to', 'amount', 'transaction', 'reference', ...).
+
+        Returns:
+            dict: API response.
+
+        Raises:
+            KeyError: If the operation is unknown.
+            ValidationError: If the fields fail validation; nothing is sent.
+        """
+        operation = self.operations[name]
+        body = operation.compiled.build(fields)
+        if operation.read_only:
+            return self.sdk._request(operation.key, operation.method, operation.url, params=body, read_only=True)
+        return self.sdk._request(operation.key, operation.method, operation.url, json=body,
+                                 idempotency_key=payloads.idempotency_key(body))
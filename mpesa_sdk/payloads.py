@@ -0,0 +1,152 @@
+"""
+Request building shared by MPesaSDK and AsyncMPesaSDK.
+
+Each operation is described once here (endpoint path and payload layout) so the
+sync and async clients cannot drift apart.
+"""
+import base64
+
+BASE_URLS = {
+    'sandbox': "https://apisandbox.safaricom.et",
+    'production': "https://api.safaricom.co.et",
+}
+
+TOKEN_PATH = "/v1/token/generate?grant_type=client_credentials"
+STK_PUSH_PATH = "/mpesa/stkpush/v3/processrequest"
+C2B_REGISTER_URL_PATH = "/v1/c2b-register-url/register"
+C2B_PAYMENT_PATH = "/v1/c2b/payments"
+B2C_PAYMENT_PATH = "/mpesa/b2c/v1/paymentrequest"
+
+# Operation names, used to key rate limits and other per-operation settings.
+TOKEN = "token"
+STK_PUSH = "stk_push"
+C2B_REGISTER_URL = "c2b_register_url"
+C2B_PAYMENT = "c2b_payment"
+B2C_PAYMENT = "b2c_payment"
+
+DESCRIPTIONS = {
+    TOKEN: "Authentication",
+    STK_PUSH: "STK Push request",
+    C2B_REGISTER_URL: "C2B Register URL",
+    C2B_PAYMENT: "C2B Payment",
+    B2C_PAYMENT: "B2C Payment Request",
+}
+
+DEFAULT_EXPIRES_IN = 3599
+
+# Payload fields that uniquely identify a request, in order of preference.
+IDEMPOTENCY_FIELDS = (
+    "MerchantRequestID", "RequestRefID", "input_TransactionReference", "input_ThirdPartyReference",
+)
+
+
+def base_url(environment):
+    """Get the base URL for an environment."""
+    try:
+        return BASE_URLS[environment]
+    except KeyError:
+        raise ValueError("Invalid environment. Choose 'sandbox' or 'production'.") from None
+
+
+def basic_auth_headers(consumer_key, consumer_secret):
+    """Build the Basic auth headers used to request an access token."""
+    credentials = f"{consumer_key}:{consumer_secret}"
+    encoded_credentials = base64.b64encode(credentials.encode()).decode()
+    return {
+        "Authorization": f"Basic {encoded_credentials}"
+    }
+
+
+def bearer_headers(token):
+    """Build the headers sent with every authenticated JSON request."""
+    return {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+
+
+def parse_token(data):
+    """
+    Extract the token from a token endpoint response.
+
+    Returns:
+        tuple: (access_token, expires_in) pair.
+    """
+    return data['access_token'], int(data.get('expires_in') or DEFAULT_EXPIRES_IN)
+
+
+def idempotency_key(payload):
+    """Return the request ID that identifies payload across retries, or None."""
+    for field in IDEMPOTENCY_FIELDS:
+        value = payload.get(field)
+        if value:
+            return value
+    return None
+
+
+def stk_push(merchant_request_id, business_short_code, password, timestamp, transaction_type, amount, party_a, party_b, phone_number, callback_url, account_reference, transaction_desc, reference_data):
+    """Build an STK Push payload."""
+    return {
+        "MerchantRequestID": merchant_request_id,
+        "BusinessShortCode": business_short_code,
+        "Password": password,
+        "Timestamp": timestamp,
+        "TransactionType": transaction_type,
+        "Amount": amount,
+        "PartyA": party_a,
+        "PartyB": party_b,
+        "PhoneNumber": phone_number,
+        "CallBackURL": callback_url,
+        "AccountReference": account_reference,
+        "TransactionDesc": transaction_desc,
+        "ReferenceData": reference_data
+    }
+
+
+def c2b_register_url_path(consumer_key):
+    """Path of the C2B URL registration endpoint for a consumer key."""
+    return f"{C2B_REGISTER_URL_PATH}?apikey={consumer_key}"
+
+
+def c2b_register_url(short_code, response_type, confirmation_url, validation_url):
+    """Build a C2B URL registration payload."""
+    return {
+        "ShortCode": short_code,
+        "ResponseType": response_type,
+        "CommandID": "RegisterURL",
+        "ConfirmationURL": confirmation_url,
+        "ValidationURL": validation_url
+    }
+
+
+def c2b_payment(request_ref_id, command_id, remark, channel_session_id, source_system, timestamp, parameters, reference_data, initiator, primary_party, receiver_party):
+    """Build a C2B payment payload."""
+    return {
+        "RequestRefID": request_ref_id,
+        "CommandID": command_id,
+        "Remark": remark,
+        "ChannelSessionID": channel_session_id,
+        "SourceSystem": source_system,
+        "Timestamp": timestamp,
+        "Parameters": parameters,
+        "ReferenceData": reference_data,
+        "Initiator": initiator,
+        "PrimaryParty": primary_party,
+        "ReceiverParty": receiver_party
+    }
+
+
+def b2c_payment_request(initiator_name, security_credential, command_id, amount, party_a, party_b, remarks, queue_timeout_url, result_url, occasion):
+    """Build a B2C payment request payload."""
+    return {
+        "InitiatorName": initiator_name,
+        "SecurityCredential": security_credential,
+        "Occasion": occasion,
+        "CommandID": command_id,
+        "PartyA": party_a,
+        "PartyB": party_b,
+        "Remarks": remarks,
+        "Amount": amount,
+        "QueueTimeOutURL": queue_timeout_url,
+        "ResultURL": result_url
+    }
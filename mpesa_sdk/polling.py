@@ -0,0 +1,287 @@
+"""
+Status polling for STK pushes whose callback has not arrived.
+
+Pending transactions sit in a binary heap ordered by their next poll time, so
+hundreds of thousands of them cost one small entry each and picking the next
+due poll is O(log n). Polls back off exponentially with jitter, queries for the
+same reference are coalesced, and a transaction stops being polled as soon as
+its callback arrives. An optional SQLite store keeps pending transactions
+across restarts.
+"""
+import heapq
+import logging
+import random
+import sqlite3
+import threading
+import time
+
+from .exceptions import MPesaError
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = frozenset({"", "Pending", "Processing", "Queued"})
+
+
+def is_final(response):
+    """Default check whether a status query response settles the transaction."""
+    return response.get("output_ResponseTransactionStatus", "") not in PENDING_STATUSES
+
+
+class _Pending:
+    __slots__ = ("merchant_request_id", "query_reference", "third_party_reference",
+                 "due", "attempts", "expires_at")
+
+    def __init__(self, merchant_request_id, query_reference, third_party_reference, due, attempts, expires_at):
+        self.merchant_request_id = merchant_request_id
+        self.query_reference = query_reference
+        self.third_party_reference = third_party_reference
+        self.due = due
+        self.attempts = attempts
+        self.expires_at = expires_at
+
+
+class SqlitePollStore:
+    """Keeps pending transactions in a SQLite file so a restart resumes polling."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            " merchant_request_id TEXT PRIMARY KEY, query_reference TEXT, third_party_reference TEXT,"
+            " due REAL, attempts INTEGER, expires_at REAL)")
+        self._lock = threading.Lock()
+
+    def save(self, entry):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pending VALUES (?, ?, ?, ?, ?, ?)",
+                (entry.merchant_request_id, entry.query_reference, entry.third_party_reference,
+                 entry.due, entry.attempts, entry.expires_at))
+
+    def delete(self, merchant_request_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM pending WHERE merchant_request_id = ?", (merchant_request_id,))
+
+    def load(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM pending").fetchall()
+        return [_Pending(*row) for row in rows]
+
+    def close(self):
+        self._conn.close()
+
+
+class StatusPoller:
+    """Polls transaction status for STK pushes until they settle or their callback arrives."""
+
+    def __init__(self, sdk, on_resolved=None, store=None, initial_delay=30.0, max_delay=600.0, backoff=2.0,
+                 max_age=24 * 3600.0, max_polls_per_second=None, is_final=is_final, clock=time.time):
+        """
+        Initialize the poller.
+
+        Args:
+            sdk (MPesaSDK): Client used for ``query_transaction_status``.
+            on_resolved (callable): Called with (merchant_request_id, response)
+                when a status query settles a transaction, and with
+                (merchant_request_id, None) when it expires unresolved.
+            store (SqlitePollStore): Optional persistent store. Pending entries
+                in it are loaded immediately.
+            initial_delay (float): Seconds after tracking before the first poll.
+            max_delay (float): Upper bound on the delay between polls.
+            backoff (float): Factor the delay grows by after each unsettled poll.
+            max_age (float): Seconds after which a transaction is given up on.
+            max_polls_per_second (float): Cap on status queries issued by the
+                poller, on top of any limits in the SDK transport.
+            is_final (callable): Decides whether a status response settles the
+                transaction.
+            clock (callable): Wall clock in epoch seconds.
+        """
+        self.sdk = sdk
+        self.on_resolved = on_resolved
+        self.store = store
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.max_age = max_age
+        self.bucket = TokenBucket(max_polls_per_second) if max_polls_per_second else None
+        self.is_final = is_final
+        self.clock = clock
+        self.stats = {"tracked": 0, "resolved_by_callback": 0, "resolved_by_poll": 0, "expired": 0,
+                      "polls": 0, "coalesced": 0, "errors": 0}
+        self._pending = {}
+        self._heap = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        if store is not None:
+            for entry in store.load():
+                self._pending[entry.merchant_request_id] = entry
+                self._heap.append((entry.due, entry.merchant_request_id))
+            heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def track(self, merchant_request_id, query_reference=None, third_party_reference=None):
+        """
+        Start polling a transaction.
+
+        Args:
+            merchant_request_id (str): MerchantRequestID of the STK push.
+            query_reference (str): Reference passed to the status query.
+                Defaults to the MerchantRequestID.
+            third_party_reference (str): Reference of the caller's system.
+                Defaults to the MerchantRequestID.
+        """
+        now = self.clock()
+        entry = _Pending(merchant_request_id, query_reference or merchant_request_id,
+                         third_party_reference or merchant_request_id, now + self.initial_delay, 0,
+                         now + self.max_age)
+        with self._cond:
+            self._pending[merchant_request_id] = entry
+            heapq.heappush(self._heap, (entry.due, merchant_request_id))
+            self.stats["tracked"] += 1
+            if self._heap[0][1] == merchant_request_id:
+                self._cond.notify()
+        if self.store is not None:
+            self.store.save(entry)
+
+    def track_response(self, response):
+        """Track the transaction started by an ``stk_push`` response."""
+        self.track(response["MerchantRequestID"], response.get("CheckoutRequestID"))
+
+    def resolve(self, merchant_request_id):
+        """
+        Stop polling a transaction, e.g. because its callback arrived.
+
+        Returns:
+            bool: True if the transaction was being tracked.
+        """
+        with self._cond:
+            entry = self._pending.pop(merchant_request_id, None)
+            if entry is not None:
+                self.stats["resolved_by_callback"] += 1
+        # The heap entry is dropped lazily when it comes due.
+        if entry is not None and self.store is not None:
+            self.store.delete(merchant_request_id)
+        return entry is not None
+
+    def handle_callback(self, callback):
+        """CallbackReceiver handler for STK callbacks: stops polling the transaction."""
+        self.resolve(callback.merchant_request_id)
+
+    def _pop_due(self, now):
+        """Pop every live entry due by now, grouped by query reference."""
+        groups = {}
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            due, merchant_request_id = heapq.heappop(heap)
+            entry = self._pending.get(merchant_request_id)
+            if entry is None or entry.due != due:
+                # Resolved, or rescheduled with a newer heap entry.
+                continue
+            groups.setdefault(entry.query_reference, []).append(entry)
+        return groups
+
+    def run_pending(self):
+        """
+        Poll every transaction that is due now.
+
+        Returns:
+            int: Number of status queries sent.
+        """
+        now = self.clock()
+        with self._cond:
+            groups = self._pop_due(now)
+        sent = 0
+        for query_reference, entries in groups.items():
+            live = [e for e in entries if now < e.expires_at]
+            for entry in entries:
+                if now >= entry.expires_at:
+                    self._finish(entry, None, "expired")
+            if not live:
+                continue
+            self.stats["coalesced"] += len(live) - 1
+            if self.bucket is not None:
+                time.sleep(self.bucket.reserve())
+            self.stats["polls"] += 1
+            sent += 1
+            response = None
+            try:
+                response = self.sdk.query_transaction_status(query_reference, live[0].third_party_reference)
+                final = self.is_final(response)
+            except MPesaError as e:
+                self.stats["errors"] += 1
+                logger.warning("Status query for %s failed: %s", query_reference, e)
+                final = False
+            except Exception:
+                # Anything else, e.g. an undecodable response, must not lose
+                # the batch: it was already taken off the heap.
+                self.stats["errors"] += 1
+                logger.exception("Status query for %s failed", query_reference)
+                final = False
+            for entry in live:
+                if final:
+                    self._finish(entry, response, "resolved_by_poll")
+                else:
+                    self._reschedule(entry)
+        return sent
+
+    def _finish(self, entry, response, outcome):
+        with self._cond:
+            if self._pending.get(entry.merchant_request_id) is not entry:
+                return
+            del self._pending[entry.merchant_request_id]
+            self.stats[outcome] += 1
+        if self.store is not None:
+            self.store.delete(entry.merchant_request_id)
+        if self.on_resolved is not None:
+            try:
+                self.on_resolved(entry.merchant_request_id, response)
+            except Exception:
+                logger.exception("on_resolved failed for %s", entry.merchant_request_id)
+
+    def _reschedule(self, entry):
+        entry.attempts += 1
+        delay = min(self.max_delay, self.initial_delay * self.backoff ** entry.attempts)
+        # +/-20% jitter keeps transactions tracked together from polling together.
+        entry.due = self.clock() + delay * random.uniform(0.8, 1.2)
+        with self._cond:
+            if self._pending.get(entry.merchant_request_id) is not entry:
+                return
+            heapq.heappush(self._heap, (entry.due, entry.merchant_request_id))
+        if self.store is not None:
+            self.store.save(entry)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    wait = self._heap[0][0] - self.clock() if self._heap else None
+                    if wait is not None and wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._stopping:
+                    return
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception("Status polling failed")
+
+    def start(self):
+        """Poll on a background thread until stop() is called."""
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="mpesa-status-poller", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
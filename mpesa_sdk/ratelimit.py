@@ -0,0 +1,211 @@
+"""
+Client-side rate limiting and concurrency control per operation.
+
+Buckets hand out reservations: a caller that finds the bucket empty takes a
+token from the future and sleeps until it is due, so waiting callers are
+served in arrival order instead of retrying in a loop.
+"""
+import fcntl
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from .exceptions import MPesaError
+
+_STATE = struct.Struct("dd")
+
+
+class RateLimitExceeded(MPesaError):
+    """Raised when a call would have to wait longer than the limiter allows."""
+    pass
+
+
+def _reserve(tokens, last, now, rate, burst, max_wait):
+    """
+    Take one token from a bucket.
+
+    Returns:
+        tuple: (tokens, wait) after the reservation, or None if the wait would
+        exceed ``max_wait``.
+    """
+    tokens = min(burst, tokens + (now - last) * rate) - 1
+    wait = -tokens / rate if tokens < 0 else 0.0
+    if max_wait is not None and wait > max_wait:
+        return None
+    return tokens, wait
+
+
+class TokenBucket:
+    """In-process token bucket."""
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        """
+        Args:
+            rate (float): Tokens added per second.
+            burst (int): Bucket capacity, i.e. calls allowed back to back.
+            clock (callable): Monotonic clock in seconds.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """
+        Reserve one call.
+
+        Returns:
+            float: Seconds the caller must wait before proceeding, or None if
+            that would exceed ``max_wait`` (nothing is reserved then).
+        """
+        with self._lock:
+            now = self.clock()
+            reserved = _reserve(self._tokens, self._last, now, self.rate, self.burst, max_wait)
+            if reserved is None:
+                return None
+            self._tokens, wait = reserved
+            self._last = now
+            return wait
+
+
+class SharedTokenBucket:
+    """
+    Token bucket whose state lives in a small file guarded by ``flock``.
+
+    Every process (e.g. each gunicorn worker) pointing at the same path draws
+    from one global quota.
+    """
+
+    def __init__(self, path, rate, burst=1):
+        """
+        Args:
+            path (str): State file shared by the cooperating processes.
+            rate (float): Tokens added per second across all processes.
+            burst (int): Bucket capacity.
+        """
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._file = os.fdopen(fd, "r+b")
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """See TokenBucket.reserve."""
+        with self._lock:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                self._file.seek(0)
+                raw = self._file.read(_STATE.size)
+                tokens, last = _STATE.unpack(raw) if len(raw) == _STATE.size else (float(self.burst), now)
+                reserved = _reserve(tokens, last, now, self.rate, self.burst, max_wait)
+                if reserved is None:
+                    return None
+                tokens, wait = reserved
+                self._file.seek(0)
+                self._file.write(_STATE.pack(tokens, now))
+                self._file.flush()
+                return wait
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def close(self):
+        self._file.close()
+
+
+class Limit:
+    """Rate and concurrency limits for one operation."""
+
+    def __init__(self, rate=None, burst=1, max_concurrency=None, max_wait=None, shared_path=None):
+        """
+        Args:
+            rate (float): Calls per second, or None for no rate limit.
+            burst (int): Calls allowed back to back before pacing kicks in.
+            max_concurrency (int): Calls allowed in flight at once, or None.
+            max_wait (float): Longest a call may be delayed before
+                RateLimitExceeded is raised instead. None waits as long as needed.
+            shared_path (str): State file for a cross-process bucket. The
+                concurrency limit is always per process.
+        """
+        self.max_wait = max_wait
+        if rate is None:
+            self.bucket = None
+        elif shared_path is not None:
+            self.bucket = SharedTokenBucket(shared_path, rate, burst)
+        else:
+            self.bucket = TokenBucket(rate, burst)
+        self.slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+
+
+class RateLimiter:
+    """
+    Per-operation rate limiter and concurrency governor used by Transport.
+
+    Operations are the keys used by the SDK: ``token``, ``stk_push``,
+    ``c2b_register_url``, ``c2b_payment`` and ``b2c_payment``.
+    """
+
+    def __init__(self, limits=None, default=None):
+        """
+        Args:
+            limits (dict): Maps operation name to a Limit.
+            default (Limit): Limit applied to operations not in ``limits``.
+        """
+        self.limits = dict(limits or {})
+        self.default = default
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, operation, key, value=1):
+        with self._stats_lock:
+            stats = self.stats.setdefault(operation, {"allowed": 0, "delayed": 0, "rejected": 0, "delay_seconds": 0.0})
+            stats[key] += value
+
+    @contextmanager
+    def acquire(self, operation):
+        """
+        Hold a slot for one call to ``operation``, sleeping if the rate limit
+        requires it.
+
+        Raises:
+            RateLimitExceeded: If the call would be delayed longer than the
+            operation's ``max_wait``, or no concurrency slot frees up in time.
+        """
+        limit = self.limits.get(operation, self.default)
+        if limit is None:
+            yield
+            return
+        waited = 0.0
+        # Only calls that actually had to wait count as delayed.
+        delayed = False
+        if limit.slots is not None and not limit.slots.acquire(blocking=False):
+            start = time.monotonic()
+            if not limit.slots.acquire(timeout=limit.max_wait):
+                self._count(operation, "rejected")
+                raise RateLimitExceeded(f"{operation}: no free concurrency slot within {limit.max_wait}s")
+            waited = time.monotonic() - start
+            delayed = True
+        try:
+            if limit.bucket is not None:
+                max_wait = None if limit.max_wait is None else max(limit.max_wait - waited, 0.0)
+                wait = limit.bucket.reserve(max_wait)
+                if wait is None:
+                    self._count(operation, "rejected")
+                    raise RateLimitExceeded(f"{operation}: rate limit would delay the call beyond {limit.max_wait}s")
+                if wait > 0:
+                    time.sleep(wait)
+                    waited += wait
+                    delayed = True
+            if delayed:
+                self._count(operation, "delayed")
+                self._count(operation, "delay_seconds", waited)
+            self._count(operation, "allowed")
+            yield
+        finally:
+            if limit.slots is not None:
+                limit.slots.release()
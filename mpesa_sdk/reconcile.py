@@ -0,0 +1,287 @@
+"""
+Streaming reconciliation of Safaricom statements against internal records.
+
+Both inputs are streamed once and split into hash partitions on disk by
+transaction reference, then each partition pair is joined in memory on its
+own (a grace hash join). A record often carries several references, e.g. a
+receipt number and the request ID we sent, and the two sides do not always
+carry the same ones, so a record is written to the partition of each of its
+references and matched on any reference it shares with the other side.
+Memory use is bounded by the largest partition plus one byte per record
+rather than by the size of the inputs, so a month of statement rows can be
+reconciled on a modest machine by raising ``partitions``.
+
+Every record lands in one of the output sets, each streamed to a JSONL file:
+
+* ``matched`` - a shared reference and the same amount on both sides
+* ``amount_mismatch`` - a shared reference, different amount
+* ``missing_in_ledger`` - on the statement only
+* ``missing_in_statement`` - in the ledger only
+* ``duplicate`` - shares a reference with an earlier record on the same
+  side; the first occurrence is the one that is matched
+* ``unkeyed`` - no reference field found
+
+Each record is matched at most once, however many references it shares.
+"""
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from decimal import Decimal, InvalidOperation
+
+from .files import read_records
+
+MATCHED = "matched"
+AMOUNT_MISMATCH = "amount_mismatch"
+MISSING_IN_LEDGER = "missing_in_ledger"
+MISSING_IN_STATEMENT = "missing_in_statement"
+DUPLICATE = "duplicate"
+UNKEYED = "unkeyed"
+
+OUTCOMES = (MATCHED, AMOUNT_MISMATCH, MISSING_IN_LEDGER, MISSING_IN_STATEMENT, DUPLICATE, UNKEYED)
+
+STATEMENT = "statement"
+LEDGER = "ledger"
+
+# Fields a record's references are taken from, in order of preference:
+# receipt/transaction IDs first, then the request IDs we generate and send
+# with each request.
+DEFAULT_KEY_FIELDS = (
+    "TransactionID", "TransID", "output_TransactionID", "Receipt No.", "MpesaReceiptNumber",
+    "RequestRefID", "MerchantRequestID", "ThirdPartyReference", "input_ThirdPartyReference",
+    "output_ThirdPartyReference",
+)
+DEFAULT_AMOUNT_FIELDS = (
+    "Amount", "TransAmount", "TransactionAmount", "input_Amount", "amount", "Paid In", "Withdrawn",
+)
+DEFAULT_PARTITIONS = 256
+
+# Per-record state kept in memory while joining.
+_OPEN = 0
+_DUPLICATE = 1
+_MATCHED = 2
+
+
+def field_getter(fields):
+    """Return a function giving the first non-empty value of ``fields`` in a record, as a string."""
+    def get(record):
+        for field in fields:
+            value = record.get(field)
+            if value not in (None, ""):
+                return str(value).strip()
+        return None
+    return get
+
+
+def field_values(fields):
+    """Return a function giving every distinct non-empty value of ``fields`` in a record, as strings."""
+    def get(record):
+        values = []
+        for field in fields:
+            value = record.get(field)
+            if value not in (None, ""):
+                value = str(value).strip()
+                if value not in values:
+                    values.append(value)
+        return values
+    return get
+
+
+def _references(value):
+    # Key functions may return one reference, a list of them, or None.
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(dict.fromkeys(value))
+
+
+def parse_amount(value):
+    """Parse an amount such as '1,250.00' or '-10' into a Decimal magnitude, or None."""
+    if value is None:
+        return None
+    try:
+        return abs(Decimal(str(value).replace(",", "")))
+    except InvalidOperation:
+        return None
+
+
+class Reconciler:
+    """Joins a statement export and a ledger on transaction reference with bounded memory."""
+
+    def __init__(self, output_dir, statement_key=None, ledger_key=None, statement_amount=None,
+                 ledger_amount=None, partitions=DEFAULT_PARTITIONS, work_dir=None, tolerance=0,
+                 write_matched=True):
+        """
+        Initialize the reconciler.
+
+        Args:
+            output_dir (str): Directory the ``<outcome>.jsonl`` files are written to.
+            statement_key (callable): Returns a statement record's reference,
+                or a list of them in order of preference. Defaults to every
+                one of DEFAULT_KEY_FIELDS present.
+            ledger_key (callable): Same for ledger records.
+            statement_amount (callable): Returns a statement record's amount.
+                Defaults to the first of DEFAULT_AMOUNT_FIELDS present.
+            ledger_amount (callable): Same for ledger records.
+            partitions (int): Number of on-disk partitions. Peak memory is
+                roughly one partition of the ledger.
+            work_dir (str): Where partition files are spilled. Defaults to the
+                system temp directory.
+            tolerance (Decimal or float): Largest amount difference still
+                counted as a match.
+            write_matched (bool): Write matched pairs to ``matched.jsonl``.
+                Matches are always counted.
+        """
+        self.output_dir = output_dir
+        self.statement_key = statement_key or field_values(DEFAULT_KEY_FIELDS)
+        self.ledger_key = ledger_key or field_values(DEFAULT_KEY_FIELDS)
+        self.statement_amount = statement_amount or field_getter(DEFAULT_AMOUNT_FIELDS)
+        self.ledger_amount = ledger_amount or field_getter(DEFAULT_AMOUNT_FIELDS)
+        self.partitions = partitions
+        self.work_dir = work_dir
+        self.tolerance = Decimal(str(tolerance))
+        self.write_matched = write_matched
+        self.summary = {}
+
+    def run(self, statement, ledger):
+        """
+        Reconcile two streams of records.
+
+        Args:
+            statement (iterable or str): Statement rows, or a CSV/JSONL path.
+            ledger (iterable or str): Internal records, or a CSV/JSONL path.
+
+        Returns:
+            dict: Number of records per outcome.
+        """
+        if isinstance(statement, str):
+            statement = read_records(statement)
+        if isinstance(ledger, str):
+            ledger = read_records(ledger)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.summary = dict.fromkeys(OUTCOMES, 0)
+        self._outputs = {
+            outcome: open(os.path.join(self.output_dir, f"{outcome}.jsonl"), "w")
+            for outcome in OUTCOMES if outcome != MATCHED or self.write_matched
+        }
+        spill = tempfile.mkdtemp(prefix="mpesa-reconcile-", dir=self.work_dir)
+        try:
+            self._states = {
+                STATEMENT: bytearray(self._partition(statement, STATEMENT, self.statement_key,
+                                                     self.statement_amount, spill)),
+                LEDGER: bytearray(self._partition(ledger, LEDGER, self.ledger_key, self.ledger_amount, spill)),
+            }
+            # Duplicates are found first, over every partition, since a
+            # record can be a duplicate through a reference in a partition
+            # joined after one where it would otherwise match.
+            for index in range(self.partitions):
+                self._find_duplicates(index, spill)
+            for index in range(self.partitions):
+                self._join(index, spill)
+            for index in range(self.partitions):
+                self._find_missing(index, spill)
+        finally:
+            shutil.rmtree(spill, ignore_errors=True)
+            for f in self._outputs.values():
+                f.close()
+        return self.summary
+
+    def _emit(self, outcome, entry):
+        self.summary[outcome] += 1
+        f = self._outputs.get(outcome)
+        if f is not None:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+    def _path(self, spill, side, index):
+        return os.path.join(spill, f"{side}-{index}.jsonl")
+
+    def _index(self, reference):
+        return zlib.crc32(reference.encode()) % self.partitions
+
+    def _read(self, spill, side, index):
+        with open(self._path(spill, side, index)) as f:
+            for line in f:
+                yield json.loads(line)
+
+    def _partition(self, records, side, key, amount, spill):
+        """Spill every keyed record to the partition of each of its references, and return how many there were."""
+        files = [open(self._path(spill, side, index), "w") for index in range(self.partitions)]
+        count = 0
+        try:
+            for record in records:
+                references = _references(key(record))
+                if not references:
+                    self._emit(UNKEYED, {"side": side, "record": record})
+                    continue
+                line = json.dumps([count, references, amount(record), record], default=str) + "\n"
+                for index in {self._index(reference) for reference in references}:
+                    files[index].write(line)
+                count += 1
+        finally:
+            for f in files:
+                f.close()
+        return count
+
+    def _find_duplicates(self, index, spill):
+        # Each reference is only looked at in its own partition, so every
+        # pair of records sharing one is seen exactly once.
+        for side in (LEDGER, STATEMENT):
+            states = self._states[side]
+            owners = set()
+            for number, references, _, record in self._read(spill, side, index):
+                for reference in references:
+                    if self._index(reference) != index:
+                        continue
+                    if reference not in owners:
+                        owners.add(reference)
+                    elif states[number] != _DUPLICATE:
+                        states[number] = _DUPLICATE
+                        self._emit(DUPLICATE, {"side": side, "key": reference, "record": record})
+
+    def _join(self, index, spill):
+        statement_states, ledger_states = self._states[STATEMENT], self._states[LEDGER]
+        ledger = {}
+        for number, references, amount, record in self._read(spill, LEDGER, index):
+            if ledger_states[number] == _OPEN:
+                for reference in references:
+                    if self._index(reference) == index:
+                        ledger[reference] = (number, amount, record)
+        for number, references, amount, record in self._read(spill, STATEMENT, index):
+            if statement_states[number] != _OPEN:
+                continue
+            for reference in references:
+                match = ledger.get(reference) if self._index(reference) == index else None
+                # The ledger record may already have matched through another reference.
+                if match is None or ledger_states[match[0]] != _OPEN:
+                    continue
+                ledger_number, ledger_amount, ledger_record = match
+                statement_states[number] = ledger_states[ledger_number] = _MATCHED
+                statement_value, ledger_value = parse_amount(amount), parse_amount(ledger_amount)
+                if (statement_value is None or ledger_value is None
+                        or abs(statement_value - ledger_value) > self.tolerance):
+                    self._emit(AMOUNT_MISMATCH, {"key": reference, "statement_amount": amount,
+                                                 "ledger_amount": ledger_amount,
+                                                 "statement": record, "ledger": ledger_record})
+                else:
+                    self._emit(MATCHED, {"key": reference, "amount": amount})
+                break
+
+    def _find_missing(self, index, spill):
+        # A record is reported from the partition of its first reference only.
+        for side, outcome in ((STATEMENT, MISSING_IN_LEDGER), (LEDGER, MISSING_IN_STATEMENT)):
+            states = self._states[side]
+            for number, references, _, record in self._read(spill, side, index):
+                if states[number] == _OPEN and self._index(references[0]) == index:
+                    self._emit(outcome, {"key": references[0], "record": record})
+
+
+def reconcile(statement, ledger, output_dir, **kwargs):
+    """
+    Reconcile a statement export against internal records. See Reconciler for the options.
+
+    Returns:
+        dict: Number of records per outcome.
+    """
+    return Reconciler(output_dir, **kwargs).run(statement, ledger)
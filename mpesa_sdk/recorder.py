@@ -0,0 +1,344 @@
+"""
+Record SDK traffic and replay it for capacity testing.
+
+A ``TrafficRecorder`` given to a Transport (or to MPesaSDK as ``recorder=``)
+captures every request with its response and timing. The request thread only
+appends a tuple to an in-memory buffer; a background thread redacts,
+serializes and writes the buffered records to a rotating JSONL file. Secrets
+never reach the file: ``Password``, ``SecurityCredential`` and ``SecretKey``
+(at any depth, e.g. in the C2B ``Initiator``) and access tokens are masked,
+the consumer key in query strings too, and no headers are kept.
+
+A ``Replayer`` sends a recording to the mock server or the sandbox again,
+with the original spacing between requests compressed ``speed`` times and
+at most ``concurrency`` requests in flight:
+
+    python -m mpesa_sdk.recorder traffic.jsonl --base-url http://127.0.0.1:8000 --speed 10
+"""
+import argparse
+import glob
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from . import payloads
+from .models import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+REDACTED = "***"
+# Body fields, at any depth, whose values are never written.
+REDACTED_FIELDS = frozenset({
+    "Password", "SecurityCredential", "input_SecurityCredential", "SecretKey", "access_token",
+})
+# Query string parameters whose values are never written.
+REDACTED_PARAMS = frozenset({"apikey"})
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_PENDING = 100_000
+
+
+def redact(value, fields=REDACTED_FIELDS):
+    """Copy of a JSON value with the values of ``fields`` masked at any depth."""
+    if isinstance(value, dict):
+        return {k: REDACTED if k in fields and v is not None else redact(v, fields) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v, fields) for v in value]
+    return value
+
+
+def _path(url):
+    """Path and query of a URL, with secret query parameters masked."""
+    parts = urlsplit(url)
+    if not parts.query:
+        return parts.path
+    query = [(k, REDACTED if k in REDACTED_PARAMS else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return f"{parts.path}?{urlencode(query, safe='*')}"
+
+
+def _decode(body):
+    if body is None or isinstance(body, (dict, list)):
+        return body
+    try:
+        return loads(body)
+    except ValueError:
+        return body.decode(errors="replace") if isinstance(body, bytes) else body
+
+
+class TrafficRecorder:
+    """Buffered, rotating JSONL recorder of requests and responses."""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, max_pending=DEFAULT_MAX_PENDING,
+                 redacted_fields=REDACTED_FIELDS, record_responses=True):
+        """
+        Initialize the recorder and start its flush thread.
+
+        Args:
+            path (str): Log file. Rotated files are ``path.1`` (newest) to
+                ``path.<backup_count>``.
+            max_bytes (int): Size at which the log is rotated. 0 never rotates.
+            backup_count (int): Rotated files kept.
+            flush_interval (float): Seconds between background flushes.
+            max_pending (int): Records buffered before new ones are dropped
+                (and counted in ``dropped``) rather than slowing requests down.
+            redacted_fields (collection): Body fields masked in the log.
+            record_responses (bool): Keep response bodies, not only status
+                and timing.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.redacted_fields = redacted_fields
+        self.record_responses = record_responses
+        self.recorded = 0
+        self.dropped = 0
+        self._pending = deque()
+        self._pending_lock = threading.Lock()
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mpesa-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, started, elapsed, operation, method, url, params, body, status_code, response, error=None,
+               throttled=None):
+        """
+        Buffer one exchange. Called by the transport on the request thread.
+
+        Args:
+            started (float): Wall-clock time the request started.
+            elapsed (float): Seconds it took to send, not counting time spent
+                waiting for the rate limiter. None if it was never sent.
+            operation (str): Operation name.
+            method (str): HTTP method.
+            url (str): Absolute URL.
+            params (dict): Query string parameters.
+            body (dict or bytes): JSON request body.
+            status_code (int): Response status, None if there was no response.
+            response (bytes): Response body.
+            error (Exception): Error raised instead of a response.
+            throttled (float): Seconds the rate limiter held the request back.
+        """
+        item = (started, elapsed, throttled, operation, method, url, params, body, status_code,
+                response if self.record_responses else None, None if error is None else type(error).__name__)
+        with self._pending_lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(item)
+
+    def _entry(self, item):
+        started, elapsed, throttled, operation, method, url, params, body, status_code, response, error = item
+        return {
+            "t": started,
+            "elapsed": elapsed,
+            "throttled": throttled,
+            "op": operation,
+            "method": method,
+            "path": _path(url),
+            "params": redact(params, self.redacted_fields),
+            "body": redact(_decode(body), self.redacted_fields),
+            "status": status_code,
+            "response": redact(_decode(response), self.redacted_fields),
+            "error": error,
+        }
+
+    def flush(self):
+        """Write every buffered record now."""
+        with self._write_lock:
+            chunks = []
+            while self._pending:
+                chunks.append(dumps(self._entry(self._pending.popleft())) + b"\n")
+            for chunk in chunks:
+                if self.max_bytes and self._size + len(chunk) > self.max_bytes and self._size:
+                    self._rotate()
+                self._file.write(chunk)
+                self._size += len(chunk)
+            self._file.flush()
+            self.recorded += len(chunks)
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count:
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, "wb")
+        self._size = 0
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not write traffic recording to %s", self.path)
+
+    def close(self):
+        """Stop the flush thread and write what is left."""
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_recording(path):
+    """
+    Yield the records of a recording, oldest first, including rotated files.
+
+    Args:
+        path (str): Log file the recorder wrote to.
+    """
+    rotated = [name for name in glob.glob(glob.escape(path) + ".*") if name.rsplit(".", 1)[1].isdigit()]
+    rotated.sort(key=lambda name: -int(name.rsplit(".", 1)[1]))
+    for name in rotated + [path]:
+        with open(name, "rb") as f:
+            for line in f:
+                try:
+                    yield loads(line)
+                except ValueError:
+                    continue
+
+
+class Replayer:
+    """Sends recorded traffic again, faster or slower than it was recorded."""
+
+    def __init__(self, sdk, speed=1.0, concurrency=16, include_tokens=False):
+        """
+        Initialize the replayer.
+
+        Args:
+            sdk (MPesaSDK): Client for the target, e.g. pointing at the mock
+                server. Every recorded path is sent to its base URL, through
+                its transport and with its token, without retries;
+                redacted passwords and security credentials are filled in
+                from its credentials when it has them configured.
+            speed (float): Replay speed, e.g. 1 for real time or 100 for a
+                hundred times faster.
+            concurrency (int): Most requests in flight.
+            include_tokens (bool): Replay recorded token requests too. The
+                client fetches the token it needs either way.
+        """
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.sdk = sdk
+        self.speed = speed
+        self.concurrency = concurrency
+        self.include_tokens = include_tokens
+
+    def _prepare(self, record):
+        body = record.get("body")
+        if not isinstance(body, dict):
+            return body
+        credentials = self.sdk.credentials
+        if body.get("Password") == REDACTED and credentials.passkey:
+            body["Password"], body["Timestamp"] = credentials.stk_password(body.get("BusinessShortCode"))
+        if (body.get("SecurityCredential") == REDACTED and credentials.security_credentials is not None
+                and credentials.initiator_password):
+            body["SecurityCredential"] = credentials.security_credential(body.get("InitiatorName"))
+        return body
+
+    def _send(self, record):
+        start = time.perf_counter()
+        try:
+            headers = payloads.bearer_headers(self.sdk.tokens.get_token())
+            response = self.sdk.transport.request(
+                record["method"], self.sdk.base_url + record["path"], headers=headers,
+                json=self._prepare(record), params=record.get("params"), operation=record.get("op"))
+        except Exception as e:
+            # Counted by class in the summary rather than aborting the replay.
+            return time.perf_counter() - start, type(e).__name__
+        return time.perf_counter() - start, response.status_code
+
+    def run(self, records):
+        """
+        Replay records, e.g. from read_recording().
+
+        Returns:
+            dict: Requests sent, count per status code (or error class),
+            achieved requests per second, p50/p99 latency in seconds, and
+            the p99 and maximum lag in seconds behind the replay schedule,
+            which grows when ``concurrency`` is too low for the speed.
+        """
+        results = []
+        lags = []
+        first = None
+        start = time.monotonic()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="mpesa-replay") as pool:
+            in_flight = threading.BoundedSemaphore(self.concurrency)
+            for record in records:
+                if record.get("op") == payloads.TOKEN and not self.include_tokens:
+                    continue
+                if first is None:
+                    first = record["t"]
+                due = start + (record["t"] - first) / self.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                in_flight.acquire()
+                lags.append(max(0.0, time.monotonic() - due))
+                future = pool.submit(self._send, record)
+                future.add_done_callback(lambda _: in_flight.release())
+                results.append(future)
+        elapsed = time.monotonic() - start
+        outcomes = [f.result() for f in results]
+        latencies = sorted(latency for latency, _ in outcomes)
+        lags.sort()
+        return {
+            "requests": len(outcomes),
+            "statuses": dict(Counter(status for _, status in outcomes)),
+            "rps": len(outcomes) / elapsed if elapsed else 0.0,
+            "latency_p50": _percentile(latencies, 0.50),
+            "latency_p99": _percentile(latencies, 0.99),
+            "lag_p99": _percentile(lags, 0.99),
+            "lag_max": lags[-1] if lags else None,
+        }
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def replay(path, sdk, speed=1.0, concurrency=16, **kwargs):
+    """Replay a recording file against ``sdk``. See Replayer for the options and result."""
+    return Replayer(sdk, speed, concurrency, **kwargs).run(read_recording(path))
+
+
+def main(argv=None):
+    from .client import MPesaSDK
+
+    parser = argparse.ArgumentParser(description="Replay recorded M-Pesa traffic.")
+    parser.add_argument("recording", help="log file written by TrafficRecorder")
+    parser.add_argument("--base-url", help="target, e.g. a mock server URL; the sandbox by default")
+    parser.add_argument("--key", default=os.environ.get("MPESA_CONSUMER_KEY", "key"))
+    parser.add_argument("--secret", default=os.environ.get("MPESA_CONSUMER_SECRET", "secret"))
+    parser.add_argument("--passkey", default=os.environ.get("MPESA_PASSKEY"))
+    parser.add_argument("--speed", type=float, default=1.0, help="e.g. 10 for ten times real time")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    with MPesaSDK(args.key, args.secret, base_url=args.base_url, passkey=args.passkey) as sdk:
+        summary = replay(args.recording, sdk, args.speed, args.concurrency)
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
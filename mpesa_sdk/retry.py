@@ -0,0 +1,315 @@
+"""
+Retry policy, retry budget, per-operation circuit breaker and idempotency
+tracking used by MPesaSDK.
+"""
+import logging
+import random
+import threading
+import time
+
+from .exceptions import CircuitOpenError, FatalError, MPesaError, RetryableError
+
+logger = logging.getLogger(__name__)
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent traffic so retries cannot multiply
+    load on an API that is already struggling.
+
+    Every call deposits ``ratio`` tokens and every retry withdraws one. A small
+    per-second allowance keeps retries possible at low traffic, and the budget
+    starts with ``initial_tokens`` so a freshly created client can retry.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, max_tokens=100.0, initial_tokens=10.0,
+                 clock=time.monotonic):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.clock = clock
+        self._tokens = min(initial_tokens, max_tokens)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount):
+        now = self.clock()
+        amount += (now - self._last) * self.min_per_second
+        self._last = now
+        self._tokens = min(self.max_tokens, self._tokens + amount)
+
+    def deposit(self):
+        """Record a first attempt."""
+        with self._lock:
+            self._refill(self.ratio)
+
+    def withdraw(self):
+        """
+        Take budget for one retry.
+
+        Returns:
+            bool: False if the budget is exhausted and the retry must be skipped.
+        """
+        with self._lock:
+            self._refill(0.0)
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by attempts and a retry budget."""
+
+    def __init__(self, max_attempts=3, base_delay=0.2, max_delay=5.0, jitter=True, budget=None,
+                 sleep=time.sleep):
+        """
+        Args:
+            max_attempts (int): Total attempts including the first one. 1 disables retries.
+            base_delay (float): Backoff before the first retry, in seconds.
+            max_delay (float): Upper bound on any single backoff.
+            jitter (bool): Sleep a random fraction of the backoff ("full jitter")
+                so clients that failed together do not retry in lockstep.
+            budget (RetryBudget): Shared retry budget. A private one is used by default.
+            sleep (callable): Sleep function, replaceable in tests.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.budget = budget if budget is not None else RetryBudget()
+        self.sleep = sleep
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number ``attempt`` (starting at 1)."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def should_retry(self, error, attempt, idempotent):
+        """
+        Decide whether a failed attempt may be retried.
+
+        Writes that are not idempotent are only retried when the request is
+        known not to have been processed (no connection, 429 or 503); anything
+        else could execute the payment twice.
+        """
+        if attempt >= self.max_attempts or not isinstance(error, RetryableError):
+            return False
+        if isinstance(error, CircuitOpenError):
+            return False
+        if not idempotent and not (error.request_sent is False or error.status_code in (429, 503)):
+            return False
+        return self.budget.withdraw()
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an operation keeps failing.
+
+    After ``failure_threshold`` consecutive transient failures the circuit
+    opens and calls raise CircuitOpenError without touching the network. Once
+    ``recovery_timeout`` has passed a single trial call is let through; its
+    outcome closes the circuit again or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and self.clock() - self._opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                return
+            raise CircuitOpenError(f"{self.name}: circuit open after {self._failures} consecutive failures")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+
+
+class _Entry:
+    __slots__ = ("done", "result", "error", "expires_at")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.expires_at = None
+
+
+class IdempotencyCache:
+    """
+    Makes sure a request ID (``MerchantRequestID``, ``RequestRefID``) is sent
+    at most once per outcome.
+
+    Concurrent calls with the same key wait for the first one and share its
+    result. A successful or in-doubt outcome is remembered for ``ttl``
+    seconds, so resubmitting the same ID returns the earlier response (or the
+    earlier in-doubt error) instead of charging the customer again. Requests
+    that were definitely not processed are forgotten so they can be resent.
+    """
+
+    def __init__(self, ttl=24 * 3600, max_entries=100_000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, fn):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at < self.clock():
+                entry = None
+            owner = entry is None
+            if owner:
+                if len(self._entries) >= self.max_entries:
+                    self._evict()
+                entry = self._entries[key] = _Entry()
+        if not owner:
+            entry.done.wait()
+            if entry.error is not None:
+                raise entry.error
+            return entry.result
+        try:
+            entry.result = fn()
+        except Exception as e:
+            entry.error = e
+            if not getattr(e, "in_doubt", False):
+                with self._lock:
+                    self._entries.pop(key, None)
+            raise
+        finally:
+            entry.expires_at = self.clock() + self.ttl
+            entry.done.set()
+        return entry.result
+
+    def _evict(self):
+        # Insertion order approximates age; drop the oldest finished tenth.
+        finished = [k for k, e in self._entries.items() if e.done.is_set()]
+        for key in finished[:max(1, self.max_entries // 10)]:
+            del self._entries[key]
+
+
+class Retrier:
+    """Runs SDK calls under a retry policy, a circuit breaker per operation and idempotency tracking."""
+
+    def __init__(self, policy=None, failure_threshold=5, recovery_timeout=30.0, idempotency=None,
+                 instrumentation=None, idempotency_scope=None):
+        """
+        Args:
+            policy (RetryPolicy): Retry policy. Defaults to RetryPolicy().
+            failure_threshold (int): Consecutive failures that open an operation's circuit.
+            recovery_timeout (float): Seconds an open circuit waits before a trial call.
+            idempotency (IdempotencyCache): Request ID tracker. Defaults to a private one.
+            instrumentation (Instrumentation): Optional hooks told about every retry.
+            idempotency_scope (str): Prefix for this retrier's request IDs when
+                ``idempotency`` is shared with retriers of other accounts, e.g.
+                a tenant ID, so equal request IDs of different accounts differ.
+        """
+        self.policy = policy if policy is not None else RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.idempotency = idempotency if idempotency is not None else IdempotencyCache()
+        self.breakers = {}
+        self.retries = 0
+        self.instrumentation = instrumentation
+        self.idempotency_scope = idempotency_scope
+        self._lock = threading.Lock()
+
+    def breaker(self, operation):
+        """Return the circuit breaker for an operation, creating it on first use."""
+        breaker = self.breakers.get(operation)
+        if breaker is None:
+            with self._lock:
+                breaker = self.breakers.setdefault(
+                    operation, CircuitBreaker(operation, self.failure_threshold, self.recovery_timeout))
+        return breaker
+
+    def call(self, operation, fn, idempotency_key=None, read_only=False):
+        """
+        Run ``fn`` with retries.
+
+        Args:
+            operation (str): Operation name the circuit breaker is keyed by.
+            fn (callable): Sends the request and returns the parsed response.
+            idempotency_key (str): Request ID that identifies the request
+                across retries, or None if the operation has none.
+            read_only (bool): The request has no side effects (e.g. a status
+                query) and may be retried after any transient failure.
+
+        Returns:
+            The value returned by ``fn``.
+        """
+        if read_only:
+            return self._attempts(operation, fn, idempotent=True)
+        if idempotency_key is None:
+            return self._attempts(operation, fn, idempotent=False)
+        key = (operation, idempotency_key)
+        if self.idempotency_scope is not None:
+            key = (self.idempotency_scope,) + key
+        return self.idempotency.run(key, lambda: self._attempts(operation, fn, idempotent=True))
+
+    def _attempts(self, operation, fn, idempotent):
+        breaker = self.breaker(operation)
+        self.policy.budget.deposit()
+        attempt = 1
+        while True:
+            breaker.before_call()
+            try:
+                result = fn()
+            except RetryableError as e:
+                breaker.record_failure()
+                if not self.policy.should_retry(e, attempt, idempotent):
+                    raise
+                error = e
+            except FatalError:
+                # The endpoint is up and answering; the request itself was bad.
+                breaker.record_success()
+                raise
+            except MPesaError:
+                # Rejected by the SDK or the token endpoint (validation, rate
+                # limit, credentials): the caller's problem, not the endpoint's.
+                breaker.record_success()
+                raise
+            except Exception:
+                # Anything unexpected counts as a failure, so a half-open
+                # circuit never stays waiting for a verdict.
+                breaker.record_failure()
+                raise
+            else:
+                breaker.record_success()
+                return result
+            delay = self.policy.backoff(attempt)
+            logger.debug("Retrying %s after %s (attempt %d, %.3fs)", operation, error, attempt + 1, delay)
+            if self.instrumentation is not None:
+                self.instrumentation.on_retry(operation, attempt + 1, delay, error)
+            self.policy.sleep(delay)
+            attempt += 1
+            with self._lock:
+                self.retries += 1
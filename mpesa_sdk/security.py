@@ -0,0 +1,181 @@
+"""
+STK push password and B2C security credential generation.
+
+STK passwords are base64(short_code + passkey + timestamp). Timestamps have
+one-second resolution, so the last password per short code is reused within
+the same second and the short code/passkey prefix is encoded only once.
+
+Security credentials are the initiator password RSA-encrypted (PKCS#1 v1.5)
+with Safaricom's public certificate. The certificate is parsed once and the
+encrypted credential is cached per initiator and certificate until it
+expires, so the RSA operation runs once per rotation instead of per call.
+Requires the optional ``cryptography`` dependency (``pip install mpesa_sdk[security]``).
+"""
+import base64
+import hashlib
+import threading
+import time
+
+TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
+
+
+def make_timestamp(now=None):
+    """Format a Safaricom request timestamp (YYYYMMDDHHMMSS) in local time."""
+    return time.strftime(TIMESTAMP_FORMAT, time.localtime(now))
+
+
+def stk_password(business_short_code, passkey, timestamp):
+    """Build an STK push password from scratch."""
+    return base64.b64encode(f"{business_short_code}{passkey}{timestamp}".encode()).decode()
+
+
+class StkPasswordGenerator:
+    """Builds STK push passwords for one short code and passkey."""
+
+    def __init__(self, business_short_code, passkey, clock=time.time):
+        self.business_short_code = str(business_short_code)
+        self._prefix = f"{business_short_code}{passkey}".encode()
+        self.clock = clock
+        self._last = (None, None, None)
+
+    def generate(self, timestamp=None):
+        """
+        Return the password and timestamp to send with an STK push.
+
+        Args:
+            timestamp (str): Timestamp to sign. The current time is used when omitted.
+
+        Returns:
+            tuple: (password, timestamp) pair.
+        """
+        if timestamp is None:
+            second = int(self.clock())
+            last_second, last_timestamp, last_password = self._last
+            if second == last_second:
+                return last_password, last_timestamp
+            timestamp = make_timestamp(second)
+            password = base64.b64encode(self._prefix + timestamp.encode()).decode()
+            self._last = (second, timestamp, password)
+            return password, timestamp
+        return base64.b64encode(self._prefix + timestamp.encode()).decode(), timestamp
+
+
+class SecurityCredentials:
+    """Encrypts initiator passwords with Safaricom's certificate, caching the result."""
+
+    def __init__(self, certificate, ttl=3600.0, clock=time.monotonic):
+        """
+        Args:
+            certificate (bytes or str): PEM certificate or public key, or the
+                path to a file containing one.
+            ttl (float): Seconds an encrypted credential is reused before it is
+                encrypted afresh.
+            clock (callable): Monotonic clock in seconds.
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.encryptions = 0
+        self.rotate(certificate)
+
+    def rotate(self, certificate):
+        """Switch to a new certificate and drop every credential encrypted with the old one."""
+        from cryptography import x509
+        from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
+        if isinstance(certificate, str) and not certificate.lstrip().startswith("-----"):
+            with open(certificate, "rb") as f:
+                certificate = f.read()
+        if isinstance(certificate, str):
+            certificate = certificate.encode()
+        if b"CERTIFICATE" in certificate:
+            public_key = x509.load_pem_x509_certificate(certificate).public_key()
+        else:
+            public_key = load_pem_public_key(certificate)
+        with self._lock:
+            self._public_key = public_key
+            self.fingerprint = hashlib.sha256(certificate).hexdigest()
+            self._cache.clear()
+
+    def encrypt(self, initiator_password):
+        """Encrypt a password without caching it."""
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        self.encryptions += 1
+        encrypted = self._public_key.encrypt(initiator_password.encode(), padding.PKCS1v15())
+        return base64.b64encode(encrypted).decode()
+
+    def get(self, initiator_name, initiator_password):
+        """
+        Return the security credential for an initiator.
+
+        Args:
+            initiator_name (str): Initiator username.
+            initiator_password (str): Initiator password in clear text.
+
+        Returns:
+            str: Base64 encoded encrypted password.
+        """
+        # Key on a digest so clear-text passwords are not kept as dict keys.
+        key = (initiator_name, hashlib.sha256(initiator_password.encode()).digest())
+        now = self.clock()
+        cached = self._cache.get(key)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[1] > now:
+                return cached[0]
+            credential = self.encrypt(initiator_password)
+            self._cache[key] = (credential, now + self.ttl)
+            return credential
+
+
+class CredentialProvider:
+    """Fills in STK passwords and B2C security credentials the caller did not supply."""
+
+    def __init__(self, passkey=None, certificate=None, initiator_password=None, credential_ttl=3600.0):
+        """
+        Args:
+            passkey (str): Lipa na M-Pesa passkey used for STK push passwords.
+            certificate (bytes or str): Safaricom public certificate (PEM or path)
+                used to encrypt the initiator password.
+            initiator_password (str): Initiator password for B2C requests.
+            credential_ttl (float): Seconds an encrypted credential is reused.
+        """
+        self.passkey = passkey
+        self.initiator_password = initiator_password
+        self.security_credentials = SecurityCredentials(certificate, credential_ttl) if certificate else None
+        self._generators = {}
+
+    def stk_password(self, business_short_code, password=None, timestamp=None):
+        """
+        Return the (password, timestamp) pair for an STK push, generating
+        whichever the caller left as None.
+
+        Raises:
+            ValueError: If a password must be generated but no passkey is configured.
+        """
+        if password is not None:
+            return password, timestamp
+        if self.passkey is None:
+            raise ValueError("An STK password or a passkey is required.")
+        generator = self._generators.get(business_short_code)
+        if generator is None:
+            generator = self._generators[business_short_code] = StkPasswordGenerator(business_short_code, self.passkey)
+        return generator.generate(timestamp)
+
+    def security_credential(self, initiator_name, security_credential=None):
+        """
+        Return the B2C security credential, encrypting the configured initiator
+        password when the caller did not pass one.
+
+        Raises:
+            ValueError: If no certificate or initiator password is configured.
+        """
+        if security_credential is not None:
+            return security_credential
+        if self.security_credentials is None or self.initiator_password is None:
+            raise ValueError("A security credential, or a certificate and initiator password, is required.")
+        return self.security_credentials.get(initiator_name, self.initiator_password)
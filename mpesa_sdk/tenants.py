@@ -0,0 +1,309 @@
+"""
+Client registry for many tenants (merchant short codes with their own
+consumer key and secret).
+
+Every tenant's MPesaSDK shares one pooled transport, one bounded token
+store and one request ID cache. Clients are built on first use and evicted
+again when the registry holds more than ``max_clients`` or a client has been
+idle longer than ``idle_timeout``; only the credentials of idle tenants stay
+in memory, and their tokens age out of the LRU token store on their own.
+Request IDs are tracked per tenant in the shared cache rather than by the
+client, so a resubmitted request is still recognized after its tenant's
+client was evicted and built again.
+"""
+import gc
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+
+from .client import MPesaSDK
+from .instrumentation import Instrumentation, combine
+from .models import B2CRequest, C2BPaymentRequest, StkPushRequest
+from .retry import IdempotencyCache, Retrier
+from .tokens import LRUTokenStore
+from .transport import Transport
+
+DEFAULT_MAX_CLIENTS = 256
+DEFAULT_IDLE_TIMEOUT = 600.0
+DEFAULT_MAX_TOKENS = 1024
+
+# Don't recurse into these when measuring a client: they are shared or
+# belong to the interpreter, not to one tenant.
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+
+# Options of the transport an MPesaSDK creates, which tenants share instead.
+_TRANSPORT_OPTIONS = ("rate_limiter", "recorder")
+
+
+class UnknownTenant(KeyError):
+    """Raised when a call is routed to a tenant or short code that was never registered."""
+    pass
+
+
+class Tenant:
+    """Credentials and per-tenant counters."""
+
+    __slots__ = ("tenant_id", "consumer_key", "consumer_secret", "short_codes", "options",
+                 "token_fetches", "token_fetch_seconds", "clients_built")
+
+    def __init__(self, tenant_id, consumer_key, consumer_secret, short_codes, options):
+        self.tenant_id = tenant_id
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.short_codes = short_codes
+        self.options = options
+        self.token_fetches = 0
+        self.token_fetch_seconds = 0.0
+        self.clients_built = 0
+
+
+class _TokenFetchTimer(Instrumentation):
+    """Counts a tenant's token fetches and their cost."""
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+
+    def on_token_refresh(self, latency, error=None):
+        self.tenant.token_fetches += 1
+        self.tenant.token_fetch_seconds += latency
+
+
+def _deep_sizeof(root, exclude):
+    """Approximate bytes reachable from root, not counting anything in ``exclude`` (ids)."""
+    seen = set(exclude)
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if not isinstance(obj, _OPAQUE):
+            stack.extend(gc.get_referents(obj))
+    return total
+
+
+def _short_code(request):
+    """Short code a typed request is sent on behalf of."""
+    if isinstance(request, StkPushRequest):
+        return request.business_short_code
+    if isinstance(request, B2CRequest):
+        return request.party_a
+    if isinstance(request, C2BPaymentRequest):
+        return (request.receiver_party or {}).get("Identifier")
+    raise TypeError(f"Cannot route {type(request).__name__} by short code")
+
+
+class TenantRegistry:
+    """Routes calls to per-tenant MPesaSDK clients sharing one transport and token cache."""
+
+    def __init__(self, environment='sandbox', transport=None, token_store=None,
+                 max_clients=DEFAULT_MAX_CLIENTS, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 max_tokens=DEFAULT_MAX_TOKENS, clock=time.monotonic, idempotency=None, **client_options):
+        """
+        Initialize the registry.
+
+        Args:
+            environment (str): Either 'sandbox' or 'production'.
+            transport (Transport): Transport shared by every tenant. A pooled
+                transport is created (and closed by close()) when omitted,
+                with the ``instrumentation``, ``rate_limiter`` and
+                ``recorder`` given in ``client_options``.
+            token_store: Token store shared by every tenant. Defaults to an
+                LRUTokenStore holding ``max_tokens`` tokens.
+            max_clients (int): Most tenant clients kept alive at once.
+            idle_timeout (float): Seconds after which an unused client is evicted.
+            max_tokens (int): Size of the default token store.
+            clock (callable): Monotonic clock in seconds.
+            idempotency (IdempotencyCache): Request ID cache shared by every
+                tenant, keyed by tenant. Defaults to a new one.
+            **client_options: Passed to every MPesaSDK, e.g. base_url, market
+                or instrumentation. Per-tenant options given to register()
+                take precedence.
+
+        Raises:
+            ValueError: If ``rate_limiter`` or ``recorder`` is given along
+                with a transport, which has its own.
+        """
+        transport_options = {name: client_options.pop(name) for name in _TRANSPORT_OPTIONS
+                             if name in client_options}
+        if transport is not None and transport_options:
+            raise ValueError(f"Configure {', '.join(transport_options)} on the transport passed in")
+        self.environment = environment
+        self._owns_transport = transport is None
+        self.transport = transport if transport is not None else Transport(
+            instrumentation=client_options.get("instrumentation"), **transport_options)
+        self.token_store = token_store if token_store is not None else LRUTokenStore(max_tokens)
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.idempotency = idempotency if idempotency is not None else IdempotencyCache()
+        self.client_options = client_options
+        self.evictions = 0
+        self._tenants = {}
+        self._short_codes = {}
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, tenant_id, consumer_key, consumer_secret, short_codes=(), **options):
+        """
+        Add or replace a tenant.
+
+        Args:
+            tenant_id (str): Name calls are routed by.
+            consumer_key (str): The tenant's consumer key.
+            consumer_secret (str): The tenant's consumer secret.
+            short_codes (iterable): Short codes owned by the tenant, for
+                routing with for_short_code() and send().
+            **options: MPesaSDK options for this tenant only, e.g. passkey.
+
+        Raises:
+            ValueError: If ``options`` configure the shared transport.
+        """
+        shared = [name for name in _TRANSPORT_OPTIONS if name in options]
+        if shared:
+            raise ValueError(f"{', '.join(shared)} cannot be set per tenant: the transport is shared")
+        tenant = Tenant(tenant_id, consumer_key, consumer_secret, tuple(str(c) for c in short_codes), options)
+        with self._lock:
+            previous = self._tenants.get(tenant_id)
+            if previous is not None:
+                for code in previous.short_codes:
+                    self._short_codes.pop(code, None)
+                self._drop(tenant_id)
+            self._tenants[tenant_id] = tenant
+            for code in tenant.short_codes:
+                self._short_codes[code] = tenant_id
+
+    def unregister(self, tenant_id):
+        """Remove a tenant and close its client."""
+        with self._lock:
+            tenant = self._tenants.pop(tenant_id, None)
+            if tenant is None:
+                raise UnknownTenant(tenant_id)
+            for code in tenant.short_codes:
+                self._short_codes.pop(code, None)
+            self._drop(tenant_id)
+
+    def client(self, tenant_id):
+        """
+        Return the tenant's client, building it if it is not alive.
+
+        Raises:
+            UnknownTenant: If the tenant was never registered.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._clients.get(tenant_id)
+            if entry is not None:
+                entry[1] = now
+                self._clients.move_to_end(tenant_id)
+                client = entry[0]
+            else:
+                tenant = self._tenants.get(tenant_id)
+                if tenant is None:
+                    raise UnknownTenant(tenant_id)
+                client = self._build(tenant)
+                self._clients[tenant_id] = [client, now]
+            self._evict(now)
+        return client
+
+    __getitem__ = client
+
+    def for_short_code(self, short_code):
+        """
+        Return the client of the tenant owning a short code.
+
+        Raises:
+            UnknownTenant: If no tenant registered the short code.
+        """
+        tenant_id = self._short_codes.get(str(short_code))
+        if tenant_id is None:
+            raise UnknownTenant(short_code)
+        return self.client(tenant_id)
+
+    def send(self, request):
+        """Send a typed request model (see MPesaSDK.send) as the tenant owning its short code."""
+        return self.for_short_code(_short_code(request)).send(request)
+
+    def _build(self, tenant):
+        options = {**self.client_options, **tenant.options}
+        instrumentation = options.pop("instrumentation", None)
+        if "retrier" not in options:
+            options["retrier"] = Retrier(idempotency=self.idempotency, idempotency_scope=tenant.tenant_id,
+                                         instrumentation=instrumentation)
+        client = MPesaSDK(
+            tenant.consumer_key, tenant.consumer_secret, environment=self.environment,
+            transport=self.transport, token_store=self.token_store,
+            instrumentation=combine(instrumentation, _TokenFetchTimer(tenant)), **options)
+        tenant.clients_built += 1
+        return client
+
+    def _evict(self, now):
+        # Least recently used first, so idle clients sit at the front.
+        while self._clients:
+            tenant_id, (client, last_used) = next(iter(self._clients.items()))
+            if len(self._clients) <= self.max_clients and now - last_used <= self.idle_timeout:
+                break
+            self._drop(tenant_id)
+            self.evictions += 1
+
+    def _drop(self, tenant_id):
+        entry = self._clients.pop(tenant_id, None)
+        if entry is not None:
+            entry[0].close()
+
+    def stats(self):
+        """
+        Registry counters.
+
+        Returns:
+            dict: Registered tenants, live clients, evictions, cached tokens,
+            cold token fetches with their average cost in seconds, and the
+            approximate memory of a registered tenant and of a live client.
+        """
+        with self._lock:
+            tenants = list(self._tenants.values())
+            clients = [entry[0] for entry in self._clients.values()]
+        fetches = sum(t.token_fetches for t in tenants)
+        seconds = sum(t.token_fetch_seconds for t in tenants)
+        shared = {id(self), id(self.transport), id(self.token_store), id(self.idempotency),
+                  id(self.client_options)}
+        shared.update(id(t) for t in tenants)
+        return {
+            "tenants": len(tenants),
+            "live_clients": len(clients),
+            "client_evictions": self.evictions,
+            "cached_tokens": len(self.token_store) if hasattr(self.token_store, "__len__") else None,
+            "token_evictions": getattr(self.token_store, "evictions", None),
+            "cold_token_fetches": fetches,
+            "cold_token_seconds_avg": seconds / fetches if fetches else None,
+            "bytes_per_tenant": (sum(_deep_sizeof(t, shared - {id(t)}) for t in tenants) / len(tenants)
+                                 if tenants else None),
+            "bytes_per_client": (sum(_deep_sizeof(c, shared) for c in clients) / len(clients)
+                                 if clients else None),
+        }
+
+    def tenant_stats(self, tenant_id):
+        """Cold token fetches, their total cost in seconds and clients built for one tenant."""
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            raise UnknownTenant(tenant_id)
+        return {"token_fetches": tenant.token_fetches, "token_fetch_seconds": tenant.token_fetch_seconds,
+                "clients_built": tenant.clients_built, "live": tenant_id in self._clients}
+
+    def close(self):
+        """Close every client and, if the registry created it, the shared transport."""
+        with self._lock:
+            for tenant_id in list(self._clients):
+                self._drop(tenant_id)
+        if self._owns_transport:
+            self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
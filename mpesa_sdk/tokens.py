@@ -0,0 +1,362 @@
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_REFRESH_MARGIN = 60
+
+# Freshness of a cached token, as judged by TokenManager.state().
+FRESH = "fresh"
+EXPIRING = "expiring"
+EXPIRED = "expired"
+
+
+class MemoryTokenStore:
+    """In-process token store shared by every MPesaSDK instance that uses it."""
+
+    # Reads and writes never wait on I/O, so async clients call them directly.
+    blocking = False
+
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached (token, expires_at) pair for key, or None."""
+        with self._lock:
+            return self._tokens.get(key)
+
+    def set(self, key, token, expires_at):
+        """Cache a token until expires_at (epoch seconds)."""
+        with self._lock:
+            self._tokens[key] = (token, expires_at)
+
+    def delete(self, key):
+        """Drop the cached token for key."""
+        with self._lock:
+            self._tokens.pop(key, None)
+
+    @contextmanager
+    def lock(self, key):
+        """Cross-process renewal lock. A no-op for an in-process store."""
+        yield
+
+
+class LRUTokenStore:
+    """
+    In-process token store holding at most ``max_entries`` tokens.
+
+    Expired tokens are dropped when read, and the least recently used token
+    is evicted when the store is full, so memory stays bounded however many
+    consumer keys pass through it.
+    """
+
+    blocking = False
+
+    def __init__(self, max_entries=1024, clock=time.time):
+        """
+        Args:
+            max_entries (int): Most tokens kept at once.
+            clock (callable): Returns the current epoch time in seconds.
+        """
+        self.max_entries = max_entries
+        self.clock = clock
+        self.evictions = 0
+        self._tokens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def get(self, key):
+        with self._lock:
+            cached = self._tokens.get(key)
+            if cached is None:
+                return None
+            if cached[1] <= self.clock():
+                del self._tokens[key]
+                return None
+            self._tokens.move_to_end(key)
+            return cached
+
+    def set(self, key, token, expires_at):
+        with self._lock:
+            self._tokens[key] = (token, expires_at)
+            self._tokens.move_to_end(key)
+            while len(self._tokens) > self.max_entries:
+                self._tokens.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._tokens.pop(key, None)
+
+    @contextmanager
+    def lock(self, key):
+        """Cross-process renewal lock. A no-op for an in-process store."""
+        yield
+
+
+class FileTokenStore:
+    """
+    Token store backed by one JSON file per key in a shared directory.
+
+    Every worker process pointing at the same directory shares a single token,
+    and renewal is serialized across processes with an advisory file lock.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Directory to keep token and lock files in.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix):
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in key)
+        return os.path.join(self.directory, f"{safe}{suffix}")
+
+    def get(self, key):
+        try:
+            with open(self._path(key, ".json")) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data["token"], data["expires_at"]
+
+    def set(self, key, token, expires_at):
+        path = self._path(key, ".json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"token": token, "expires_at": expires_at}, f)
+        os.replace(tmp, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key, ".json"))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def lock(self, key):
+        with open(self._path(key, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RedisTokenStore:
+    """
+    Token store backed by a Redis-style client.
+
+    Any client exposing ``get``, ``set(name, value, px=None, nx=False)`` and
+    ``delete`` works, so redis-py can be passed in directly. Clients that also
+    expose ``eval`` release the renewal lock atomically with a script.
+    """
+
+    # Delete the lock only if it still holds our owner token.
+    RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, client, prefix="mpesa:token:", lock_timeout=30, poll_interval=0.05):
+        """
+        Args:
+            client: Redis-style client.
+            prefix (str): Key prefix for token and lock entries.
+            lock_timeout (float): Seconds after which a renewal lock is released
+                even if its holder died, and the longest a caller waits for it.
+            poll_interval (float): Seconds between attempts to take the lock.
+        """
+        self.client = client
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        data = json.loads(raw)
+        return data["token"], data["expires_at"]
+
+    def set(self, key, token, expires_at):
+        ttl_ms = max(int((expires_at - time.time()) * 1000), 1)
+        self.client.set(self.prefix + key, json.dumps({"token": token, "expires_at": expires_at}), px=ttl_ms)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    @contextmanager
+    def lock(self, key):
+        """
+        Cross-process renewal lock.
+
+        Raises:
+            TimeoutError: If the lock could not be taken within ``lock_timeout``.
+        """
+        lock_key = f"{self.prefix}{key}:lock"
+        owner = uuid.uuid4().hex
+        deadline = time.time() + self.lock_timeout
+        while not self.client.set(lock_key, owner, px=int(self.lock_timeout * 1000), nx=True):
+            if time.time() >= deadline:
+                raise TimeoutError(f"Timed out waiting for token renewal lock {lock_key}")
+            time.sleep(self.poll_interval)
+        try:
+            yield
+        finally:
+            self._release(lock_key, owner)
+
+    def _release(self, lock_key, owner):
+        # Our lock may have expired and been taken by another process: only
+        # delete it while it still holds our owner token.
+        if hasattr(self.client, "eval"):
+            self.client.eval(self.RELEASE_SCRIPT, 1, lock_key, owner)
+            return
+        held = self.client.get(lock_key)
+        if isinstance(held, bytes):
+            held = held.decode()
+        if held == owner:
+            self.client.delete(lock_key)
+
+
+class TokenManager:
+    """
+    Caches an access token, refreshes it ahead of expiry and makes sure only
+    one caller renews it at a time.
+    """
+
+    def __init__(self, fetch, key, store=None, refresh_margin=DEFAULT_REFRESH_MARGIN,
+                 background_refresh=True, clock=time.time):
+        """
+        Initialize the token manager.
+
+        Args:
+            fetch (callable): Returns a fresh (token, expires_in) pair.
+            key (str): Cache key, normally derived from the consumer key.
+            store: Token store. Defaults to a private MemoryTokenStore.
+            refresh_margin (float): Seconds before expiry at which the token is
+                renewed. Within the margin the current token is still served.
+            background_refresh (bool): Renew inside the margin on a background
+                thread instead of on the caller's thread.
+            clock (callable): Returns the current epoch time in seconds.
+        """
+        self.fetch = fetch
+        self.key = key
+        self.store = store if store is not None else MemoryTokenStore()
+        self.refresh_margin = refresh_margin
+        self.background_refresh = background_refresh
+        self.clock = clock
+        self.refresh_count = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get_token(self):
+        """
+        Return a valid access token, renewing it if it is missing or expired.
+
+        Returns:
+            str: The access token.
+        """
+        cached = self.store.get(self.key)
+        state = self.state(cached)
+        if state == FRESH:
+            return cached[0]
+        if state == EXPIRING and self.background_refresh:
+            self._refresh_in_background(cached[0])
+            return cached[0]
+        return self._renew(stale=cached[0] if cached else None)
+
+    def state(self, cached):
+        """
+        Judge a cached (token, expires_at) pair, or None.
+
+        Returns:
+            str: FRESH, EXPIRING (still valid, but within the refresh
+            margin) or EXPIRED (also when nothing is cached).
+        """
+        if cached is None:
+            return EXPIRED
+        now = self.clock()
+        if now < cached[1] - self.refresh_margin:
+            return FRESH
+        return EXPIRING if now < cached[1] else EXPIRED
+
+    def renewed(self, cached, stale):
+        """True if ``cached`` holds a valid token other than ``stale``, i.e. someone else renewed it."""
+        return cached is not None and cached[0] != stale and self.clock() < cached[1]
+
+    def refresh(self):
+        """
+        Force a token renewal regardless of the cached expiry.
+
+        Returns:
+            str: The new access token.
+        """
+        with self._lock:
+            with self.store.lock(self.key):
+                return self._fetch_and_store()
+
+    def invalidate(self, token):
+        """
+        Drop token from the cache if it is still the current one, e.g. after the
+        API rejected it with a 401.
+        """
+        cached = self.store.get(self.key)
+        if cached is not None and cached[0] == token:
+            self.store.delete(self.key)
+
+    def _renew(self, stale):
+        # Single flight: the first caller renews, everyone else blocks on the
+        # lock and then picks up the token it stored.
+        with self._lock:
+            cached = self.store.get(self.key)
+            if self.renewed(cached, stale):
+                return cached[0]
+            try:
+                with self.store.lock(self.key):
+                    cached = self.store.get(self.key)
+                    if self.renewed(cached, stale):
+                        return cached[0]
+                    return self._fetch_and_store()
+            except TimeoutError:
+                # Another process held the lock throughout; it has most
+                # likely stored a new token by now.
+                cached = self.store.get(self.key)
+                if self.renewed(cached, stale):
+                    return cached[0]
+                raise
+
+    def _fetch_and_store(self):
+        token, expires_in = self.fetch()
+        self.store.set(self.key, token, self.clock() + expires_in)
+        self.refresh_count += 1
+        return token
+
+    def _refresh_in_background(self, stale):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._renew(stale)
+            except Exception:
+                # The foreground path renews synchronously once the token
+                # actually expires, and surfaces the error there.
+                pass
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="mpesa-token-refresh", daemon=True).start()
@@ -0,0 +1,282 @@
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util import connection as urllib3_connection
+
+from .constants import DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE, DEFAULT_TIMEOUT
+from .exceptions import FatalError, RetryableError
+from .instrumentation import RequestTimings
+
+# RequestTimings of the request running on this thread, filled in by the
+# timed connections below when the request has to open a new connection,
+# the number of requests this thread has sent per operation, and how long
+# its last send took.
+_current = threading.local()
+
+# Raised while the request is being prepared, before anything is sent.
+_UNSENT_ERRORS = (
+    requests.exceptions.MissingSchema, requests.exceptions.InvalidSchema, requests.exceptions.InvalidURL,
+    requests.exceptions.InvalidHeader, requests.exceptions.InvalidJSONError, requests.exceptions.URLRequired,
+)
+
+
+def requests_sent(operation):
+    """
+    Number of ``operation`` requests the calling thread has handed to the
+    HTTP session so far, by any Transport.
+
+    Comparing it before and after a call tells whether an error the call
+    raised came before anything was sent.
+    """
+    sent = getattr(_current, "sent", None)
+    return 0 if sent is None else sent.get(operation, 0)
+
+
+class _TimedConnectionMixin:
+    """Splits connection setup into DNS, TCP connect and TLS handshake time."""
+
+    def _new_conn(self):
+        timings = getattr(_current, "timings", None)
+        if timings is None:
+            return super()._new_conn()
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter()
+        timings.dns = resolved - start
+        # Connect to the resolved addresses in order, as create_connection
+        # would, without resolving the name a second time.
+        error = None
+        for family, _, _, _, address in addresses:
+            try:
+                sock = urllib3_connection.create_connection(
+                    address[:2], self.timeout, source_address=self.source_address,
+                    socket_options=self.socket_options)
+                break
+            except socket.timeout as e:
+                raise ConnectTimeoutError(
+                    self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})") from e
+            except OSError as e:
+                error = e
+        else:
+            raise NewConnectionError(self, f"Failed to establish a new connection: {error}") from error
+        timings.connect = time.perf_counter() - resolved
+        return sock
+
+    def connect(self):
+        timings = getattr(_current, "timings", None)
+        if timings is None:
+            return super().connect()
+        start = time.perf_counter()
+        super().connect()
+        if isinstance(self, HTTPSConnection):
+            timings.tls = time.perf_counter() - start - (timings.dns or 0.0) - (timings.connect or 0.0)
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools open connections that record phase timings."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+class Transport:
+    """Pooled, keep-alive HTTP transport shared by every MPesaSDK call."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False, session=None, rate_limiter=None,
+                 instrumentation=None, recorder=None):
+        """
+        Initialize the transport.
+
+        Args:
+            timeout (float or tuple): Default timeout for every request, either a single
+                value or a (connect, read) tuple.
+            pool_connections (int): Number of per-host connection pools to cache.
+            pool_maxsize (int): Maximum number of connections kept alive per host.
+            pool_block (bool): Block when the pool is exhausted instead of opening
+                throwaway connections.
+            session (requests.Session): Optional pre-configured session to use.
+            rate_limiter (RateLimiter): Optional per-operation rate limiter and
+                concurrency governor applied to every request.
+            instrumentation (Instrumentation): Optional metrics/tracing hooks
+                told about every request, with DNS, connect, TLS and server
+                time measured separately.
+            recorder (recorder.TrafficRecorder): Optional recorder every
+                request and response is captured by.
+        """
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.instrumentation = instrumentation
+        self.recorder = recorder
+        self.in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.session = session if session is not None else requests.Session()
+        adapter = (HTTPAdapter if instrumentation is None else _TimedHTTPAdapter)(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Connection"] = "keep-alive"
+
+    def request(self, method, url, headers=None, json=None, params=None, timeout=None, operation=None, data=None):
+        """
+        Send a request over the pooled session.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Absolute URL.
+            headers (dict): Request headers.
+            json (dict): JSON body.
+            params (dict): Query string parameters.
+            timeout (float or tuple): Overrides the transport default timeout.
+            operation (str): Operation name the rate limiter is keyed by.
+            data (bytes): Pre-encoded request body, sent instead of ``json``.
+
+        Returns:
+            requests.Response: The HTTP response.
+
+        Raises:
+            RetryableError: If the request times out or the connection fails.
+            FatalError: For any other failure to send the request, e.g. an
+                invalid URL or header.
+            RateLimitExceeded: If the rate limiter rejects the call.
+        """
+        if self.recorder is not None:
+            return self._recorded(method, url, headers, json, params, timeout, operation, data)
+        return self._request(method, url, headers, json, params, timeout, operation, data)
+
+    def _request(self, method, url, headers, json, params, timeout, operation, data):
+        if self.instrumentation is not None:
+            return self._instrumented(method, url, headers, json, params, timeout, operation, data)
+        if self.rate_limiter is not None and operation is not None:
+            with self.rate_limiter.acquire(operation):
+                return self._send(method, url, headers, json, params, timeout, data, operation)
+        return self._send(method, url, headers, json, params, timeout, data, operation)
+
+    def _recorded(self, method, url, headers, json, params, timeout, operation, data):
+        started = time.time()
+        start = time.perf_counter()
+        _current.elapsed = None
+        response = error = None
+        try:
+            response = self._request(method, url, headers, json, params, timeout, operation, data)
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # The rest of the time was spent waiting for the rate limiter.
+            elapsed = _current.elapsed
+            throttled = time.perf_counter() - start - (elapsed or 0.0)
+            self.recorder.record(
+                started, elapsed, operation, method, url, params,
+                json if json is not None else data, None if response is None else response.status_code,
+                None if response is None else response.content, error, throttled)
+
+    def _instrumented(self, method, url, headers, json, params, timeout, operation, data):
+        if self.rate_limiter is not None and operation is not None:
+            start = time.perf_counter()
+            with self.rate_limiter.acquire(operation):
+                delay = time.perf_counter() - start
+                if delay > 0.001:
+                    self.instrumentation.on_throttle(operation, delay)
+                return self._timed_send(method, url, headers, json, params, timeout, operation, data)
+        return self._timed_send(method, url, headers, json, params, timeout, operation, data)
+
+    def _timed_send(self, method, url, headers, json, params, timeout, operation, data):
+        timings = _current.timings = RequestTimings()
+        with self._in_flight_lock:
+            self.in_flight += 1
+            timings.in_flight = self.in_flight
+        response = error = None
+        start = time.perf_counter()
+        try:
+            response = self._send(method, url, headers, json, params, timeout, data, operation)
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            timings.finish(time.perf_counter() - start)
+            _current.timings = None
+            with self._in_flight_lock:
+                self.in_flight -= 1
+            self.instrumentation.on_request(
+                operation, method, None if response is None else response.status_code, error, timings)
+
+    def _send(self, method, url, headers, json, params, timeout, data=None, operation=None):
+        sent = getattr(_current, "sent", None)
+        if sent is None:
+            sent = _current.sent = {}
+        sent[operation] = sent.get(operation, 0) + 1
+        start = time.perf_counter()
+        try:
+            return self.session.request(
+                method, url, headers=headers, json=json, params=params, data=data,
+                timeout=self.timeout if timeout is None else timeout,
+            )
+        except requests.ConnectTimeout as e:
+            raise RetryableError(f"{method} {url} timed out connecting: {e}", request_sent=False) from e
+        except requests.Timeout as e:
+            raise RetryableError(f"{method} {url} timed out: {e}") from e
+        except requests.ConnectionError as e:
+            reason = getattr(e.args[0], "reason", None) if e.args else None
+            sent = False if isinstance(reason, NewConnectionError) else None
+            raise RetryableError(f"{method} {url} failed: {e}", request_sent=sent) from e
+        except requests.exceptions.ChunkedEncodingError as e:
+            # The connection broke while the response was being read.
+            raise RetryableError(f"{method} {url} failed: {e}") from e
+        except _UNSENT_ERRORS as e:
+            raise FatalError(f"{method} {url} is invalid: {e}", request_sent=False) from e
+        except requests.RequestException as e:
+            raise FatalError(f"{method} {url} failed: {e}") from e
+        finally:
+            _current.elapsed = time.perf_counter() - start
+
+    def get(self, url, **kwargs):
+        """Send a GET request."""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Send a POST request."""
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        """Close every pooled connection."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,251 @@
+"""
+Request validation compiled from constants.DEFAULT_OPERATIONS.
+
+Each operation spec is compiled once into a CompiledOperation holding a flat
+tuple of (field, api_key, matcher) entries, so validating and serializing a
+record is a single pass with no per-call dict or regex lookups.
+"""
+from .constants import DEFAULT_MARKET, DEFAULT_OPERATIONS, MARKET_PATTERNS, PATTERNS, PAYLOAD_OPERATIONS
+from .exceptions import MPesaError
+
+MISSING = "missing"
+INVALID = "invalid"
+
+_PATTERN_NAMES = {id(pattern): name for name, pattern in PATTERNS.items()}
+
+# Plain-Python equivalents of the simplest PATTERNS, a few times cheaper than
+# a regex call. WORD is only ever used with re.match, which succeeds as soon as
+# the first character is a word character.
+_FAST_MATCHERS = {
+  'SERVICE_PROVIDER_CODE': lambda v: 5 <= len(v) <= 6 and v.isascii() and v.isdigit(),
+  'WORD': lambda v: v != "" and (v[0].isalnum() or v[0] == "_"),
+}
+
+
+def _matcher(pattern, overrides):
+    name = _PATTERN_NAMES.get(id(pattern))
+    if name in overrides:
+        return overrides[name].match
+    if name in _FAST_MATCHERS:
+        return _FAST_MATCHERS[name]
+    return pattern.match
+
+
+class FieldError:
+    """One problem with one field of a record."""
+
+    __slots__ = ("field", "code", "value")
+
+    def __init__(self, field, code, value=None):
+        self.field = field
+        self.code = code
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, FieldError) and (self.field, self.code, self.value) == (other.field, other.code, other.value)
+
+    def __repr__(self):
+        return f"FieldError({self.field!r}, {self.code!r}, {self.value!r})"
+
+    def __str__(self):
+        if self.code == MISSING:
+            return f"{self.field} is required"
+        return f"{self.field} has an invalid value {self.value!r}"
+
+
+class ValidationError(MPesaError):
+    """Raised when a request fails local validation, before anything is sent."""
+
+    def __init__(self, operation, errors):
+        super().__init__(f"{operation}: " + "; ".join(str(e) for e in errors))
+        self.operation = operation
+        self.errors = errors
+
+
+class BatchResult:
+    """Outcome of validating a batch of records."""
+
+    __slots__ = ("valid", "errors")
+
+    def __init__(self, valid, errors):
+        # (index, serialized body) for each valid record, in input order.
+        self.valid = valid
+        # index -> list of FieldError for each invalid record.
+        self.errors = errors
+
+    def __bool__(self):
+        return not self.errors
+
+
+class CompiledOperation:
+    """Validator and serializer for one operation, built once from its spec."""
+
+    __slots__ = ("name", "method", "port", "path", "fields", "required", "defaults")
+
+    def __init__(self, name, spec, market=DEFAULT_MARKET, defaults=None):
+        """
+        Args:
+            name (str): Operation name, e.g. 'B2C_PAYMENT'.
+            spec (dict): Entry of DEFAULT_OPERATIONS.
+            market (str): Key of constants.MARKET_PATTERNS whose patterns
+                replace the defaults of the same name.
+            defaults (dict): Field values used when a record omits them,
+                e.g. the service provider code. Only the fields the spec
+                lists as ``optional`` take defaults, when it has that list.
+        """
+        overrides = MARKET_PATTERNS.get(market, {})
+        self.name = name
+        self.method = spec['method']
+        self.port = spec['port']
+        self.path = spec['path']
+        validation = spec.get('validation', {})
+        fields = []
+        for field, api_key in spec['mapping'].items():
+            pattern = validation.get(field)
+            fields.append((field, api_key, _matcher(pattern, overrides) if pattern is not None else None))
+        self.fields = tuple(fields)
+        self.required = frozenset(spec.get('required', ()))
+        optional = spec.get('optional')
+        self.defaults = {field: value for field, value in (defaults or {}).items()
+                         if optional is None or field in optional}
+
+    def _check(self, record):
+        # One pass that both validates and serializes; returns (body, errors).
+        body = {}
+        errors = None
+        defaults = self.defaults
+        for field, api_key, match in self.fields:
+            value = record.get(field)
+            if value is None:
+                value = defaults.get(field)
+                if value is None:
+                    if field in self.required:
+                        if errors is None:
+                            errors = []
+                        errors.append(FieldError(field, MISSING))
+                    continue
+            value = value if value.__class__ is str else str(value)
+            if match is not None and not match(value):
+                if errors is None:
+                    errors = []
+                errors.append(FieldError(field, INVALID, value))
+            else:
+                body[api_key] = value
+        return body, errors
+
+    def validate(self, record):
+        """
+        Check every field of ``record``.
+
+        Returns:
+            list: Every FieldError found; empty when the record is valid.
+        """
+        return self._check(record)[1] or []
+
+    def serialize(self, record):
+        """Map record fields to API keys as strings, filling defaults."""
+        return self._check(record)[0]
+
+    def build(self, record):
+        """
+        Validate and serialize one record.
+
+        Returns:
+            dict: Request body keyed by API field names.
+
+        Raises:
+            ValidationError: With every problem found in the record.
+        """
+        body, errors = self._check(record)
+        if errors:
+            raise ValidationError(self.name, errors)
+        return body
+
+    def validate_batch(self, records):
+        """
+        Validate and serialize many records, collecting every error of every row.
+
+        Args:
+            records (iterable): Record dicts.
+
+        Returns:
+            BatchResult: Serialized bodies of the valid rows and errors of the others.
+        """
+        valid = []
+        errors = {}
+        check = self._check
+        append = valid.append
+        for index, record in enumerate(records):
+            body, problems = check(record)
+            if problems:
+                errors[index] = problems
+            else:
+                append((index, body))
+        return BatchResult(valid, errors)
+
+
+_cache = {}
+
+
+def compile_operations(operations=None, market=DEFAULT_MARKET, defaults=None):
+    """
+    Compile operation specs into CompiledOperation objects.
+
+    Compiling DEFAULT_OPERATIONS without defaults is cached, so repeated calls
+    are free.
+
+    Args:
+        operations (dict): Specs keyed by operation name. Defaults to
+            constants.DEFAULT_OPERATIONS.
+        market (str): Market whose patterns apply.
+        defaults (dict): Field defaults shared by every operation.
+
+    Returns:
+        dict: Operation name to CompiledOperation.
+    """
+    cacheable = operations is None and not defaults
+    if cacheable and market in _cache:
+        return _cache[market]
+    compiled = {
+        name: CompiledOperation(name, spec, market, defaults)
+        for name, spec in (operations or DEFAULT_OPERATIONS).items()
+    }
+    if cacheable:
+        _cache[market] = compiled
+    return compiled
+
+
+def get_validator(name, market=DEFAULT_MARKET):
+    """Return the cached CompiledOperation for a DEFAULT_OPERATIONS entry."""
+    return compile_operations(market=market)[name]
+
+
+_payload_cache = {}
+
+
+def get_payload_validator(operation, market=DEFAULT_MARKET):
+    """
+    Return the cached CompiledOperation checking the request bodies of an SDK
+    operation, e.g. 'b2c_payment', or None if it has no checks.
+
+    See constants.PAYLOAD_OPERATIONS.
+    """
+    compiled = _payload_cache.get(market)
+    if compiled is None:
+        compiled = _payload_cache[market] = compile_operations(PAYLOAD_OPERATIONS, market)
+    return compiled.get(operation)
+
+
+def validate_payload(operation, payload, market=DEFAULT_MARKET):
+    """
+    Check the request body of an SDK operation against the market's patterns.
+
+    Called by MPesaSDK and AsyncMPesaSDK before anything is sent, so both
+    reject the same bodies. Operations without checks pass as is.
+
+    Raises:
+        ValidationError: If the body fails a check.
+    """
+    validator = get_payload_validator(operation, market)
+    if validator is not None:
+        validator.build(payload)
@@ -3,10 +3,15 @@ from setuptools import setup, find_packages
 setup(
     name='mpesa_sdk',
     version='1.0.0',
-    packages=find_packages(),
+    packages=find_packages(exclude=('tests', 'tests.*')),
     install_requires=[
         'requests'
     ],
+    extras_require={
+        'async': ['httpx'],
+        'security': ['cryptography'],
+        'fast': ['orjson'],
+    },
     description='MPesa SDK for interacting with Safaricom APIs',
     author='Samuel Ephrem',
     author_email='samuelephrem2012@gmail.com',
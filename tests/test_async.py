@@ -0,0 +1,216 @@
+import asyncio
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from mpesa_sdk import payloads
+from mpesa_sdk.aio import AsyncMPesaSDK, AsyncTokenManager, AsyncTransport, gather_bounded
+from mpesa_sdk.exceptions import APIRequestError, FatalError
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk.models import B2CRequest
+from mpesa_sdk.tokens import FileTokenStore
+from mpesa_sdk.validation import ValidationError
+
+
+@pytest.fixture
+def server():
+    with MockSafaricomServer() as server:
+        yield server
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def b2c_call(sdk, n):
+    return functools.partial(
+        sdk.b2c_payment_request, "testapiuser", "credential", "BusinessPayment", 100,
+        "600000", f"2517{n:08d}", "Test B2C", "https://x/timeout", "https://x/result", "Payroll")
+
+
+def test_async_operations(server):
+    async def main():
+        async with AsyncMPesaSDK("key", "secret", base_url=server.url) as sdk:
+            stk = await sdk.stk_push(
+                "req-1", "554433", "pw", "20160216165627", "CustomerPayBillOnline", "10.00",
+                "251700404789", "554433", "251700404789", "https://x/cb", "DATA", "desc", [])
+            register = await sdk.c2b_register_url("802000", "Completed", "https://x/c", "https://x/v")
+            payment = await sdk.c2b_payment(
+                "ref-1", "CustomerPayBillOnline", "remark", "1", "USSD", "20250101123456",
+                [], [], {}, {}, {})
+            b2c = await b2c_call(sdk, 1)()
+            return stk, register, payment, b2c
+
+    stk, register, payment, b2c = run(main())
+    assert stk["MerchantRequestID"] == "req-1"
+    assert register["ShortCode"] == "802000"
+    assert payment["RequestRefID"] == "ref-1"
+    assert b2c["ResponseCode"] == "0"
+    methods = [r[0] for r in server.requests]
+    assert methods == ["GET", "POST", "POST", "POST", "POST"]
+
+
+def test_async_payload_matches_sync_builder(server):
+    async def main():
+        async with AsyncMPesaSDK("key", "secret", base_url=server.url) as sdk:
+            await sdk.c2b_register_url("802000", "Completed", "https://x/c", "https://x/v")
+
+    run(main())
+    method, path, _, body = server.requests[-1]
+    assert path == "/v1/c2b-register-url/register?apikey=key"
+    assert body == {
+        "ShortCode": "802000",
+        "ResponseType": "Completed",
+        "CommandID": "RegisterURL",
+        "ConfirmationURL": "https://x/c",
+        "ValidationURL": "https://x/v",
+    }
+
+
+def test_async_single_token_fetch_under_fan_out(server):
+    async def main():
+        async with AsyncMPesaSDK("key", "secret", base_url=server.url) as sdk:
+            return await gather_bounded((b2c_call(sdk, n) for n in range(200)), concurrency=20)
+
+    results = run(main())
+    assert len(results) == 200
+    assert all(r["ResponseCode"] == "0" for r in results)
+    assert sum(1 for r in server.requests if r[0] == "GET") == 1
+
+
+def test_async_retries_once_on_401(server):
+    async def main():
+        async with AsyncMPesaSDK("key", "secret", base_url=server.url) as sdk:
+            await sdk.authenticate()
+            server.token = "rotated"
+            return await b2c_call(sdk, 1)()
+
+    assert run(main())["ResponseCode"] == "0"
+
+
+class ThreadRecordingStore(FileTokenStore):
+    """FileTokenStore noting which thread each call and lock ran on."""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.threads = []
+        self.locks = 0
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, token, expires_at):
+        self.threads.append(threading.get_ident())
+        super().set(key, token, expires_at)
+
+    @contextmanager
+    def lock(self, key):
+        self.threads.append(threading.get_ident())
+        self.locks += 1
+        with super().lock(key):
+            yield
+
+
+def test_async_shares_blocking_store_off_the_loop(server, tmp_path):
+    store = ThreadRecordingStore(str(tmp_path))
+    # A token another process already stored is reused as is.
+    server.token = "shared"
+    FileTokenStore(str(tmp_path)).set("sandbox:key", "shared", time.time() + 3600)
+
+    async def main(key):
+        async with AsyncMPesaSDK(key, "secret", base_url=server.url, token_store=store) as sdk:
+            await gather_bounded((b2c_call(sdk, n) for n in range(10)), concurrency=5)
+            return threading.get_ident()
+
+    run(main("key"))
+    assert sum(1 for r in server.requests if r[0] == "GET") == 0
+    assert {r[2]["Authorization"] for r in server.requests} == {"Bearer shared"}
+
+    loop_thread = run(main("other"))
+    assert sum(1 for r in server.requests if r[0] == "GET") == 1
+    assert store.locks == 1
+    assert store.threads and loop_thread not in store.threads
+
+
+def test_async_token_manager_renews_once_across_coroutines():
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        await asyncio.sleep(0.01)
+        return f"token-{len(fetches)}", 3600
+
+    async def main():
+        tokens = AsyncTokenManager(fetch, key="k")
+        first = await asyncio.gather(*(tokens.get_token() for _ in range(20)))
+        await tokens.invalidate("token-1")
+        return first, await tokens.get_token()
+
+    first, renewed = run(main())
+    assert set(first) == {"token-1"}
+    assert renewed == "token-2"
+    assert len(fetches) == 2
+
+
+def test_async_b2c_payload_is_validated_before_sending(server):
+    async def main():
+        async with AsyncMPesaSDK("key", "secret", base_url=server.url) as sdk:
+            with pytest.raises(ValidationError):
+                await sdk.b2c_payment_request("api", "cred", "BusinessPayment", 10, "600000", "123",
+                                              "r", "https://x/t", "https://x/r", "o")
+            with pytest.raises(ValidationError):
+                await sdk.send(B2CRequest("api", "cred", "BusinessPayment", "0", "600000", "251700404789",
+                                          "r", "https://x/t", "https://x/r", "o"))
+            return await b2c_call(sdk, 1)()
+
+    assert run(main())["ResponseCode"] == "0"
+    assert len([r for r in server.requests if r[1] == "/mpesa/b2c/v1/paymentrequest"]) == 1
+
+
+def test_async_error_mapping(server):
+    async def main():
+        async with AsyncMPesaSDK("key", "secret", base_url=server.url) as sdk:
+            await sdk._post(payloads.C2B_REGISTER_URL, "/missing", {})
+
+    with pytest.raises(APIRequestError, match="C2B Register URL failed"):
+        run(main())
+
+
+def test_gather_bounded_limits_concurrency_and_keeps_order():
+    in_flight = 0
+    peak = 0
+
+    async def call(n):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        if n == 3:
+            raise APIRequestError("boom")
+        return n
+
+    calls = (functools.partial(call, n) for n in range(50))
+    results = run(gather_bounded(calls, concurrency=5, return_exceptions=True))
+    assert peak <= 5
+    assert results[:3] == [0, 1, 2]
+    assert isinstance(results[3], APIRequestError)
+    assert results[49] == 49
+
+
+def test_async_transport_fails_fast_on_invalid_requests():
+    async def main(url):
+        transport = AsyncTransport()
+        try:
+            await transport.request("GET", url)
+        finally:
+            await transport.close()
+
+    for url in ("ftp://example.com/x", "https://"):
+        with pytest.raises(FatalError) as info:
+            run(main(url))
+        assert info.value.request_sent is False
@@ -0,0 +1,244 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from mpesa_sdk import MPesaSDK, AuthenticationError, FatalError, RetryableError
+from mpesa_sdk.tokens import TokenManager, FileTokenStore, RedisTokenStore
+from mpesa_sdk.transport import Transport, DEFAULT_TIMEOUT
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, data=None, text=""):
+        self.status_code = status_code
+        self._data = data or {}
+        self.text = text
+
+    def json(self):
+        return self._data
+
+
+class FakeSession(requests.Session):
+    def __init__(self, responses=()):
+        super().__init__()
+        self.responses = list(responses)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def make_sdk(*responses):
+    session = FakeSession(responses)
+    return MPesaSDK("key", "secret", transport=Transport(session=session)), session
+
+
+def test_authenticate_stores_token():
+    sdk, session = make_sdk(FakeResponse(data={"access_token": "tok", "expires_in": "3599"}))
+    sdk.authenticate()
+    assert sdk.access_token == "tok"
+    method, url, kwargs = session.calls[0]
+    assert method == "GET"
+    assert url.startswith("https://apisandbox.safaricom.et/v1/token/generate")
+    assert kwargs["headers"]["Authorization"].startswith("Basic ")
+    assert kwargs["timeout"] == DEFAULT_TIMEOUT
+
+
+def test_authenticate_failure():
+    sdk, _ = make_sdk(FakeResponse(status_code=400, text="bad credentials"))
+    with pytest.raises(AuthenticationError):
+        sdk.authenticate()
+
+
+def test_transport_session_is_reused_across_calls():
+    sdk, session = make_sdk(
+        FakeResponse(data={"access_token": "tok"}),
+        FakeResponse(data={"ResponseCode": "0"}),
+    )
+    sdk.authenticate()
+    sdk.c2b_register_url("802000", "Completed", "https://x/confirm", "https://x/validate")
+    assert len(session.calls) == 2
+    assert session.calls[1][2]["headers"]["Authorization"] == "Bearer tok"
+    assert session.headers["Connection"] == "keep-alive"
+
+
+def test_transport_wraps_timeouts():
+    sdk, _ = make_sdk(requests.ReadTimeout("slow"))
+    with pytest.raises(RetryableError):
+        sdk.c2b_register_url("802000", "Completed", "https://x/confirm", "https://x/validate")
+
+
+def test_transport_fails_fast_on_invalid_requests():
+    # A real session, so requests raises while preparing the request.
+    transport = Transport()
+    for url in ("not-a-url", "https://", "ftp://example.com/x"):
+        with pytest.raises(FatalError) as info:
+            transport.request("GET", url)
+        assert info.value.request_sent is False
+        assert not info.value.in_doubt
+    with pytest.raises(FatalError):
+        transport.request("GET", "https://example.com", headers={"X-Bad": "a\nb"})
+    transport.close()
+
+
+def test_transport_retries_only_connection_errors():
+    transport = Transport(session=FakeSession([
+        requests.ConnectionError("reset"), requests.TooManyRedirects("loop")]))
+    with pytest.raises(RetryableError):
+        transport.request("GET", "https://x")
+    with pytest.raises(FatalError):
+        transport.request("GET", "https://x")
+
+
+def test_transport_pool_sizing():
+    transport = Transport(pool_connections=2, pool_maxsize=50, timeout=5)
+    adapter = transport.session.get_adapter("https://api.safaricom.co.et")
+    assert adapter._pool_connections == 2
+    assert adapter._pool_maxsize == 50
+    assert transport.timeout == 5
+    transport.close()
+
+
+def test_sdk_closes_only_owned_transport():
+    transport = Transport(session=FakeSession())
+    with MPesaSDK("key", "secret", transport=transport) as sdk:
+        assert sdk.transport is transport
+    assert not sdk._owns_transport
+
+
+def test_token_fetched_lazily_and_cached():
+    sdk, session = make_sdk(
+        FakeResponse(data={"access_token": "tok", "expires_in": "3599"}),
+        FakeResponse(data={"ResponseCode": "0"}),
+        FakeResponse(data={"ResponseCode": "0"}),
+    )
+    sdk.c2b_register_url("802000", "Completed", "https://x/confirm", "https://x/validate")
+    sdk.c2b_register_url("802000", "Completed", "https://x/confirm", "https://x/validate")
+    assert [call[0] for call in session.calls] == ["GET", "POST", "POST"]
+    assert sdk.tokens.refresh_count == 1
+
+
+def test_request_retried_once_on_401():
+    sdk, session = make_sdk(
+        FakeResponse(data={"access_token": "old"}),
+        FakeResponse(status_code=401, text="expired"),
+        FakeResponse(data={"access_token": "new"}),
+        FakeResponse(data={"ResponseCode": "0"}),
+    )
+    assert sdk.c2b_register_url("802000", "Completed", "https://x/c", "https://x/v") == {"ResponseCode": "0"}
+    assert session.calls[3][2]["headers"]["Authorization"] == "Bearer new"
+    assert sdk.access_token == "new"
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_manager_refreshes_inside_margin():
+    clock = Clock()
+    tokens = iter(["a", "b"])
+    manager = TokenManager(lambda: (next(tokens), 100), key="k", refresh_margin=10,
+                           background_refresh=False, clock=clock)
+    assert manager.get_token() == "a"
+    clock.now += 85
+    assert manager.get_token() == "a"
+    clock.now += 10
+    assert manager.get_token() == "b"
+
+
+def test_token_manager_background_refresh_serves_current_token():
+    clock = Clock()
+    tokens = iter(["a", "b"])
+    manager = TokenManager(lambda: (next(tokens), 100), key="k", refresh_margin=10, clock=clock)
+    manager.get_token()
+    clock.now += 95
+    assert manager.get_token() == "a"
+    deadline = time.time() + 2
+    while manager.refresh_count < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert manager.get_token() == "b"
+
+
+def test_token_manager_single_flight():
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(1)
+        return "tok", 3600
+
+    manager = TokenManager(fetch, key="k")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(manager.get_token())) for _ in range(50)]
+    for t in threads:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == ["tok"] * 50
+    assert len(calls) == 1
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def set(self, name, value, px=None, nx=False):
+        if nx and name in self.data:
+            return False
+        self.data[name] = value.encode() if isinstance(value, str) else value
+        return True
+
+    def delete(self, name):
+        self.data.pop(name, None)
+
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: FileTokenStore(str(tmp_path)),
+    lambda tmp_path: RedisTokenStore(FakeRedis()),
+])
+def test_shared_token_store(tmp_path, make_store):
+    store = make_store(tmp_path)
+    first = TokenManager(lambda: ("shared", 3600), key="sandbox:key", store=store)
+    second = TokenManager(lambda: pytest.fail("token should be shared"), key="sandbox:key", store=store)
+    assert first.get_token() == "shared"
+    assert second.get_token() == "shared"
+    first.invalidate("shared")
+    assert store.get("sandbox:key") is None
+
+
+def test_redis_lock_release_keeps_another_owners_lock():
+    redis = FakeRedis()
+    store = RedisTokenStore(redis)
+    with store.lock("sandbox:key"):
+        # Our lock expired and another process took it meanwhile.
+        redis.data["mpesa:token:sandbox:key:lock"] = b"other-owner"
+    assert redis.data["mpesa:token:sandbox:key:lock"] == b"other-owner"
+
+
+def test_redis_lock_timeout_never_runs_unlocked():
+    redis = FakeRedis()
+    redis.data["mpesa:token:sandbox:key:lock"] = b"other-owner"
+    store = RedisTokenStore(redis, lock_timeout=0.05, poll_interval=0.01)
+    with pytest.raises(TimeoutError):
+        with store.lock("sandbox:key"):
+            pytest.fail("ran without the lock")
+    assert redis.data["mpesa:token:sandbox:key:lock"] == b"other-owner"
+
+    # The lock holder stored a fresh token meanwhile: use it instead of failing.
+    store.set("sandbox:key", "renewed", time.time() + 3600)
+    manager = TokenManager(lambda: pytest.fail("should not fetch"), key="sandbox:key", store=store)
+    assert manager._renew(stale="expired") == "renewed"
@@ -0,0 +1,173 @@
+import json
+
+import pytest
+
+from mpesa_sdk.bulk import disburse, read_payees, BulkDisbursement
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk import MPesaSDK
+
+DEFAULTS = {
+    "initiator_name": "testapiuser",
+    "security_credential": "credential",
+    "command_id": "BusinessPayment",
+    "party_a": "600000",
+    "remarks": "Payroll",
+    "occasion": "Salary",
+    "queue_timeout_url": "https://x/timeout",
+    "result_url": "https://x/result",
+}
+
+
+@pytest.fixture
+def server():
+    with MockSafaricomServer() as server:
+        yield server
+
+
+@pytest.fixture
+def sdk(server):
+    with MPesaSDK("key", "secret", base_url=server.url) as sdk:
+        yield sdk
+
+
+def payees(n):
+    return [{"id": f"emp-{i}", "party_b": f"2517{i:08d}", "amount": 100 + i} for i in range(n)]
+
+
+def read_results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def b2c_requests(server):
+    return [r for r in server.requests if r[1].startswith("/mpesa/b2c")]
+
+
+def test_disburse_pays_every_row(sdk, server, tmp_path):
+    summary = disburse(sdk, payees(40), str(tmp_path / "ckpt"), str(tmp_path / "results.jsonl"),
+                       defaults=DEFAULTS, concurrency=4, checkpoint_batch=8)
+    assert summary["paid"] == 40
+    results = read_results(tmp_path / "results.jsonl")
+    assert sorted(r["id"] for r in results) == sorted(p["id"] for p in payees(40))
+    bodies = [r[3] for r in b2c_requests(server)]
+    assert {b["PartyB"] for b in bodies} == {p["party_b"] for p in payees(40)}
+    assert all(b["InitiatorName"] == "testapiuser" for b in bodies)
+
+
+def test_resume_never_pays_twice(sdk, server, tmp_path):
+    ckpt = tmp_path / "ckpt"
+    ckpt.write_text(
+        json.dumps({"id": "emp-0", "state": "started"}) + "\n"
+        + json.dumps({"id": "emp-0", "state": "done"}) + "\n"
+        + json.dumps({"id": "emp-1", "state": "started"}) + "\n"
+        + '{"id": "emp-2", "sta'
+    )
+    summary = disburse(sdk, payees(5), str(ckpt), str(tmp_path / "results.jsonl"), defaults=DEFAULTS)
+    assert summary == {"paid": 3, "failed": 0, "in_doubt": 1, "duplicate": 0, "skipped": 1}
+    paid = {r[3]["PartyB"] for r in b2c_requests(server)}
+    assert paid == {p["party_b"] for p in payees(5)[2:]}
+
+    again = disburse(sdk, payees(5), str(ckpt), str(tmp_path / "results.jsonl"), defaults=DEFAULTS)
+    assert again["skipped"] == 5
+    assert len(b2c_requests(server)) == 3
+
+
+def test_duplicate_rows_paid_once(sdk, server, tmp_path):
+    rows = payees(3) + payees(1)
+    summary = disburse(sdk, rows, str(tmp_path / "ckpt"), str(tmp_path / "results.jsonl"), defaults=DEFAULTS)
+    assert summary["paid"] == 3
+    assert summary["duplicate"] == 1
+    assert len(b2c_requests(server)) == 3
+
+
+def test_rejected_rows_fail_and_transport_errors_are_in_doubt(sdk, server, tmp_path):
+    server.routes[("POST", "/mpesa/b2c/v1/paymentrequest")] = lambda body: (400, {"errorMessage": "Invalid"})
+    summary = disburse(sdk, payees(2), str(tmp_path / "ckpt"), str(tmp_path / "results.jsonl"), defaults=DEFAULTS)
+    assert summary["failed"] == 2
+
+    def drop_connection(body):
+        raise ConnectionResetError
+
+    server.routes[("POST", "/mpesa/b2c/v1/paymentrequest")] = drop_connection
+    summary = disburse(sdk, payees(3), str(tmp_path / "ckpt"), str(tmp_path / "results.jsonl"), defaults=DEFAULTS)
+    # The rejected rows are tried again; every attempt now drops.
+    assert summary["skipped"] == 0
+    assert summary["in_doubt"] == 3
+
+
+def test_resume_retries_failed_rows(sdk, server, tmp_path):
+    ckpt, results = str(tmp_path / "ckpt"), str(tmp_path / "results.jsonl")
+    pay = server.routes[("POST", "/mpesa/b2c/v1/paymentrequest")]
+    server.routes[("POST", "/mpesa/b2c/v1/paymentrequest")] = lambda body: (400, {"errorMessage": "Invalid"})
+    assert disburse(sdk, payees(1), ckpt, results, defaults=DEFAULTS)["failed"] == 1
+
+    server.routes[("POST", "/mpesa/b2c/v1/paymentrequest")] = pay
+    assert disburse(sdk, payees(1), ckpt, results, defaults=DEFAULTS, retry_failed=False)["skipped"] == 1
+    assert len(b2c_requests(server)) == 1
+    assert disburse(sdk, payees(1), ckpt, results, defaults=DEFAULTS)["paid"] == 1
+    assert len(b2c_requests(server)) == 2
+    # Paid now, so never paid again.
+    assert disburse(sdk, payees(1), ckpt, results, defaults=DEFAULTS)["skipped"] == 1
+    assert len(b2c_requests(server)) == 2
+
+
+def test_failed_row_interrupted_on_retry_is_in_doubt(sdk, server, tmp_path):
+    ckpt = tmp_path / "ckpt"
+    ckpt.write_text(
+        json.dumps({"id": "emp-0", "state": "started"}) + "\n"
+        + json.dumps({"id": "emp-0", "state": "done", "status": "failed"}) + "\n"
+        + json.dumps({"id": "emp-0", "state": "started"}) + "\n"
+    )
+    summary = disburse(sdk, payees(1), str(ckpt), str(tmp_path / "results.jsonl"), defaults=DEFAULTS)
+    assert summary["in_doubt"] == 1 and b2c_requests(server) == []
+
+
+def test_unexpected_errors_are_in_doubt_only_after_sending(sdk, tmp_path, monkeypatch):
+    # Raised while building the request: nothing was sent.
+    monkeypatch.setattr(sdk.credentials, "security_credential", lambda *args: 1 / 0)
+    rows = [{"id": "emp-1", "party_b": "251700000001", "amount": 10}]
+    defaults = dict(DEFAULTS, security_credential=None)
+    summary = disburse(sdk, rows, str(tmp_path / "ckpt1"), str(tmp_path / "r1.jsonl"), defaults=defaults)
+    assert summary["failed"] == 1 and summary["in_doubt"] == 0
+    monkeypatch.undo()
+
+    # Raised once the response came back: the payment may have gone through.
+    send = sdk.transport.request
+
+    def corrupt(*args, **kwargs):
+        response = send(*args, **kwargs)
+        if kwargs.get("operation") == "b2c_payment":
+            raise UnicodeDecodeError("utf-8", b"", 0, 1, "corrupt response")
+        return response
+
+    monkeypatch.setattr(sdk.transport, "request", corrupt)
+    summary = disburse(sdk, rows, str(tmp_path / "ckpt2"), str(tmp_path / "r2.jsonl"), defaults=DEFAULTS)
+    assert summary["in_doubt"] == 1 and summary["failed"] == 0
+
+
+def test_read_payees_csv_and_jsonl(tmp_path):
+    csv_path = tmp_path / "payees.csv"
+    csv_path.write_text("id,party_b,amount\nemp-1,251700000001,10\n")
+    jsonl_path = tmp_path / "payees.jsonl"
+    jsonl_path.write_text('{"id": "emp-1", "party_b": "251700000001", "amount": 10}\n\n')
+    assert list(read_payees(str(csv_path))) == [{"id": "emp-1", "party_b": "251700000001", "amount": "10"}]
+    assert list(read_payees(str(jsonl_path))) == [{"id": "emp-1", "party_b": "251700000001", "amount": 10}]
+
+
+def test_rate_limit_paces_requests(sdk, tmp_path):
+    import time
+    run = BulkDisbursement(sdk, str(tmp_path / "ckpt"), str(tmp_path / "r.jsonl"), defaults=DEFAULTS,
+                           concurrency=4, rate_limit=50)
+    start = time.monotonic()
+    run.run(payees(10))
+    assert time.monotonic() - start >= 9 / 50
+
+
+def test_invalid_rows_fail_without_sending(sdk, server, tmp_path):
+    rows = [{"id": "ok", "party_b": "251700000001", "amount": 10},
+            {"id": "bad-phone", "party_b": "12345", "amount": 10},
+            {"id": "bad-amount", "party_b": "251700000002", "amount": "-5"}]
+    summary = disburse(sdk, rows, str(tmp_path / "ckpt"), str(tmp_path / "results.jsonl"), defaults=DEFAULTS)
+    assert summary["paid"] == 1 and summary["failed"] == 2
+    assert len([r for r in server.requests if r[1] == "/mpesa/b2c/v1/paymentrequest"]) == 1
+
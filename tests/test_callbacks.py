@@ -0,0 +1,157 @@
+import asyncio
+import io
+import json
+import threading
+
+from mpesa_sdk.callbacks import (
+    CallbackReceiver, DedupWindow, B2CResult, StkCallback,
+    STK, C2B_CONFIRMATION, B2C_RESULT,
+)
+
+STK_BODY = {"Body": {"stkCallback": {
+    "MerchantRequestID": "mr-1", "CheckoutRequestID": "ws_CO_1", "ResultCode": 0,
+    "ResultDesc": "The service request is processed successfully.",
+    "CallbackMetadata": {"Item": [
+        {"Name": "Amount", "Value": 10}, {"Name": "MpesaReceiptNumber", "Value": "R1"},
+        {"Name": "PhoneNumber", "Value": 251700404789},
+    ]},
+}}}
+
+C2B_BODY = {"TransactionType": "Pay Bill", "TransID": "T1", "TransTime": "20250101123456",
+            "TransAmount": "10.00", "BusinessShortCode": "802000", "BillRefNumber": "ACC",
+            "MSISDN": "251700404789", "FirstName": "Test"}
+
+B2C_BODY = {"Result": {"ResultType": 0, "ResultCode": "0", "ResultDesc": "Success",
+                       "OriginatorConversationID": "oc-1", "ConversationID": "AG_1", "TransactionID": "B1",
+                       "ResultParameters": {"ResultParameter": [
+                           {"Key": "TransactionAmount", "Value": 100},
+                           {"Key": "ReceiverPartyPublicName", "Value": "251711959143 - Test"},
+                       ]}}}
+
+
+def body(data):
+    return json.dumps(data).encode()
+
+
+def collecting_receiver(**kwargs):
+    received = []
+    lock = threading.Lock()
+
+    def handler(callback):
+        with lock:
+            received.append(callback)
+
+    receiver = CallbackReceiver(handlers={STK: handler, C2B_CONFIRMATION: handler, B2C_RESULT: handler}, **kwargs)
+    return receiver, received
+
+
+def test_parses_typed_callbacks():
+    stk = StkCallback(STK_BODY)
+    assert stk.successful
+    assert stk.metadata["MpesaReceiptNumber"] == "R1"
+    b2c = B2CResult(B2C_BODY, B2C_RESULT)
+    assert b2c.successful
+    assert b2c.parameters["TransactionAmount"] == 100
+
+
+def test_acks_and_dispatches_once():
+    receiver, received = collecting_receiver()
+    assert receiver.handle("/mpesa/stk", body(STK_BODY)) == (200, {"ResultCode": 0, "ResultDesc": "Accepted"})
+    assert receiver.handle("/mpesa/stk", body(STK_BODY))[0] == 200
+    receiver.handle("/mpesa/c2b/confirmation", body(C2B_BODY))
+    receiver.handle("/mpesa/b2c/result", body(B2C_BODY))
+    receiver.close()
+    assert sorted(c.kind for c in received) == sorted([STK, C2B_CONFIRMATION, B2C_RESULT])
+    assert receiver.stats["duplicates"] == 1
+    assert receiver.stats["processed"] == 3
+
+
+def test_validation_is_answered_inline():
+    receiver = CallbackReceiver(validator=lambda n: True if n.amount == "10.00" else ("C2B00013", "Invalid Amount"))
+    assert receiver.handle("/mpesa/c2b/validation", body(C2B_BODY))[1]["ResultCode"] == "0"
+    rejected = dict(C2B_BODY, TransAmount="0")
+    assert receiver.handle("/mpesa/c2b/validation", body(rejected))[1] == {
+        "ResultCode": "C2B00013", "ResultDesc": "Invalid Amount"}
+    receiver.close()
+
+
+def test_malformed_and_unknown():
+    receiver = CallbackReceiver()
+    assert receiver.handle("/mpesa/stk", b"{not json")[0] == 400
+    assert receiver.handle("/mpesa/stk", body({"Body": {}}))[0] == 400
+    assert receiver.handle("/elsewhere", body(STK_BODY))[0] == 404
+    receiver.close()
+
+
+def test_full_queue_sheds_load_without_blocking():
+    release = threading.Event()
+    receiver = CallbackReceiver(handlers={B2C_RESULT: lambda c: release.wait(1)}, workers=1, queue_size=1)
+    statuses = []
+    for n in range(5):
+        data = json.loads(json.dumps(B2C_BODY))
+        data["Result"]["ConversationID"] = f"AG_{n}"
+        statuses.append(receiver.handle("/mpesa/b2c/result", body(data))[0])
+    assert 503 in statuses
+    rejected = statuses.index(503)
+    release.set()
+    receiver.join()
+    data = json.loads(json.dumps(B2C_BODY))
+    data["Result"]["ConversationID"] = f"AG_{rejected}"
+    # A shed callback is not remembered, so Safaricom's redelivery is processed.
+    assert receiver.handle("/mpesa/b2c/result", body(data))[0] == 200
+    receiver.close()
+
+
+def test_dedup_window_is_bounded():
+    window = DedupWindow(capacity=3)
+    assert all(window.add(k) for k in "abcd")
+    assert len(window) == 3
+    assert window.add("a")
+    assert not window.add("d")
+
+
+def test_dedup_window_readded_key_keeps_its_new_slot():
+    window = DedupWindow(capacity=3)
+    assert window.add("a") and window.add("b")
+    window.discard("a")
+    assert window.add("a")
+    # "a" now owns the third slot; reusing its old one must not evict it.
+    assert window.add("c")
+    assert not window.add("a")
+    assert len(window) == 3
+
+
+def test_validator_errors_reject_instead_of_failing(caplog):
+    def validator(notification):
+        raise RuntimeError("database down")
+
+    receiver = CallbackReceiver(validator=validator)
+    status, data = receiver.handle("/mpesa/c2b/validation", body(C2B_BODY))
+    assert (status, data) == (200, {"ResultCode": "C2B00016", "ResultDesc": "Other Error"})
+    assert receiver.stats["validator_errors"] == 1
+    assert "C2B validator failed" in caplog.text
+    receiver.close()
+
+
+def test_wsgi_and_asgi_entry_points():
+    receiver, received = collecting_receiver()
+    raw = body(STK_BODY)
+    captured = {}
+    environ = {"PATH_INFO": "/mpesa/stk", "CONTENT_LENGTH": str(len(raw)), "wsgi.input": io.BytesIO(raw)}
+    out = receiver.wsgi(environ, lambda status, headers: captured.update(status=status))
+    assert captured["status"] == "200 OK"
+    assert json.loads(b"".join(out))["ResultCode"] == 0
+
+    sent = []
+    messages = iter([{"type": "http.request", "body": body(B2C_BODY), "more_body": False}])
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(receiver.asgi({"type": "http", "path": "/mpesa/b2c/result"}, receive, send))
+    assert sent[0]["status"] == 200
+    receiver.close()
+    assert len(received) == 2
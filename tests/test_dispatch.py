@@ -0,0 +1,213 @@
+import json
+import threading
+
+import pytest
+
+from mpesa_sdk.dispatch import FAILED, IN_DOUBT, PROCESSED, SENT, DurableDispatcher, WriteAheadLog, query_status
+from mpesa_sdk.exceptions import FatalError, RetryableError
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk.models import B2CRequest, StkPushRequest, StkPushResponse
+from mpesa_sdk import MPesaSDK
+from mpesa_sdk.security import CredentialProvider
+
+STK_ARGS = ("req-1", "554433", "pw", "20160216165627", "CustomerPayBillOnline", "10.00",
+            "251700404789", "554433", "251700404789", "https://x/cb", "DATA", "desc", [])
+
+
+def stk(request_id):
+    return StkPushRequest(request_id, *STK_ARGS[1:])
+
+
+def read(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class FakeSDK:
+    def __init__(self, log_path=None, fail=()):
+        self.log_path = log_path
+        self.fail = dict(fail)
+        self.sent = []
+        self.credentials = CredentialProvider()
+        self._lock = threading.Lock()
+
+    def send(self, request):
+        if self.log_path is not None:
+            # The request must be in the log before it goes out.
+            assert any(r.get("request", {}).get("MerchantRequestID") == request.merchant_request_id
+                       for r in read(self.log_path))
+        with self._lock:
+            self.sent.append(request.idempotency_key)
+        error = self.fail.get(request.idempotency_key)
+        if error is not None:
+            raise error
+        return StkPushResponse.from_dict({"MerchantRequestID": request.merchant_request_id})
+
+
+def test_logs_before_sending_and_records_outcomes(tmp_path):
+    path = str(tmp_path / "wal.jsonl")
+    sdk = FakeSDK(path, fail={"bad": FatalError("rejected", status_code=400),
+                              "lost": RetryableError("timed out")})
+    results = []
+    with DurableDispatcher(sdk, path, workers=2, on_result=lambda *r: results.append(r[:2])) as dispatcher:
+        ok = dispatcher.submit(stk("ok"))
+        bad = dispatcher.submit(stk("bad"))
+        lost = dispatcher.submit(stk("lost"))
+        assert ok.result().merchant_request_id == "ok"
+        with pytest.raises(FatalError):
+            bad.result()
+        with pytest.raises(RetryableError):
+            lost.result()
+    assert sorted(results) == [(1, SENT), (2, FAILED), (3, IN_DOUBT)]
+    assert dispatcher.status(1) == SENT and list(dispatcher.in_doubt) == [3]
+    assert [r.get("status") for r in read(path)].count(None) == 3
+
+
+def test_group_commit_shares_fsyncs(tmp_path):
+    path = str(tmp_path / "wal.jsonl")
+    dispatcher = DurableDispatcher(FakeSDK(), path, workers=4, commit_delay=0.002)
+    threads = [threading.Thread(target=lambda i=i: [dispatcher.submit(stk(f"r{i}-{n}")) for n in range(20)])
+               for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    dispatcher.close()
+    assert len([r for r in read(path) if "request" in r]) == 320
+    assert dispatcher.log.commits < 320 / 2
+
+
+def test_recover_resolves_resends_and_compacts(tmp_path):
+    path = str(tmp_path / "wal.jsonl")
+    with open(path, "w") as f:
+        for entry_id, request_id in enumerate(["done", "known", "unknown", "mystery"], 1):
+            f.write(json.dumps({"id": entry_id, "type": "StkPushRequest", "request": stk(request_id).to_dict()}) + "\n")
+        f.write(json.dumps({"id": 1, "status": SENT, "result": {}}) + "\n")
+        f.write('{"id": 5, "type": "StkP')
+
+    def resolver(sdk, request):
+        return {"known": (True, {"output_ResponseTransactionStatus": "Completed"}),
+                "unknown": (False, None)}.get(request.idempotency_key, (None, None))
+
+    sdk = FakeSDK()
+    dispatcher = DurableDispatcher(sdk, path, resolver=resolver)
+    summary = dispatcher.recover()
+    assert summary == {PROCESSED: 1, "resent": 1, IN_DOUBT: 1}
+    assert sdk.sent == ["unknown"]
+    assert dispatcher.status(2) == PROCESSED and dispatcher.status(3) == SENT
+    assert list(dispatcher.in_doubt) == [4]
+    assert dispatcher.submit(stk("new")).result()
+    dispatcher.close()
+    entries = [r["id"] for r in read(path) if "request" in r]
+    assert entries == [2, 3, 4, 5]
+
+    # A second recovery only has the still-unknown entry left.
+    sdk = FakeSDK()
+    assert DurableDispatcher(sdk, path, resolver=resolver).recover() == {PROCESSED: 0, "resent": 0, IN_DOUBT: 1}
+
+
+def test_secrets_the_client_can_regenerate_are_not_logged(tmp_path):
+    path = str(tmp_path / "wal.jsonl")
+    sdk = FakeSDK()
+    sdk.credentials = CredentialProvider(passkey="passkey")
+    with DurableDispatcher(sdk, path) as dispatcher:
+        dispatcher.submit(stk("r1")).result()
+    logged = read(path)[0]["request"]
+    assert logged["Password"] is None and logged["MerchantRequestID"] == "r1"
+
+
+def test_wal_survives_torn_tail(tmp_path):
+    path = str(tmp_path / "wal.jsonl")
+    with open(path, "w") as f:
+        f.write('{"id": 1, "status": "sent"}\n{"id": 2, "sta')
+    log = WriteAheadLog(path)
+    log.append({"id": 3, "status": "sent"})
+    log.close()
+    assert [r["id"] for r in log.read()] == [1, 3]
+
+
+def test_dispatch_against_mock_server(tmp_path):
+    with MockSafaricomServer() as server:
+        with MPesaSDK("key", "secret", base_url=server.url) as sdk:
+            with DurableDispatcher(sdk, str(tmp_path / "wal.jsonl")) as dispatcher:
+                futures = [dispatcher.submit(stk(f"r{n}")) for n in range(10)]
+                futures.append(dispatcher.submit(B2CRequest("api", "cred", "BusinessPayment", 10, "600000",
+                                                            "251700404789", "r", "https://x/t", "https://x/r", "o")))
+                assert all(f.result().response_code == "0" for f in futures)
+
+
+class StatusSDK:
+    def __init__(self, answers):
+        self.answers = answers
+
+    def query_transaction_status(self, query_reference, third_party_reference):
+        answer = self.answers[query_reference]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def test_query_status_only_settles_completed_transactions():
+    sdk = StatusSDK({
+        "done": {"output_ResponseTransactionStatus": "Completed"},
+        "pending": {"output_ResponseTransactionStatus": "Pending"},
+        "failed": {"output_ResponseTransactionStatus": "Failed"},
+        "stk-ok": {"ResultCode": "0"},
+        "stk-cancelled": {"ResultCode": "1032"},
+        "accepted": {"ResponseCode": "0"},
+        "no-route": FatalError("not found", status_code=404, body='{"errorMessage": "No route"}'),
+        "unknown": FatalError("not found", status_code=404, body='{"output_ResponseCode": "INS-17"}'),
+        "unknown-200": {"output_ResponseCode": "INS-17"},
+    })
+    processed = {key: query_status(sdk, stk(key), unknown_codes={"INS-17"})[0] for key in sdk.answers}
+    assert processed == {"done": True, "pending": None, "failed": None, "stk-ok": True, "stk-cancelled": None,
+                         "accepted": None, "no-route": None, "unknown": False, "unknown-200": False}
+    # Without known codes, nothing is ever judged safe to send again.
+    assert query_status(sdk, stk("unknown")) == (None, None)
+
+
+def test_unexpected_errors_settle_entries(tmp_path):
+    path = str(tmp_path / "wal.jsonl")
+    sdk = FakeSDK(fail={"broken": ValueError("no credentials")})
+    with DurableDispatcher(sdk, path, workers=1) as dispatcher:
+        with pytest.raises(ValueError):
+            dispatcher.submit(stk("broken")).result()
+        assert dispatcher.status(1) == FAILED and not dispatcher._entries
+    assert read(path)[-1]["status"] == FAILED
+
+
+def test_unexpected_error_after_sending_is_in_doubt(tmp_path):
+    with MockSafaricomServer() as server:
+        with MPesaSDK("key", "secret", base_url=server.url) as sdk:
+            send = sdk.transport.request
+
+            def corrupt(*args, **kwargs):
+                response = send(*args, **kwargs)
+                if kwargs.get("operation") == "stk_push":
+                    raise UnicodeDecodeError("utf-8", b"", 0, 1, "corrupt response")
+                return response
+
+            sdk.transport.request = corrupt
+            with DurableDispatcher(sdk, str(tmp_path / "wal.jsonl"), workers=1) as dispatcher:
+                with pytest.raises(UnicodeDecodeError):
+                    dispatcher.submit(stk("r1")).result()
+                assert dispatcher.status(1) == IN_DOUBT and list(dispatcher.in_doubt) == [1]
+
+
+def test_settled_entries_are_pruned_and_log_compacted(tmp_path):
+    path = str(tmp_path / "wal.jsonl")
+    sdk = FakeSDK(fail={"lost": RetryableError("timed out")})
+    dispatcher = DurableDispatcher(sdk, path, workers=1, compact_bytes=4096, max_settled=5)
+    with pytest.raises(RetryableError):
+        dispatcher.submit(stk("lost")).result()
+    for n in range(50):
+        dispatcher.submit(stk(f"r{n}")).result()
+    assert len(dispatcher._status) == 5 and not dispatcher._entries.keys() - {1}
+    assert dispatcher.status(1) == IN_DOUBT and dispatcher.status(51) == SENT and dispatcher.status(2) is None
+    dispatcher.close()
+    assert dispatcher.log.size < 4096
+    # The in-doubt entry survives every compaction, so a restart still sees it.
+    records = read(path)
+    assert [r["id"] for r in records if "request" in r][0] == 1
+    sdk = FakeSDK()
+    assert DurableDispatcher(sdk, path, resolver=lambda sdk, request: (None, None)).recover()[IN_DOUBT] == 1
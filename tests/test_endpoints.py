@@ -0,0 +1,194 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mpesa_sdk import MPesaSDK
+from mpesa_sdk.endpoints import MIN_SAMPLES, EndpointSet, rebaser
+from mpesa_sdk.exceptions import FatalError, RetryableError
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk.retry import Retrier, RetryPolicy
+
+STK_ARGS = ("req-1", "554433", "pw", "20160216165627", "CustomerPayBillOnline", "10.00",
+            "251700404789", "554433", "251700404789", "https://x/cb", "DATA", "desc", [])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def client(urls, **kwargs):
+    return MPesaSDK("key", "secret", endpoints=urls, use_spec_ports=False,
+                    retrier=Retrier(RetryPolicy(base_delay=0)), operation_defaults={"from": "171717"}, **kwargs)
+
+
+def posts(server):
+    return [r for r in server.requests if r[0] == "POST"]
+
+
+def unused_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def test_picks_untried_then_fastest_endpoint():
+    endpoints = EndpointSet(["http://a", "http://b/"])
+    a, b = endpoints.endpoints
+    assert endpoints.pick() is a
+    endpoints.record(a, 0.2)
+    assert endpoints.pick() is b
+    endpoints.record(b, 0.05)
+    assert endpoints.pick() is b
+    assert endpoints.pick(exclude={b}) is a
+    assert endpoints.primary == "http://a" and b.url == "http://b"
+
+
+def test_failing_endpoint_is_skipped_then_probed():
+    clock = Clock()
+    endpoints = EndpointSet(["http://a", "http://b"], failure_threshold=2, cooldown=10, clock=clock)
+    a, b = endpoints.endpoints
+    endpoints.record(b, 0.5)
+    for _ in range(2):
+        endpoints.record(a, 0.01, RetryableError("boom", status_code=503))
+    assert endpoints.pick() is b
+    assert endpoints.stats()["http://a"]["healthy"] is False
+    # Throttling and rejected requests do not count against an endpoint.
+    endpoints.record(b, 0.5, RetryableError("slow down", status_code=429))
+    endpoints.record(b, 0.5, FatalError("bad request", status_code=400))
+    assert b.consecutive_failures == 0
+
+    clock.now = 11
+    assert endpoints.pick() is a  # one probe after the cooldown...
+    assert endpoints.pick() is b  # ...while other calls stay away
+    endpoints.record(a, 0.01)
+    assert endpoints.stats()["http://a"]["healthy"] is True
+
+
+def test_hedge_delay_follows_recent_latency():
+    endpoints = EndpointSet(["http://a"])
+    a = endpoints.endpoints[0]
+    for n in range(100):
+        endpoints.record(a, 0.01 if n % 20 else 0.4)
+    assert len(a.samples) >= MIN_SAMPLES
+    assert endpoints.hedge_delay(a) == pytest.approx(0.4)
+    assert endpoints.hedge_delay(a, quantile=0.5) == pytest.approx(0.01)
+
+
+def test_rebaser():
+    assert rebaser("https://a.et/v1/c2b/payments", "https://a.et")("https://b.et") == "https://b.et/v1/c2b/payments"
+    move = rebaser("https://a.et:18352/ipg/v1x/query/?x=1", "https://a.et")
+    assert move("https://b.et") == "https://b.et:18352/ipg/v1x/query/?x=1"
+    assert rebaser("https://other.et/x", "https://a.et") is None
+    assert rebaser("https://a.et.evil/x", "https://a.et") is None
+    assert rebaser("https://a.et@evil.et/x", "https://a.et") is None
+    assert rebaser("https://a.et/apix/y", "https://a.et/api")("https://b.et") == "https://b.et/apix/y"
+    assert rebaser("https://a.et/api/y", "https://a.et/api")("https://b.et/v2") == "https://b.et/v2/y"
+
+
+def test_hedged_both_failing_raises_last_retryable_error_and_excludes_both():
+    endpoints = EndpointSet(["http://a", "http://b"])
+
+    def fn(base):
+        if base == "http://a":
+            time.sleep(0.1)
+            raise RetryableError("a timed out")
+        raise FatalError("b rejected", status_code=400)
+
+    exclude = set()
+    with ThreadPoolExecutor(2) as pool:
+        with pytest.raises(RetryableError, match="a timed out"):
+            endpoints.hedged(fn, pool, exclude, delay=0.01)
+    assert exclude == {endpoints.endpoints[0]}
+
+    def slow_retryable(base):
+        time.sleep(0.1 if base == "http://a" else 0.2)
+        raise RetryableError(f"{base} timed out")
+
+    exclude = set()
+    with ThreadPoolExecutor(2) as pool:
+        with pytest.raises(RetryableError, match="http://b timed out"):
+            EndpointSet(["http://a", "http://b"]).hedged(slow_retryable, pool, exclude, delay=0.01)
+    assert len(exclude) == 2
+
+
+def test_idempotent_write_fails_over():
+    with MockSafaricomServer(error_rate=1.0, error_status=503) as bad, MockSafaricomServer() as good:
+        with client([bad.url, good.url]) as sdk:
+            response = sdk.stk_push(*STK_ARGS)
+            assert response["MerchantRequestID"] == "req-1"
+            assert len(posts(bad)) == 1 and len(posts(good)) == 1
+            stats = sdk.endpoints.stats()
+            assert stats[bad.url]["failures"] == 1 and stats[good.url]["requests"] >= 1
+
+
+def test_write_without_request_id_does_not_fail_over_when_in_doubt():
+    with MockSafaricomServer(error_rate=1.0, error_status=500) as bad, MockSafaricomServer() as good:
+        with client([bad.url, good.url]) as sdk:
+            with pytest.raises(RetryableError):
+                sdk.c2b_register_url("554433", "Completed", "https://x/c", "https://x/v")
+            assert posts(good) == []
+
+
+def test_unreachable_endpoint_fails_over():
+    with MockSafaricomServer() as good:
+        with client([unused_url(), good.url]) as sdk:
+            sdk.c2b_register_url("554433", "Completed", "https://x/c", "https://x/v")
+            assert len(posts(good)) == 1
+
+
+def test_hedged_status_query_beats_slow_endpoint():
+    with MockSafaricomServer(latency=0.5) as slow, MockSafaricomServer() as fast:
+        for server in (slow, fast):
+            server.statuses["TX9"] = "Completed"
+        with client([slow.url, fast.url], hedge=True, hedge_delay=0.05) as sdk:
+            sdk.authenticate()
+            # The slow endpoint looked fastest until now.
+            sdk.endpoints.record(sdk.endpoints.endpoints[1], 1.0)
+            start = time.perf_counter()
+            response = sdk.query_transaction_status("TX9", "REF3")
+            assert time.perf_counter() - start < 0.4
+            assert response["output_ResponseTransactionStatus"] == "Completed"
+            assert sdk.endpoints.stats()[fast.url]["hedges"] == 1
+
+
+@pytest.mark.parametrize("workers, calls", [(1, 1), (2, 4)])
+def test_hedged_calls_with_cold_token_do_not_deadlock(workers, calls):
+    with MockSafaricomServer() as a, MockSafaricomServer() as b:
+        for server in (a, b):
+            server.statuses["TX9"] = "Completed"
+        with client([a.url, b.url], hedge=True, hedge_delay=0.01, hedge_workers=workers) as sdk:
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(sdk.query_transaction_status("TX9", "REF3")),
+                                        daemon=True)
+                       for _ in range(calls)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+            assert not any(thread.is_alive() for thread in threads)
+            assert [r["output_ResponseTransactionStatus"] for r in results] == ["Completed"] * calls
+
+
+def test_hedged_wait_is_bounded():
+    def stuck(base):
+        time.sleep(0.5)
+
+    with ThreadPoolExecutor(2) as pool:
+        start = time.perf_counter()
+        with pytest.raises(RetryableError, match="timed out"):
+            EndpointSet(["http://a", "http://b"]).hedged(stuck, pool, delay=0.01, timeout=0.1)
+        assert time.perf_counter() - start < 0.4
+
+
+def test_single_endpoint_behaves_like_base_url():
+    with MockSafaricomServer() as server:
+        with client([server.url]) as sdk:
+            assert sdk.base_url == server.url
+            assert sdk.stk_push(*STK_ARGS)["ResponseCode"] == "0"
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from contextlib import contextmanager
+
+import pytest
+from requests.adapters import HTTPAdapter
+
+from mpesa_sdk import payloads
+from mpesa_sdk.instrumentation import Instrumentation, Metrics, combine
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk import MPesaSDK, FatalError
+from mpesa_sdk.ratelimit import Limit, RateLimiter
+from mpesa_sdk.retry import Retrier, RetryPolicy
+from mpesa_sdk.transport import Transport
+
+STK_ARGS = ("req-1", "554433", "pw", "20160216165627", "CustomerPayBillOnline", "10.00",
+            "251700404789", "554433", "251700404789", "https://x/cb", "DATA", "desc", [])
+
+
+class Span:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.exceptions = []
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exception):
+        self.exceptions.append(exception)
+
+
+class Tracer(Instrumentation):
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def start_span(self, name, attributes=None):
+        span = Span(name, attributes)
+        self.spans.append(span)
+        yield span
+
+
+def test_metrics_split_phases_and_count_outcomes():
+    metrics = Metrics()
+    with MockSafaricomServer() as server:
+        with MPesaSDK("key", "secret", base_url=server.url, instrumentation=metrics) as sdk:
+            sdk.stk_push(*STK_ARGS)
+            sdk.stk_push(*("req-2",) + STK_ARGS[1:])
+    assert metrics.token_refreshes == 1
+    assert metrics.outcomes[(payloads.TOKEN, "200")] == 1
+    assert metrics.outcomes[(payloads.STK_PUSH, "200")] == 2
+    assert metrics.connections_opened == 1
+    assert metrics.connections_reused == 2
+    assert metrics.latency[(payloads.TOKEN, "dns")].count == 1
+    assert metrics.latency[(payloads.TOKEN, "connect")].count == 1
+    assert (payloads.TOKEN, "tls") not in metrics.latency
+    assert metrics.latency[(payloads.STK_PUSH, "server")].count == 2
+    assert metrics.latency[(payloads.STK_PUSH, "total")].quantile(0.99) is not None
+    assert metrics.snapshot()["outcomes"]["stk_push.200"] == 2
+
+
+def test_metrics_record_retries_and_throttling():
+    metrics = Metrics()
+    limiter = RateLimiter({payloads.STK_PUSH: Limit(rate=20, burst=1)})
+    with MockSafaricomServer() as server:
+        outcomes = [(503, {"errorMessage": "busy"})]
+        original = server.routes[("POST", payloads.STK_PUSH_PATH)]
+        server.routes[("POST", payloads.STK_PUSH_PATH)] = (
+            lambda body: outcomes.pop(0) if outcomes else original(body))
+        transport = Transport(rate_limiter=limiter, instrumentation=metrics)
+        retrier = Retrier(RetryPolicy(base_delay=0), instrumentation=metrics)
+        with MPesaSDK("key", "secret", base_url=server.url, transport=transport, retrier=retrier,
+                      instrumentation=metrics) as sdk:
+            sdk.stk_push(*STK_ARGS)
+        transport.close()
+    assert metrics.retries == {payloads.STK_PUSH: 1}
+    assert metrics.outcomes[(payloads.STK_PUSH, "503")] == 1
+    assert metrics.throttle_delay[payloads.STK_PUSH].count == 1
+
+
+def test_spans_wrap_operations_and_record_errors():
+    tracer = Tracer()
+    metrics = Metrics()
+    with MockSafaricomServer() as server:
+        server.routes[("POST", payloads.B2C_PAYMENT_PATH)] = lambda body: (400, {"errorMessage": "Invalid"})
+        with MPesaSDK("key", "secret", base_url=server.url, instrumentation=combine(tracer, metrics)) as sdk:
+            sdk.stk_push(*STK_ARGS)
+            with pytest.raises(FatalError):
+                sdk.b2c_payment_request("u", "c", "BusinessPayment", 1, "600000", "251700000000",
+                                        "r", "https://x/t", "https://x/r", "o")
+    assert [span.name for span in tracer.spans] == ["mpesa.stk_push", "mpesa.b2c_payment"]
+    failed = tracer.spans[1]
+    assert failed.attributes["http.response.status_code"] == 400
+    assert failed.attributes["error.type"] == "FatalError"
+    assert isinstance(failed.exceptions[0], FatalError)
+    assert metrics.outcomes[(payloads.B2C_PAYMENT, "400")] == 1
+
+
+def test_transport_failures_are_reported_with_their_cause():
+    metrics = Metrics()
+    transport = Transport(instrumentation=metrics)
+    with pytest.raises(FatalError):
+        transport.get("not-a-url", operation=payloads.STK_PUSH)
+    transport.close()
+    assert metrics.outcomes == {(payloads.STK_PUSH, "MissingSchema"): 1}
+
+    aio = pytest.importorskip("mpesa_sdk.aio")
+
+    async def main():
+        transport = aio.AsyncTransport(instrumentation=metrics)
+        try:
+            await transport.get("ftp://example.com/x", operation=payloads.B2C_PAYMENT)
+        finally:
+            await transport.close()
+
+    with pytest.raises(FatalError):
+        asyncio.run(main())
+    assert metrics.outcomes[(payloads.B2C_PAYMENT, "UnsupportedProtocol")] == 1
+
+
+def test_disabled_instrumentation_keeps_plain_transport():
+    transport = Transport()
+    assert type(transport.session.get_adapter("https://example.com")) is HTTPAdapter
+    assert MPesaSDK("key", "secret").retrier.instrumentation is None
+
+
+def test_authenticate_logs_instead_of_printing(capsys, caplog):
+    with MockSafaricomServer() as server:
+        with MPesaSDK("key", "secret", base_url=server.url) as sdk:
+            with caplog.at_level(logging.INFO, logger="mpesa_sdk"):
+                sdk.authenticate()
+    assert capsys.readouterr().out == ""
+    assert "Authenticated" in caplog.text
+
+
+def test_async_metrics():
+    aio = pytest.importorskip("mpesa_sdk.aio")
+    metrics = Metrics()
+
+    async def main(url):
+        async with aio.AsyncMPesaSDK("key", "secret", base_url=url, instrumentation=metrics) as sdk:
+            await sdk.stk_push(*STK_ARGS)
+
+    with MockSafaricomServer() as server:
+        asyncio.run(main(server.url))
+    assert metrics.token_refreshes == 1
+    assert metrics.outcomes[(payloads.STK_PUSH, "200")] == 1
+    assert metrics.latency[(payloads.TOKEN, "connect")].count == 1
+    assert metrics.connections_reused == 1
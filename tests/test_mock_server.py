@@ -0,0 +1,82 @@
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import pytest
+import requests
+
+from mpesa_sdk import payloads
+from mpesa_sdk.callbacks import B2C_RESULT, C2B_CONFIRMATION, STK, CallbackReceiver
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk import MPesaSDK, RetryableError
+from mpesa_sdk.retry import Retrier, RetryPolicy
+
+STK_ARGS = ("req-1", "554433", "pw", "20160216165627", "CustomerPayBillOnline", "10.00",
+            "251700404789", "554433", "251700404789", "{url}/mpesa/stk", "DATA", "desc", [])
+
+AUTH = {"Authorization": "Bearer mock-token"}
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def receiver():
+    received = []
+    receiver = CallbackReceiver(handlers={kind: received.append for kind in (STK, C2B_CONFIRMATION, B2C_RESULT)})
+    httpd = make_server("127.0.0.1", 0, receiver.wsgi, handler_class=_QuietHandler)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}", receiver, received
+    httpd.shutdown()
+    receiver.close()
+
+
+def test_injected_latency():
+    with MockSafaricomServer(latency=0.05) as server:
+        start = time.perf_counter()
+        response = requests.post(server.url + payloads.B2C_PAYMENT_PATH, json={}, headers=AUTH)
+        assert response.status_code == 200
+        assert time.perf_counter() - start >= 0.05
+
+
+def test_injected_errors_surface_as_retryable():
+    with MockSafaricomServer(error_rate=1.0, error_status=503) as server:
+        retrier = Retrier(RetryPolicy(max_attempts=2, base_delay=0))
+        with MPesaSDK("key", "secret", base_url=server.url, retrier=retrier) as sdk:
+            with pytest.raises(RetryableError) as excinfo:
+                sdk.stk_push(*STK_ARGS)
+    assert excinfo.value.status_code == 503
+    assert server.injected["errors"] == 2
+
+
+def test_throttling_answers_429_with_retry_after():
+    with MockSafaricomServer(rate_limit=1, burst=2) as server:
+        statuses = [requests.post(server.url + payloads.B2C_PAYMENT_PATH, json={}, headers=AUTH)
+                    for _ in range(3)]
+    assert [r.status_code for r in statuses] == [200, 200, 429]
+    assert statuses[2].headers["Retry-After"] == "1"
+    assert server.injected["throttled"] == 1
+
+
+def test_posts_async_callbacks(receiver):
+    url, callback_receiver, received = receiver
+    with MockSafaricomServer(callbacks=True, callback_delay=0.01, record_requests=False) as server:
+        with MPesaSDK("key", "secret", base_url=server.url) as sdk:
+            sdk.stk_push(*STK_ARGS[:9], STK_ARGS[9].format(url=url), *STK_ARGS[10:])
+            sdk.c2b_register_url("802000", "Completed", url + "/mpesa/c2b/confirmation",
+                                 url + "/mpesa/c2b/validation")
+            sdk.c2b_payment("ref-1", "CustomerPayBillOnline", "remark", "1", "USSD", "20250101123456",
+                            [{"Key": "Amount", "Value": "10"}], [], {}, {"Identifier": "251700404789"},
+                            {"Identifier": "802000"})
+            sdk.b2c_payment_request("api", "cred", "BusinessPayment", 10, "600000", "251700404789", "r",
+                                    url + "/mpesa/b2c/timeout", url + "/mpesa/b2c/result", "o")
+        assert server.wait_for_callbacks(timeout=5)
+    assert server.requests == []
+    callback_receiver.join()
+    by_kind = {callback.kind: callback for callback in received}
+    assert by_kind[STK].merchant_request_id == "req-1" and by_kind[STK].successful
+    assert by_kind[C2B_CONFIRMATION].amount == "10"
+    assert by_kind[B2C_RESULT].successful
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from mpesa_sdk import payloads
+from mpesa_sdk.callbacks import B2CResult, C2BNotification, StkCallback, C2B_CONFIRMATION, B2C_RESULT
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk.models import B2CRequest, B2CResponse, C2BPaymentRequest, StkPushRequest, StkPushResponse, dumps, loads
+from mpesa_sdk import MPesaSDK
+
+STK_ARGS = ("req-1", "554433", "pw", "20160216165627", "CustomerPayBillOnline", "10.00",
+            "251700404789", "554433", "251700404789", "https://x/cb", "DATA", "desc", [])
+B2C_ARGS = ("api", "cred", "BusinessPayment", 10, "600000", "251700404789", "r",
+            "https://x/t", "https://x/r", "o")
+C2B_ARGS = ("ref-1", "CustomerPayBillOnline", "remark", "1", "USSD", "20250101123456", [], [], {}, {}, {})
+
+
+@pytest.mark.parametrize("model, builder, args", [
+    (StkPushRequest, payloads.stk_push, STK_ARGS),
+    (B2CRequest, payloads.b2c_payment_request, B2C_ARGS),
+    (C2BPaymentRequest, payloads.c2b_payment, C2B_ARGS),
+])
+def test_models_serialize_like_payload_builders(model, builder, args):
+    request = model(*args)
+    expected = builder(*args)
+    assert list(request.to_dict().items()) == list(expected.items())
+    assert loads(request.to_json()) == expected
+    assert model.from_dict(expected) == request
+    assert not hasattr(request, "__dict__")
+
+
+def test_model_rejects_unknown_fields_and_knows_its_request_id():
+    with pytest.raises(TypeError):
+        StkPushRequest(amount=1, colour="red")
+    assert StkPushRequest(*STK_ARGS).idempotency_key == "req-1"
+    assert B2CRequest(*B2C_ARGS).idempotency_key is None
+
+
+def test_response_decoded_lazily():
+    response = StkPushResponse(dumps({"MerchantRequestID": "req-1", "ResponseCode": "0"}))
+    assert not response.decoded
+    assert response.merchant_request_id == "req-1"
+    assert response.decoded
+    assert response == {"MerchantRequestID": "req-1", "ResponseCode": "0"}
+    assert json.dumps(response.to_dict())
+
+
+def test_callbacks_are_slotted():
+    stk = StkCallback({"Body": {"stkCallback": {"MerchantRequestID": "m", "ResultCode": 0}}})
+    c2b = C2BNotification({"TransID": "T1"}, C2B_CONFIRMATION)
+    b2c = B2CResult({"Result": {"ResultCode": 0}}, B2C_RESULT)
+    for callback in (stk, c2b, b2c):
+        assert not hasattr(callback, "__dict__")
+
+
+def test_sdk_sends_models():
+    with MockSafaricomServer() as server:
+        with MPesaSDK("key", "secret", base_url=server.url) as sdk:
+            stk = sdk.send(StkPushRequest(*STK_ARGS))
+            b2c = sdk.send(B2CRequest(*B2C_ARGS))
+    assert isinstance(stk, StkPushResponse) and stk.checkout_request_id.startswith("ws_CO_")
+    assert isinstance(b2c, B2CResponse) and b2c.response_code == "0"
+    method, path, headers, body = server.requests[1]
+    assert body == payloads.stk_push(*STK_ARGS)
+    assert headers["Content-Type"] == "application/json"
+
+
+def test_async_sdk_sends_models():
+    aio = pytest.importorskip("mpesa_sdk.aio")
+
+    async def main(url):
+        async with aio.AsyncMPesaSDK("key", "secret", base_url=url) as sdk:
+            return await sdk.send(StkPushRequest(*STK_ARGS))
+
+    with MockSafaricomServer() as server:
+        response = asyncio.run(main(server.url))
+    assert response.merchant_request_id == "req-1"
+
+
+def test_stdlib_fallback_backend():
+    code = ("import sys; sys.modules['orjson'] = sys.modules['msgspec'] = None\n"
+            "from mpesa_sdk import models\n"
+            "assert models.BACKEND == 'json'\n"
+            "assert models.loads(models.dumps({'a': [1]})) == {'a': [1]}\n")
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).parents[1])
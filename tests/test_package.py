@@ -0,0 +1,48 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import mpesa_sdk
+
+ROOT = Path(__file__).parents[1]
+
+
+def run(code):
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=ROOT)
+
+
+def test_bare_import_loads_no_submodules_or_dependencies():
+    run("import sys, mpesa_sdk\n"
+        "loaded = [m for m in sys.modules if m.startswith('mpesa_sdk.') or m.split('.')[0] in "
+        "('requests', 'urllib3', 'httpx', 'orjson', 'cryptography')]\n"
+        "assert not loaded, loaded\n")
+
+
+def test_names_load_only_their_submodule():
+    run("import sys\n"
+        "from mpesa_sdk import MPesaError\n"
+        "assert 'mpesa_sdk.exceptions' in sys.modules\n"
+        "assert 'mpesa_sdk.client' not in sys.modules and 'requests' not in sys.modules\n")
+
+
+def test_exports_resolve():
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        optional = {"aio"}
+    else:
+        optional = set()
+    for name in mpesa_sdk.__all__:
+        if mpesa_sdk._EXPORTS[name] in optional:
+            continue
+        assert getattr(mpesa_sdk, name).__module__.startswith("mpesa_sdk.")
+    assert mpesa_sdk.MPesaSDK is mpesa_sdk.client.MPesaSDK
+    assert mpesa_sdk.payloads.STK_PUSH_PATH
+    assert "MPesaSDK" in dir(mpesa_sdk)
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError):
+        mpesa_sdk.nope
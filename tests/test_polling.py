@@ -0,0 +1,155 @@
+import time
+
+import pytest
+
+from mpesa_sdk.callbacks import StkCallback
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk import MPesaSDK
+from mpesa_sdk.polling import SqlitePollStore, StatusPoller
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSDK:
+    def __init__(self, statuses=None):
+        self.statuses = statuses or {}
+        self.queries = []
+
+    def query_transaction_status(self, query_reference, third_party_reference):
+        self.queries.append(query_reference)
+        return {"output_ResponseTransactionStatus": self.statuses.get(query_reference, "Pending")}
+
+
+def make_poller(sdk, **kwargs):
+    clock = Clock()
+    resolved = []
+    poller = StatusPoller(sdk, on_resolved=lambda mid, response: resolved.append((mid, response)),
+                          initial_delay=10, max_delay=100, clock=clock, **kwargs)
+    return poller, clock, resolved
+
+
+def test_polls_with_backoff_until_final():
+    sdk = FakeSDK()
+    poller, clock, resolved = make_poller(sdk)
+    poller.track("mr-1")
+    assert poller.run_pending() == 0
+    clock.now += 10
+    assert poller.run_pending() == 1
+    clock.now += 10
+    assert poller.run_pending() == 0
+    clock.now += 15
+    assert poller.run_pending() == 1
+    sdk.statuses["mr-1"] = "Completed"
+    clock.now += 1000
+    poller.run_pending()
+    assert resolved == [("mr-1", {"output_ResponseTransactionStatus": "Completed"})]
+    assert len(poller) == 0
+    assert poller.stats["resolved_by_poll"] == 1
+
+
+def test_callback_stops_polling():
+    sdk = FakeSDK()
+    poller, clock, resolved = make_poller(sdk)
+    poller.track("mr-1")
+    poller.handle_callback(StkCallback({"Body": {"stkCallback": {"MerchantRequestID": "mr-1", "ResultCode": 0}}}))
+    clock.now += 1000
+    assert poller.run_pending() == 0
+    assert sdk.queries == []
+    assert poller.stats["resolved_by_callback"] == 1
+
+
+def test_queries_for_same_reference_are_coalesced():
+    sdk = FakeSDK({"ws_CO_1": "Completed"})
+    poller, clock, resolved = make_poller(sdk)
+    poller.track("mr-1", "ws_CO_1")
+    poller.track("mr-2", "ws_CO_1")
+    poller.track("mr-3")
+    clock.now += 10
+    assert poller.run_pending() == 2
+    assert sorted(mid for mid, _ in resolved) == ["mr-1", "mr-2"]
+    assert poller.stats["coalesced"] == 1
+
+
+def test_unexpected_errors_reschedule_the_whole_batch():
+    class BrokenSDK(FakeSDK):
+        def query_transaction_status(self, query_reference, third_party_reference):
+            if query_reference == "mr-1":
+                raise ValueError("Expecting value: line 1 column 1")
+            return super().query_transaction_status(query_reference, third_party_reference)
+
+    sdk = BrokenSDK({"mr-2": "Completed"})
+    poller, clock, resolved = make_poller(sdk)
+    poller.track("mr-1")
+    poller.track("mr-2")
+    clock.now += 10
+    assert poller.run_pending() == 2
+    assert resolved == [("mr-2", {"output_ResponseTransactionStatus": "Completed"})]
+    assert poller.stats["errors"] == 1 and len(poller) == 1
+    # Still polled, with backoff, once the error clears.
+    sdk.statuses["mr-1"] = "Completed"
+    del BrokenSDK.query_transaction_status
+    clock.now += 10
+    assert poller.run_pending() == 0
+    clock.now += 1000
+    assert poller.run_pending() == 1
+    assert len(poller) == 0
+
+
+def test_expired_transactions_are_dropped():
+    sdk = FakeSDK()
+    poller, clock, resolved = make_poller(sdk, max_age=50)
+    poller.track("mr-1")
+    clock.now += 60
+    assert poller.run_pending() == 0
+    assert resolved == [("mr-1", None)]
+    assert poller.stats["expired"] == 1
+
+
+def test_scales_to_many_pending():
+    sdk = FakeSDK()
+    poller, clock, _ = make_poller(sdk)
+    for n in range(100_000):
+        poller.track(f"mr-{n}")
+    for n in range(0, 100_000, 2):
+        poller.resolve(f"mr-{n}")
+    clock.now += 10
+    start = time.perf_counter()
+    assert poller.run_pending() == 50_000
+    assert time.perf_counter() - start < 10
+    assert len(poller) == 50_000
+
+
+def test_persistent_store_survives_restart(tmp_path):
+    path = str(tmp_path / "poll.db")
+    sdk = FakeSDK()
+    poller, clock, _ = make_poller(sdk, store=SqlitePollStore(path))
+    poller.track("mr-1")
+    poller.track("mr-2")
+    poller.resolve("mr-2")
+
+    restarted = StatusPoller(sdk, store=SqlitePollStore(path), clock=clock)
+    assert len(restarted) == 1
+    clock.now += 10
+    assert restarted.run_pending() == 1
+    assert sdk.queries == ["mr-1"]
+
+
+def test_background_thread_polls_against_server():
+    with MockSafaricomServer() as server:
+        server.statuses["ws_CO_1"] = "Completed"
+        with MPesaSDK("key", "secret", base_url=server.url, use_spec_ports=False,
+                      operation_defaults={"from": "171717"}) as sdk:
+            resolved = []
+            poller = StatusPoller(sdk, on_resolved=lambda mid, r: resolved.append(mid), initial_delay=0.01).start()
+            poller.track_response({"MerchantRequestID": "mr-1", "CheckoutRequestID": "ws_CO_1"})
+            deadline = time.time() + 5
+            while not resolved and time.time() < deadline:
+                time.sleep(0.01)
+            poller.stop()
+    assert resolved == ["mr-1"]
@@ -0,0 +1,123 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from mpesa_sdk import payloads
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk import MPesaSDK
+from mpesa_sdk.ratelimit import Limit, RateLimiter, RateLimitExceeded, SharedTokenBucket, TokenBucket
+from mpesa_sdk.transport import Transport
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_burst_then_paced():
+    clock = Clock()
+    bucket = TokenBucket(rate=10, burst=2, clock=clock)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+    clock.now = 1.0
+    assert bucket.reserve() == 0
+
+
+def test_token_bucket_max_wait_reserves_nothing():
+    clock = Clock()
+    bucket = TokenBucket(rate=1, burst=1, clock=clock)
+    bucket.reserve()
+    assert bucket.reserve(max_wait=0.5) is None
+    assert bucket.reserve(max_wait=1.0) == pytest.approx(1.0)
+
+
+def _draw(path, n, out):
+    bucket = SharedTokenBucket(path, rate=100, burst=5)
+    out.put([bucket.reserve() for _ in range(n)])
+
+
+def test_shared_bucket_enforces_one_quota_across_processes(tmp_path):
+    path = str(tmp_path / "bucket")
+    out = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_draw, args=(path, 10, out)) for _ in range(3)]
+    for p in procs:
+        p.start()
+    waits = sorted(w for _ in procs for w in out.get(timeout=10))
+    for p in procs:
+        p.join()
+    # 30 draws against a burst of 5 at 100/s: a handful are free and the rest
+    # queue behind each other, whichever process they came from.
+    assert sum(1 for w in waits if w == 0) < 15
+    assert waits[-1] >= 0.1
+
+
+def test_limiter_rejects_and_counts():
+    limiter = RateLimiter({"b2c_payment": Limit(rate=1, burst=1, max_wait=0.01)})
+    with limiter.acquire("b2c_payment"):
+        pass
+    with pytest.raises(RateLimitExceeded):
+        with limiter.acquire("b2c_payment"):
+            pass
+    with limiter.acquire("stk_push"):
+        pass
+    assert limiter.stats["b2c_payment"]["allowed"] == 1
+    assert limiter.stats["b2c_payment"]["rejected"] == 1
+    assert "stk_push" not in limiter.stats
+
+
+def test_limiter_caps_concurrency():
+    limiter = RateLimiter(default=Limit(max_concurrency=2))
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def call():
+        nonlocal in_flight, peak
+        with limiter.acquire("stk_push"):
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak == 2
+    assert limiter.stats["stk_push"]["delayed"] > 0
+
+
+def test_uncontended_calls_are_not_delayed():
+    limiter = RateLimiter({"stk_push": Limit(max_concurrency=5), "b2c_payment": Limit(rate=1000, burst=200)})
+    for _ in range(100):
+        for operation in ("stk_push", "b2c_payment"):
+            with limiter.acquire(operation):
+                pass
+    for operation in ("stk_push", "b2c_payment"):
+        assert limiter.stats[operation]["allowed"] == 100
+        assert limiter.stats[operation]["delayed"] == 0
+        assert limiter.stats[operation]["delay_seconds"] == 0.0
+
+
+def test_transport_applies_limits_per_operation():
+    limiter = RateLimiter({payloads.C2B_REGISTER_URL: Limit(rate=20, burst=1)})
+    with MockSafaricomServer() as server:
+        sdk = MPesaSDK("key", "secret", base_url=server.url, transport=Transport(rate_limiter=limiter))
+        start = time.monotonic()
+        for _ in range(4):
+            sdk.c2b_register_url("802000", "Completed", "https://x/c", "https://x/v")
+        elapsed = time.monotonic() - start
+        sdk.transport.close()
+    assert elapsed >= 3 / 20 * 0.9
+    assert limiter.stats[payloads.C2B_REGISTER_URL]["delayed"] == 3
+    assert payloads.TOKEN not in limiter.stats
@@ -0,0 +1,99 @@
+import json
+
+from mpesa_sdk.reconcile import (
+    AMOUNT_MISMATCH, DUPLICATE, MATCHED, MISSING_IN_LEDGER, MISSING_IN_STATEMENT, UNKEYED,
+    Reconciler, field_getter, reconcile,
+)
+
+
+def read(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_classifies_every_record(tmp_path):
+    statement = [
+        {"TransactionID": "T1", "Amount": "100.00"},
+        {"TransactionID": "T2", "Amount": "1,250.00"},
+        {"TransactionID": "T3", "Amount": "10"},
+        {"TransactionID": "T3", "Amount": "10"},
+        {"TransactionID": "T4", "Amount": "5"},
+        {"Amount": "7"},
+    ]
+    ledger = [
+        {"TransactionID": "T1", "amount": 100},
+        {"TransactionID": "T2", "amount": 1200},
+        {"TransactionID": "T3", "amount": "10.00"},
+        {"TransactionID": "T5", "amount": 3},
+        {"TransactionID": "T5", "amount": 3},
+    ]
+    out = tmp_path / "out"
+    summary = reconcile(statement, ledger, str(out), partitions=4, work_dir=str(tmp_path))
+    assert summary == {MATCHED: 2, AMOUNT_MISMATCH: 1, MISSING_IN_LEDGER: 1, MISSING_IN_STATEMENT: 1,
+                       DUPLICATE: 2, UNKEYED: 1}
+    assert sorted(e["key"] for e in read(out / "matched.jsonl")) == ["T1", "T3"]
+    mismatch, = read(out / "amount_mismatch.jsonl")
+    assert (mismatch["key"], mismatch["statement_amount"], mismatch["ledger_amount"]) == ("T2", "1,250.00", "1200")
+    assert read(out / "missing_in_ledger.jsonl")[0]["key"] == "T4"
+    assert read(out / "missing_in_statement.jsonl")[0]["key"] == "T5"
+    assert sorted((e["side"], e["key"]) for e in read(out / "duplicate.jsonl")) == [
+        ("ledger", "T5"), ("statement", "T3")]
+    # Spill files are cleaned up.
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["out"]
+
+
+def test_custom_keys_tolerance_and_files(tmp_path):
+    statement = tmp_path / "statement.csv"
+    statement.write_text("Receipt No.,Paid In\nR1,100.00\nR2,50.00\n")
+    ledger = tmp_path / "ledger.jsonl"
+    ledger.write_text(json.dumps({"ref": "R1", "total": 100.004}) + "\n" + json.dumps({"ref": "R2", "total": 49}) + "\n")
+    reconciler = Reconciler(str(tmp_path / "out"), ledger_key=field_getter(["ref"]),
+                            ledger_amount=field_getter(["total"]), tolerance="0.01", write_matched=False,
+                            partitions=1)
+    summary = reconciler.run(str(statement), str(ledger))
+    assert summary[MATCHED] == 1 and summary[AMOUNT_MISMATCH] == 1
+    assert not (tmp_path / "out" / "matched.jsonl").exists()
+
+
+def test_many_records_across_partitions(tmp_path):
+    n = 20000
+    statement = ({"TransactionID": f"T{i}", "Amount": i % 100 + 1} for i in range(n))
+    ledger = ({"MerchantRequestID": f"T{i}", "Amount": i % 100 + 1 + (i % 1000 == 0)} for i in range(1, n + 1))
+    summary = reconcile(statement, ledger, str(tmp_path / "out"), partitions=16, write_matched=False)
+    assert summary[MISSING_IN_LEDGER] == 1 and summary[MISSING_IN_STATEMENT] == 1
+    assert summary[AMOUNT_MISMATCH] == 19
+    assert summary[MATCHED] == n - 1 - 19
+
+
+def test_matches_on_any_shared_reference(tmp_path):
+    # The statement knows receipts, the ledger mostly request IDs; some rows carry both.
+    statement = [
+        {"TransactionID": "R1", "MerchantRequestID": "M1", "Amount": 10},
+        {"TransactionID": "R2", "Amount": 20},
+        {"MerchantRequestID": "M3", "Amount": 30},
+        {"TransactionID": "R4", "MerchantRequestID": "M4", "Amount": 40},
+    ]
+    ledger = [
+        {"MerchantRequestID": "M1", "amount": 10},
+        {"MpesaReceiptNumber": "R2", "MerchantRequestID": "M2", "amount": 20},
+        {"TransactionID": "R3", "MerchantRequestID": "M3", "amount": 31},
+        # Shares both references with the same statement row: matched once.
+        {"TransactionID": "R4", "MerchantRequestID": "M4", "amount": 40},
+    ]
+    out = tmp_path / "out"
+    for partitions in (1, 7):
+        summary = reconcile(statement, ledger, str(out), partitions=partitions)
+        assert summary == {MATCHED: 3, AMOUNT_MISMATCH: 1, MISSING_IN_LEDGER: 0, MISSING_IN_STATEMENT: 0,
+                           DUPLICATE: 0, UNKEYED: 0}
+        assert sorted(e["key"] for e in read(out / "matched.jsonl")) in ((["M1", "M4", "R2"], ["M1", "R2", "R4"]))
+        assert read(out / "amount_mismatch.jsonl")[0]["key"] == "M3"
+
+
+def test_duplicate_through_a_secondary_reference(tmp_path):
+    statement = [{"TransactionID": "R1", "Amount": 10}]
+    ledger = [
+        {"TransactionID": "R1", "MerchantRequestID": "M1", "amount": 10},
+        {"MerchantRequestID": "M1", "amount": 10},
+    ]
+    summary = reconcile(statement, ledger, str(tmp_path / "out"), partitions=5)
+    assert summary[MATCHED] == 1 and summary[DUPLICATE] == 1 and summary[MISSING_IN_STATEMENT] == 0
@@ -0,0 +1,157 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from mpesa_sdk import MPesaSDK, payloads
+from mpesa_sdk.exceptions import FatalError
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk.ratelimit import Limit, RateLimiter
+from mpesa_sdk.transport import Transport
+from mpesa_sdk.recorder import REDACTED, Replayer, TrafficRecorder, read_recording, replay
+
+STK_ARGS = ("req-1", "554433", "pw", "20160216165627", "CustomerPayBillOnline", "10.00",
+            "251700404789", "554433", "251700404789", "https://x/cb", "DATA", "desc", [])
+B2C_ARGS = ("api", "secret-credential", "BusinessPayment", 10, "600000", "251700404789", "r",
+            "https://x/t", "https://x/r", "o")
+
+
+def record_session(path, count=3, **recorder_options):
+    with MockSafaricomServer() as server:
+        with TrafficRecorder(path, **recorder_options) as recorder:
+            with MPesaSDK("key", "secret", base_url=server.url, recorder=recorder) as sdk:
+                for n in range(count):
+                    sdk.stk_push(f"req-{n}", *STK_ARGS[1:])
+                sdk.b2c_payment_request(*B2C_ARGS)
+                sdk.c2b_register_url("554433", "Completed", "https://x/c", "https://x/v")
+    return recorder
+
+
+def test_records_requests_with_secrets_redacted(tmp_path):
+    path = str(tmp_path / "traffic.jsonl")
+    recorder = record_session(path)
+    raw = open(path).read()
+    for secret in ("secret-credential", '"pw"', "mock-token", "apikey=key", "Authorization"):
+        assert secret not in raw
+    records = [json.loads(line) for line in raw.splitlines()]
+    assert recorder.recorded == len(records) == 6
+    token, stk = records[0], records[1]
+    assert token["op"] == "token" and token["response"]["access_token"] == REDACTED
+    assert stk["op"] == "stk_push" and stk["method"] == "POST" and stk["status"] == 200
+    assert stk["body"]["Password"] == REDACTED and stk["body"]["MerchantRequestID"] == "req-0"
+    assert stk["response"]["MerchantRequestID"] == "req-0" and stk["elapsed"] > 0
+    assert records[4]["body"]["SecurityCredential"] == REDACTED
+    assert records[5]["path"].endswith(f"?apikey={REDACTED}")
+
+
+def test_c2b_initiator_secrets_are_redacted(tmp_path):
+    path = str(tmp_path / "traffic.jsonl")
+    initiator = {"IdentifierType": 1, "Identifier": "251799100026",
+                 "SecurityCredential": "initiator-credential", "SecretKey": "initiator-secret"}
+    with MockSafaricomServer() as server:
+        with TrafficRecorder(path) as recorder:
+            with MPesaSDK("key", "secret", base_url=server.url, recorder=recorder) as sdk:
+                sdk.c2b_payment("ref-1", "CustomerPayBillOnline", "remark", "1", "USSD", "20250101123456",
+                                [], [], initiator, {}, {})
+    raw = open(path).read()
+    assert "initiator-credential" not in raw and "initiator-secret" not in raw
+    body = [json.loads(line) for line in raw.splitlines()][-1]["body"]
+    assert body["Initiator"] == {"IdentifierType": 1, "Identifier": "251799100026",
+                                 "SecurityCredential": REDACTED, "SecretKey": REDACTED}
+
+
+def test_rotates_and_reads_back_in_order(tmp_path):
+    path = str(tmp_path / "traffic.jsonl")
+    record_session(path, count=30, max_bytes=2000, backup_count=50)
+    assert (tmp_path / "traffic.jsonl.2").exists()
+    records = list(read_recording(path))
+    assert len(records) == 33
+    times = [r["t"] for r in records]
+    assert times == sorted(times)
+
+
+def test_drops_instead_of_blocking_when_buffer_is_full(tmp_path):
+    with TrafficRecorder(str(tmp_path / "traffic.jsonl"), flush_interval=60, max_pending=2) as recorder:
+        for _ in range(5):
+            recorder.record(time.time(), 0.01, "stk_push", "POST", "http://x/p", None, {}, 200, b"{}")
+    assert recorder.recorded == 2 and recorder.dropped == 3
+
+
+def test_counts_every_drop_under_concurrency(tmp_path):
+    with TrafficRecorder(str(tmp_path / "traffic.jsonl"), flush_interval=60, max_pending=50) as recorder:
+        def hammer():
+            for _ in range(100):
+                recorder.record(time.time(), 0.01, "stk_push", "POST", "http://x/p", None, {}, 200, b"{}")
+
+        threads = [threading.Thread(target=hammer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert recorder.recorded == 50 and recorder.dropped == 750
+
+
+def test_elapsed_excludes_throttling(tmp_path):
+    path = str(tmp_path / "traffic.jsonl")
+    limiter = RateLimiter({payloads.C2B_REGISTER_URL: Limit(rate=5, burst=1)})
+    with MockSafaricomServer() as server:
+        with TrafficRecorder(path) as recorder:
+            transport = Transport(rate_limiter=limiter, recorder=recorder)
+            with MPesaSDK("key", "secret", base_url=server.url, transport=transport) as sdk:
+                for _ in range(2):
+                    sdk.c2b_register_url("554433", "Completed", "https://x/c", "https://x/v")
+            transport.close()
+    second = [r for r in read_recording(path) if r["op"] == payloads.C2B_REGISTER_URL][1]
+    assert second["throttled"] > 0.1
+    assert second["elapsed"] < 0.1
+
+
+def test_records_class_of_any_error(tmp_path):
+    class BrokenSession(requests.Session):
+        def request(self, method, url, **kwargs):
+            raise (requests.TooManyRedirects("loop") if "loop" in url else ValueError("bad body"))
+
+    path = str(tmp_path / "traffic.jsonl")
+    with TrafficRecorder(path) as recorder:
+        transport = Transport(session=BrokenSession(), recorder=recorder)
+        with pytest.raises(FatalError):
+            transport.get("https://x/loop", operation="stk_push")
+        with pytest.raises(ValueError):
+            transport.post("https://x/p", json={}, operation="stk_push")
+    assert [r["error"] for r in read_recording(path)] == ["FatalError", "ValueError"]
+
+
+def test_replay_counts_unexpected_errors():
+    records = [{"t": 1000, "op": "stk_push", "method": "POST", "path": "/p", "body": {}}] * 3
+    with MockSafaricomServer() as target:
+        with MPesaSDK("key", "secret", base_url=target.url) as sdk:
+            sdk.transport.request = lambda *args, **kwargs: 1 / 0
+            summary = Replayer(sdk, speed=100).run(records)
+    assert summary["requests"] == 3 and summary["statuses"] == {"ZeroDivisionError": 3}
+
+
+def test_replays_recording_against_another_server(tmp_path):
+    path = str(tmp_path / "traffic.jsonl")
+    record_session(path)
+    with MockSafaricomServer() as target:
+        with MPesaSDK("key", "secret", base_url=target.url, passkey="passkey") as sdk:
+            summary = replay(path, sdk, speed=100, concurrency=4)
+        posts = [r for r in target.requests if r[0] == "POST"]
+    assert summary["requests"] == 5 and summary["statuses"] == {200: 5}
+    assert len(posts) == 5
+    stk = next(body for _, path, _, body in posts if body.get("MerchantRequestID") == "req-0")
+    assert stk["Password"] not in (REDACTED, "pw")
+
+
+def test_replay_speed_compresses_the_schedule():
+    records = [{"t": 1000 + n * 0.1, "op": "stk_push", "method": "POST", "path": "/mpesa/stkpush/v3/processrequest",
+                "body": {"MerchantRequestID": f"r{n}"}} for n in range(11)]
+    with MockSafaricomServer() as target:
+        with MPesaSDK("key", "secret", base_url=target.url) as sdk:
+            start = time.monotonic()
+            summary = Replayer(sdk, speed=10, concurrency=2).run(records)
+            elapsed = time.monotonic() - start
+    assert summary["requests"] == 11
+    assert 0.09 <= elapsed < 0.6
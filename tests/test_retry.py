@@ -0,0 +1,190 @@
+import threading
+
+import pytest
+
+from mpesa_sdk import payloads
+from mpesa_sdk.exceptions import APIRequestError, AuthenticationError, CircuitOpenError, FatalError, RetryableError
+from mpesa_sdk.ratelimit import RateLimitExceeded
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk import MPesaSDK
+from mpesa_sdk.retry import CircuitBreaker, IdempotencyCache, Retrier, RetryBudget, RetryPolicy
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def policy(**kwargs):
+    kwargs.setdefault("budget", RetryBudget(ratio=1.0, min_per_second=0, max_tokens=1000))
+    return RetryPolicy(sleep=lambda s: None, **kwargs)
+
+
+def failing(*errors, result="ok"):
+    errors = list(errors)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+    return fn, calls
+
+
+def test_backoff_is_exponential_capped_and_jittered():
+    p = RetryPolicy(base_delay=0.1, max_delay=1.0, jitter=False)
+    assert [p.backoff(n) for n in (1, 2, 3, 5)] == [0.1, 0.2, 0.4, 1.0]
+    jittered = RetryPolicy(base_delay=0.1, max_delay=1.0)
+    assert all(0 <= jittered.backoff(3) <= 0.4 for _ in range(100))
+
+
+def test_idempotent_call_retried_on_timeout():
+    fn, calls = failing(RetryableError("timed out"), RetryableError("502", status_code=502))
+    retrier = Retrier(policy(max_attempts=3))
+    assert retrier.call("stk_push", fn, idempotency_key="req-1") == "ok"
+    assert len(calls) == 3
+    assert retrier.retries == 2
+
+
+def test_non_idempotent_write_not_retried_when_in_doubt():
+    fn, calls = failing(RetryableError("read timed out"))
+    with pytest.raises(RetryableError):
+        Retrier(policy()).call("b2c_payment", fn)
+    assert len(calls) == 1
+
+    fn, calls = failing(RetryableError("refused", request_sent=False), RetryableError("429", status_code=429))
+    assert Retrier(policy()).call("b2c_payment", fn) == "ok"
+    assert len(calls) == 3
+
+
+def test_fatal_errors_not_retried():
+    fn, calls = failing(FatalError("bad msisdn", status_code=400))
+    with pytest.raises(FatalError):
+        Retrier(policy()).call("stk_push", fn, idempotency_key="req-1")
+    assert len(calls) == 1
+
+
+def test_retry_budget_limits_retries():
+    budget = RetryBudget(ratio=0.5, min_per_second=0, initial_tokens=0, clock=Clock())
+    retrier = Retrier(RetryPolicy(max_attempts=5, budget=budget, sleep=lambda s: None))
+    fn, calls = failing(*[RetryableError("503", status_code=503)] * 10)
+    with pytest.raises(RetryableError):
+        retrier.call("stk_push", fn, idempotency_key="req-1")
+    # One deposit of half a token is not enough for a full retry.
+    assert len(calls) == 1
+
+
+def test_circuit_breaker_opens_and_recovers():
+    clock = Clock()
+    breaker = CircuitBreaker("stk_push", failure_threshold=2, recovery_timeout=10, clock=clock)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now = 10
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize("error, state", [
+    (ValueError("bad row"), CircuitBreaker.OPEN),
+    (AuthenticationError("bad credentials"), CircuitBreaker.CLOSED),
+    (RateLimitExceeded("throttled"), CircuitBreaker.CLOSED),
+])
+def test_half_open_trial_always_resolves(error, state):
+    clock = Clock()
+    retrier = Retrier(policy(max_attempts=1), failure_threshold=1, recovery_timeout=10)
+    breaker = retrier.breakers["stk_push"] = CircuitBreaker("stk_push", 1, 10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    fn, _ = failing(error)
+    with pytest.raises(type(error)):
+        retrier.call("stk_push", fn)
+    assert breaker.state == state
+    clock.now = 20
+    assert retrier.call("stk_push", lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_idempotency_cache_shares_result_and_remembers_in_doubt():
+    cache = IdempotencyCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return {"ResponseCode": "0"}
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(cache.run("k", slow)))
+    first.start()
+    started.wait(1)
+    second = threading.Thread(target=lambda: results.append(cache.run("k", slow)))
+    second.start()
+    release.set()
+    first.join()
+    second.join()
+    assert results == [{"ResponseCode": "0"}] * 2
+    assert len(calls) == 1
+
+    doubt = RetryableError("read timed out")
+    with pytest.raises(RetryableError):
+        cache.run("d", lambda: (_ for _ in ()).throw(doubt))
+    with pytest.raises(RetryableError) as excinfo:
+        cache.run("d", lambda: pytest.fail("in-doubt request must not be resent"))
+    assert excinfo.value is doubt
+
+    with pytest.raises(FatalError):
+        cache.run("f", lambda: (_ for _ in ()).throw(FatalError("bad", status_code=400)))
+    assert cache.run("f", lambda: "resent") == "resent"
+
+
+def test_error_attributes():
+    error = RetryableError("x", status_code=503, body="busy", latency=0.2)
+    assert isinstance(error, APIRequestError)
+    assert (error.status_code, error.body, error.latency) == (503, "busy", 0.2)
+    assert not error.in_doubt
+    assert RetryableError("timeout").in_doubt
+    assert not RetryableError("refused", request_sent=False).in_doubt
+
+
+def test_sdk_retries_stk_push_without_double_charging():
+    with MockSafaricomServer() as server:
+        outcomes = [(503, {"errorMessage": "busy"})]
+        original = server.routes[("POST", payloads.STK_PUSH_PATH)]
+        server.routes[("POST", payloads.STK_PUSH_PATH)] = (
+            lambda body: outcomes.pop(0) if outcomes else original(body))
+        with MPesaSDK("key", "secret", base_url=server.url,
+                      retrier=Retrier(policy(base_delay=0))) as sdk:
+            args = ("req-1", "554433", "pw", "20160216165627", "CustomerPayBillOnline", "10.00",
+                    "251700404789", "554433", "251700404789", "https://x/cb", "DATA", "desc", [])
+            first = sdk.stk_push(*args)
+            second = sdk.stk_push(*args)
+        pushes = [r for r in server.requests if r[1] == payloads.STK_PUSH_PATH]
+    assert first == second
+    assert len(pushes) == 2
+    assert {r[3]["MerchantRequestID"] for r in pushes} == {"req-1"}
+
+
+def test_sdk_error_carries_status_and_latency():
+    with MockSafaricomServer() as server:
+        server.routes[("POST", payloads.B2C_PAYMENT_PATH)] = lambda body: (400, {"errorMessage": "Invalid"})
+        with MPesaSDK("key", "secret", base_url=server.url) as sdk:
+            with pytest.raises(FatalError) as excinfo:
+                sdk.b2c_payment_request("u", "c", "BusinessPayment", 1, "600000", "251700000000",
+                                        "r", "https://x/t", "https://x/r", "o")
+    assert excinfo.value.status_code == 400
+    assert "Invalid" in excinfo.value.body
+    assert excinfo.value.latency > 0
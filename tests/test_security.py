@@ -0,0 +1,91 @@
+import base64
+
+import pytest
+
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk import MPesaSDK
+from mpesa_sdk.security import SecurityCredentials, StkPasswordGenerator, make_timestamp, stk_password
+
+rsa = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.rsa")
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import padding  # noqa: E402
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return key, pem
+
+
+def decrypt(key, credential):
+    return key.decrypt(base64.b64decode(credential), padding.PKCS1v15()).decode()
+
+
+def test_stk_password_reused_within_a_second():
+    clock = Clock(1_700_000_000.2)
+    generator = StkPasswordGenerator("174379", "passkey", clock=clock)
+    password, timestamp = generator.generate()
+    assert password == stk_password("174379", "passkey", timestamp)
+    assert timestamp == make_timestamp(1_700_000_000)
+    clock.now += 0.5
+    assert generator.generate() == (password, timestamp)
+    clock.now += 1
+    assert generator.generate()[1] != timestamp
+    assert generator.generate("20240101000000")[0] == stk_password("174379", "passkey", "20240101000000")
+
+
+def test_security_credential_cached_until_ttl_or_rotation(tmp_path):
+    key, pem = make_key()
+    clock = Clock()
+    credentials = SecurityCredentials(pem, ttl=60, clock=clock)
+    first = credentials.get("api", "secret")
+    assert decrypt(key, first) == "secret"
+    assert credentials.get("api", "secret") == first
+    assert credentials.encryptions == 1
+
+    clock.now += 61
+    assert credentials.get("api", "secret") != first
+    assert credentials.encryptions == 2
+
+    new_key, new_pem = make_key()
+    path = tmp_path / "cert.pem"
+    path.write_bytes(new_pem)
+    credentials.rotate(str(path))
+    assert decrypt(new_key, credentials.get("api", "secret")) == "secret"
+    assert credentials.encryptions == 3
+
+
+def test_sdk_fills_in_password_and_credential():
+    key, pem = make_key()
+    with MockSafaricomServer() as server:
+        sdk = MPesaSDK("key", "secret", base_url=server.url, passkey="passkey",
+                       certificate=pem, initiator_password="secret")
+        sdk.stk_push("mr-1", "174379", None, None, "CustomerPayBillOnline", "1", "254700000000", "174379",
+                     "254700000000", "https://example.com/cb", "ref", "desc", [])
+        sdk.b2c_payment_request("api", None, "BusinessPayment", "10", "600000", "251700000000",
+                                "remarks", "https://example.com/t", "https://example.com/r", "")
+        sdk.b2c_payment_request("api", None, "BusinessPayment", "10", "600000", "251700000000",
+                                "remarks", "https://example.com/t", "https://example.com/r", "")
+        sdk.close()
+
+    stk_body = server.requests[1][3]
+    assert stk_body["Password"] == stk_password("174379", "passkey", stk_body["Timestamp"])
+    credentials = [body["SecurityCredential"] for method, path, headers, body in server.requests[2:]]
+    assert credentials[0] == credentials[1]
+    assert decrypt(key, credentials[0]) == "secret"
+    assert sdk.credentials.security_credentials.encryptions == 1
+
+
+def test_sdk_requires_passkey_without_password():
+    sdk = MPesaSDK("key", "secret")
+    with pytest.raises(ValueError):
+        sdk.stk_push("mr-1", "174379", None, None, "CustomerPayBillOnline", "1", "254700000000", "174379",
+                     "254700000000", "https://example.com/cb", "ref", "desc", [])
@@ -0,0 +1,109 @@
+import pytest
+
+from mpesa_sdk.mock_server import MockSafaricomServer
+from mpesa_sdk.models import StkPushRequest
+from mpesa_sdk.tenants import TenantRegistry, UnknownTenant
+from mpesa_sdk.tokens import LRUTokenStore
+
+STK_ARGS = ("req-1", "554433", "pw", "20160216165627", "CustomerPayBillOnline", "10.00",
+            "251700404789", "554433", "251700404789", "https://x/cb", "DATA", "desc", [])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_token_store_is_bounded_and_drops_expired():
+    clock = Clock()
+    store = LRUTokenStore(max_entries=2, clock=clock)
+    store.set("a", "ta", 2000)
+    store.set("b", "tb", 2000)
+    assert store.get("a") == ("ta", 2000)
+    store.set("c", "tc", 1001)
+    assert store.get("b") is None and store.evictions == 1
+    clock.now = 1001
+    assert store.get("c") is None
+    assert len(store) == 1
+
+
+def test_routes_tenants_over_one_transport():
+    with MockSafaricomServer() as server:
+        with TenantRegistry(base_url=server.url) as registry:
+            registry.register("acme", "key-a", "secret-a", short_codes=["554433"])
+            registry.register("globex", "key-g", "secret-g", short_codes=["600000"])
+            registry["acme"].stk_push(*STK_ARGS)
+            registry.send(StkPushRequest(*STK_ARGS))
+            registry.for_short_code(600000).stk_push(*STK_ARGS[:1], "600000", *STK_ARGS[2:])
+            assert registry["acme"] is registry.client("acme")
+            assert registry["acme"].transport is registry["globex"].transport is registry.transport
+            with pytest.raises(UnknownTenant):
+                registry.client("initech")
+            with pytest.raises(UnknownTenant):
+                registry.for_short_code("999")
+            stats = registry.stats()
+    token_requests = [r for r in server.requests if r[1].startswith("/v1/token")]
+    assert sorted(r[2]["Authorization"] for r in token_requests) == sorted(
+        ["Basic a2V5LWE6c2VjcmV0LWE=", "Basic a2V5LWc6c2VjcmV0LWc="])
+    assert stats["tenants"] == 2 and stats["live_clients"] == 2
+    assert stats["cold_token_fetches"] == 2 and stats["cold_token_seconds_avg"] > 0
+    assert stats["cached_tokens"] == 2
+    assert 0 < stats["bytes_per_tenant"] < stats["bytes_per_client"]
+
+
+def test_evicts_idle_and_least_recently_used_clients():
+    clock = Clock()
+    registry = TenantRegistry(max_clients=2, idle_timeout=60, clock=clock)
+    for name in ("a", "b", "c"):
+        registry.register(name, f"key-{name}", "secret")
+    a = registry.client("a")
+    registry.client("b")
+    registry.client("a")
+    registry.client("c")
+    assert registry.stats()["live_clients"] == 2
+    assert not registry.tenant_stats("b")["live"]
+    assert registry.client("a") is a
+    clock.now += 61
+    registry.client("b")
+    assert registry.stats()["live_clients"] == 1
+    assert registry.tenant_stats("b")["clients_built"] == 2
+    assert registry.evictions == 3
+
+    registry.register("a", "key-a2", "secret")
+    assert registry.client("a") is not a
+    registry.unregister("a")
+    with pytest.raises(UnknownTenant):
+        registry.client("a")
+    registry.close()
+
+
+def test_request_ids_survive_client_eviction():
+    clock = Clock()
+    with MockSafaricomServer() as server:
+        with TenantRegistry(base_url=server.url, max_clients=1, clock=clock) as registry:
+            registry.register("acme", "key-a", "secret-a")
+            registry.register("globex", "key-g", "secret-g")
+            first = registry["acme"].stk_push(*STK_ARGS)
+            registry["globex"].stk_push(*STK_ARGS)
+            assert not registry.tenant_stats("acme")["live"]
+            # Rebuilt client, same request ID: answered from the shared cache.
+            assert registry["acme"].stk_push(*STK_ARGS) == first
+    stk_requests = [r for r in server.requests if "stkpush" in r[1]]
+    assert len(stk_requests) == 2
+
+
+def test_transport_options_are_forwarded_or_rejected():
+    from mpesa_sdk.instrumentation import Metrics
+    from mpesa_sdk.ratelimit import RateLimiter
+    from mpesa_sdk.transport import Transport
+
+    metrics, limiter = Metrics(), RateLimiter()
+    with TenantRegistry(instrumentation=metrics, rate_limiter=limiter) as registry:
+        assert registry.transport.instrumentation is metrics and registry.transport.rate_limiter is limiter
+        with pytest.raises(ValueError):
+            registry.register("acme", "key", "secret", rate_limiter=RateLimiter())
+    with pytest.raises(ValueError):
+        TenantRegistry(transport=Transport(), rate_limiter=limiter)
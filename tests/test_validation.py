@@ -0,0 +1,108 @@
+import pytest
+
+from mpesa_sdk.constants import DEFAULT_OPERATIONS
+from mpesa_sdk.models import B2CRequest
+from mpesa_sdk.validation import (
+    CompiledOperation, FieldError, ValidationError, compile_operations, get_validator, INVALID, MISSING,
+)
+
+B2C = {"from": "171717", "to": "251711959143", "amount": "100.50", "transaction": "T1", "reference": "R1"}
+
+
+def test_valid_record_serialized_with_api_keys():
+    assert get_validator("B2C_PAYMENT").build(B2C) == {
+        "input_ServiceProviderCode": "171717",
+        "input_CustomerMSISDN": "251711959143",
+        "input_Amount": "100.50",
+        "input_TransactionReference": "T1",
+        "input_ThirdPartyReference": "R1",
+    }
+
+
+def test_every_error_reported():
+    errors = get_validator("B2C_PAYMENT").validate({"to": "258841234567", "amount": "0", "reference": "R1"})
+    assert errors == [
+        FieldError("to", INVALID, "258841234567"),
+        FieldError("amount", INVALID, "0"),
+        FieldError("transaction", MISSING),
+    ]
+    with pytest.raises(ValidationError) as excinfo:
+        get_validator("B2C_PAYMENT").build({"to": "258841234567", "amount": "0", "reference": "R1"})
+    assert len(excinfo.value.errors) == 3
+
+
+@pytest.mark.parametrize("msisdn,market,ok", [
+    ("251711959143", "ET", True),
+    ("+251711959143", "ET", True),
+    ("0711959143", "ET", True),
+    ("251911959143", "ET", False),
+    ("258841234567", "ET", False),
+    ("258841234567", "MZ", True),
+    ("251711959143", "MZ", False),
+])
+def test_msisdn_is_per_market(msisdn, market, ok):
+    validator = get_validator("B2C_PAYMENT", market=market)
+    assert (validator.validate(dict(B2C, to=msisdn)) == []) is ok
+
+
+@pytest.mark.parametrize("amount,ok", [("10", True), ("10.5", True), ("10.00", True), (25, True),
+                                       ("0", False), ("10.001", False), ("1.0.0", False)])
+def test_money_amount(amount, ok):
+    assert (get_validator("B2C_PAYMENT").validate(dict(B2C, amount=amount)) == []) is ok
+
+
+def test_fast_matchers_agree_with_patterns():
+    from mpesa_sdk.constants import PATTERNS
+    from mpesa_sdk.validation import _FAST_MATCHERS
+    for value in ["12345", "123456", "1234", "1234567", "12a45", "", "abc", "_x", "-x", "é1", "٣٣٣٣٣"]:
+        for name, fast in _FAST_MATCHERS.items():
+            assert bool(fast(value)) == bool(PATTERNS[name].match(value))
+
+
+def test_defaults_fill_missing_fields():
+    validator = CompiledOperation("B2C_PAYMENT", DEFAULT_OPERATIONS["B2C_PAYMENT"], defaults={"from": "171717"})
+    record = {k: v for k, v in B2C.items() if k != "from"}
+    assert validator.build(record)["input_ServiceProviderCode"] == "171717"
+
+
+
+def test_defaults_only_fill_optional_fields():
+    spec = DEFAULT_OPERATIONS["REVERSAL"]
+    validator = CompiledOperation("REVERSAL", spec, defaults={
+        "to": "171717", "security_credential": "cred", "initiator_identifier": "api", "reference": "R0"})
+    record = {"amount": "10", "transaction": "T1"}
+    assert validator.validate(record) == [FieldError("reference", MISSING)]
+    body = validator.build(dict(record, reference="R1"))
+    assert (body["input_ServiceProviderCode"], body["input_SecurityCredential"], body["input_ThirdPartyReference"]) == (
+        "171717", "cred", "R1")
+
+
+def test_b2c_payload_is_validated_before_sending():
+    from mpesa_sdk import MPesaSDK
+    from mpesa_sdk.mock_server import MockSafaricomServer
+
+    with MockSafaricomServer() as server, MPesaSDK("key", "secret", base_url=server.url) as sdk:
+        with pytest.raises(ValidationError) as error:
+            sdk.b2c_payment_request("api", "cred", "BusinessPayment", "0", "600000", "251700404789",
+                                    "r", "https://x/t", "https://x/r", "o")
+        assert [(e.field, e.code) for e in error.value.errors] == [("Amount", INVALID)]
+        with pytest.raises(ValidationError):
+            sdk.send(B2CRequest("api", "cred", "BusinessPayment", 10, "600000", "123", "r",
+                                "https://x/t", "https://x/r", "o"))
+        assert sdk.b2c_payment_request("api", "cred", "BusinessPayment", 10, "600000", "251700404789",
+                                       "r", "https://x/t", "https://x/r", "o")["ResponseCode"] == "0"
+    assert len([r for r in server.requests if r[1] == "/mpesa/b2c/v1/paymentrequest"]) == 1
+
+
+def test_validate_batch_splits_valid_and_invalid_rows():
+    rows = [B2C, dict(B2C, to="bad"), {}, dict(B2C, transaction="T2")]
+    result = get_validator("B2C_PAYMENT").validate_batch(rows)
+    assert not result
+    assert [index for index, _ in result.valid] == [0, 3]
+    assert sorted(result.errors) == [1, 2]
+    assert {e.field for e in result.errors[2]} == {"to", "amount", "transaction", "reference"}
+
+
+def test_compiled_operations_are_cached():
+    assert compile_operations() is compile_operations()
+    assert set(compile_operations()) == set(DEFAULT_OPERATIONS)